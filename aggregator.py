@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# حالت تجمیع (fleet): یک پنل برای چندین نود مانیتور Rathole
+#
+# نودها از config.json خوانده می‌شوند:
+#   "fleet_nodes": [{"name": "vps1", "url": "http://1.2.3.4:8080"}, "http://5.6.7.8:8080"]
+# هر نود با یک اتصال keep-alive ثابت و به‌صورت همزمان poll می‌شود، جدول تانل‌ها در یک
+# نمای ایندکس‌شده ادغام می‌شود و جستجو/مرتب‌سازی/فیلتر روی کل ناوگان سرو می‌شود.
+# تانل‌ها از ایندکس کش‌شده /api/tunnels نود و فقط به‌صورت افزایشی (since_version) خوانده
+# می‌شوند؛ /api/status برای هر تانل systemctl اجرا می‌کند و برای poll مداوم گران است.
+
+import os
+import sys
+import json
+import time
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, urlencode
+
+MONITOR_DIR = "/root/rathole-monitor"
+CONFIG_FILE = os.path.join(MONITOR_DIR, "config.json")
+
+DEFAULT_FLEET_PORT = 8090
+DEFAULT_FLEET_POLL_INTERVAL = 5
+DEFAULT_FLEET_TIMEOUT = 2.0
+DEFAULT_FLEET_CONCURRENCY = 64
+# ستون‌هایی که از /api/tunnels هر نود خوانده می‌شوند (name همیشه برمی‌گردد)
+NODE_FIELDS = "type,status,restart_count,last_restart"
+NODE_PAGE_SIZE = 1000
+
+SORT_FIELDS = ("node", "name", "type", "status", "restart_count", "last_restart", "staleness")
+
+
+def load_config():
+    try:
+        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+class Node:
+    """یک نود مانیتور با اتصال HTTP ثابت (keep-alive) و آخرین وضعیت دریافتی."""
+
+    def __init__(self, name: str, url: str, timeout: float):
+        u = urlparse(url if "://" in url else f"http://{url}")
+        self.name = name or u.netloc
+        self.url = url
+        self.host = u.hostname or ""
+        self.port = u.port or (443 if u.scheme == "https" else 80)
+        self.https = u.scheme == "https"
+        self.base = u.path.rstrip("/") or ""
+        # سقف کل زمان یک poll (همه صفحه‌ها و تلاش مجدد)؛ نود مرده کل بروزرسانی را معطل نمی‌کند
+        self.timeout = timeout
+        self._conn = None
+        self.tunnels = []
+        self.rows = {}
+        self.epoch = None
+        self.version = None
+        self.ok = False
+        self.error = ""
+        self.last_ok = 0.0
+        self.fetch_ms = 0.0
+        self.monitoring_active = None
+
+    def _connection(self):
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._conn = cls(self.host, self.port, timeout=self.timeout)
+        return self._conn
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _get(self, path: str, deadline: float):
+        # یک تلاش مجدد: اتصال keep-alive ممکن است سمت سرور بسته شده باشد (فقط تا deadline)
+        for attempt in (1, 2):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"timeout ({self.timeout}s)")
+            try:
+                conn = self._connection()
+                conn.timeout = remaining
+                if conn.sock is not None:
+                    conn.sock.settimeout(remaining)
+                conn.request("GET", self.base + path, headers={"Connection": "keep-alive"})
+                resp = conn.getresponse()
+                body = resp.read()
+                if resp.status != 200:
+                    raise ValueError(f"HTTP {resp.status}")
+                if resp.getheader("Connection", "").lower() == "close":
+                    self._close()
+                return json.loads(body.decode("utf-8"))
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self._close()
+                if attempt == 2:
+                    raise
+            except (http.client.HTTPException, OSError, ValueError):
+                self._close()
+                raise
+
+    def _fetch_tunnels(self, deadline: float):
+        """فقط ردیف‌های تغییرکرده از آخرین نسخه؛ با عوض شدن epoch (ریستارت وب‌سرور نود) کل لیست."""
+        since = self.version if self.epoch is not None else None
+        rows = dict(self.rows) if since is not None else {}
+        cursor, version = "", None
+        while True:
+            query = {"fields": NODE_FIELDS, "limit": NODE_PAGE_SIZE}
+            if since is not None:
+                query["since_version"] = since
+            if cursor:
+                query["cursor"] = cursor
+            data = self._get("/api/tunnels?" + urlencode(query), deadline)
+            if since is not None and (data.get("epoch") != self.epoch or data.get("full")):
+                since, rows, cursor = None, {}, ""
+                continue
+            if version is None:
+                # نسخه صفحه اول: تغییرات حین صفحه‌بندی در poll بعدی دوباره خوانده می‌شوند
+                version = data.get("version")
+            for t in data.get("tunnels") or []:
+                rows[t.get("name", "")] = t
+            for name in data.get("removed") or []:
+                rows.pop(name, None)
+            cursor = data.get("next_cursor")
+            if not cursor:
+                break
+        self.rows, self.epoch, self.version = rows, data.get("epoch"), version
+        self.tunnels = list(rows.values())
+
+    def fetch(self):
+        t0 = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        try:
+            self._fetch_tunnels(deadline)
+            # ?tunnels=0: فقط وضعیت خود سرویس مانیتور (یک systemctl، نه یکی برای هر تانل)
+            self.monitoring_active = self._get("/api/status?tunnels=0", deadline).get("monitoring_active")
+            self.ok = True
+            self.error = ""
+            self.last_ok = time.time()
+        except (http.client.HTTPException, OSError, ValueError) as e:
+            self._close()
+            self.ok = False
+            self.error = str(e) or e.__class__.__name__
+        self.fetch_ms = (time.perf_counter() - t0) * 1000
+
+    def state(self, now: float):
+        return {
+            "name": self.name,
+            "url": self.url,
+            "ok": self.ok,
+            "error": self.error,
+            "staleness": round(now - self.last_ok, 1) if self.last_ok else None,
+            "fetch_ms": round(self.fetch_ms, 1),
+            "tunnels": len(self.tunnels),
+            "monitoring_active": self.monitoring_active,
+        }
+
+
+class FleetIndex:
+    """نمای ادغام‌شده تانل‌های همه نودها با ایندکس بر اساس نود و وضعیت."""
+
+    def __init__(self):
+        self.rows = []
+        self.by_node = {}
+        self.by_status = {}
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def rebuild(self, nodes, now: float):
+        rows, by_node, by_status = [], {}, {}
+        for node in nodes:
+            staleness = round(now - node.last_ok, 1) if node.last_ok else None
+            for t in node.tunnels:
+                row = {
+                    "node": node.name,
+                    "name": t.get("name", ""),
+                    "type": t.get("type", ""),
+                    "status": t.get("status", "unknown"),
+                    "restart_count": t.get("restart_count", 0) or 0,
+                    "last_restart": t.get("last_restart") or "",
+                    "staleness": staleness,
+                    "node_ok": node.ok,
+                }
+                row["_search"] = f"{row['node']} {row['name']}".lower()
+                idx = len(rows)
+                rows.append(row)
+                by_node.setdefault(row["node"], []).append(idx)
+                by_status.setdefault(row["status"], []).append(idx)
+        with self._lock:
+            self.rows, self.by_node, self.by_status = rows, by_node, by_status
+            self.version += 1
+
+    def query(self, q="", node="", status="", ttype="", sort="node", desc=False, offset=0, limit=200):
+        with self._lock:
+            rows, by_node, by_status = self.rows, self.by_node, self.by_status
+        # کوچک‌ترین ایندکس موجود به‌عنوان نقطه شروع
+        candidates = None
+        if node:
+            candidates = by_node.get(node, [])
+        if status:
+            st = by_status.get(status, [])
+            candidates = st if candidates is None else sorted(set(candidates) & set(st))
+        it = (rows[i] for i in candidates) if candidates is not None else iter(rows)
+        q = q.lower()
+        out = [r for r in it if (not q or q in r["_search"]) and (not ttype or r["type"] == ttype)]
+        if sort in SORT_FIELDS:
+            out.sort(key=lambda r: (r[sort] is None, r[sort]), reverse=desc)
+        total = len(out)
+        page = [{k: v for k, v in r.items() if k != "_search"} for r in out[offset:offset + limit]]
+        return total, page
+
+
+class Fleet:
+    def __init__(self, cfg):
+        timeout = float(cfg.get("fleet_timeout", DEFAULT_FLEET_TIMEOUT))
+        self.nodes = []
+        for n in cfg.get("fleet_nodes", []):
+            if isinstance(n, str):
+                self.nodes.append(Node("", n, timeout))
+            elif isinstance(n, dict) and n.get("url"):
+                self.nodes.append(Node(n.get("name", ""), n["url"], timeout))
+        self.interval = float(cfg.get("fleet_poll_interval", DEFAULT_FLEET_POLL_INTERVAL))
+        workers = max(1, min(int(cfg.get("fleet_concurrency", DEFAULT_FLEET_CONCURRENCY)), len(self.nodes) or 1))
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fleet")
+        self.index = FleetIndex()
+        self.last_refresh_ms = 0.0
+        self.running = False
+
+    def refresh(self):
+        t0 = time.perf_counter()
+        # هر نود حداکثر یک درخواست همزمان دارد، پس اتصال‌ها بین threadها مشترک نمی‌شوند
+        list(self.pool.map(lambda n: n.fetch(), self.nodes))
+        self.index.rebuild(self.nodes, time.time())
+        self.last_refresh_ms = (time.perf_counter() - t0) * 1000
+
+    def loop(self):
+        self.running = True
+        while self.running:
+            started = time.monotonic()
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[WARN] خطا در بروزرسانی ناوگان: {e}", file=sys.stderr)
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        threading.Thread(target=self.loop, daemon=True).start()
+
+    def nodes_state(self):
+        now = time.time()
+        return [n.state(now) for n in self.nodes]
+
+
+FLEET = None
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "RatholeMonitorFleet/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def _json(self, code=200, payload=None):
+        data = json.dumps(payload or {}, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _text(self, code=200, text=""):
+        data = text.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        path = parsed.path
+        qs = parse_qs(parsed.query)
+
+        def arg(name, default=""):
+            return (qs.get(name) or [default])[0]
+
+        if path == "/":
+            try:
+                with open(os.path.join(MONITOR_DIR, "fleet_panel.html"), "r", encoding="utf-8") as f:
+                    html = f.read().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(html)))
+                self.end_headers()
+                self.wfile.write(html)
+            except Exception as e:
+                self._text(500, f"خطا در سرو HTML: {e}")
+            return
+
+        if path == "/api/fleet":
+            try:
+                offset = max(0, int(arg("offset", "0")))
+                limit = max(1, min(int(arg("limit", "200")), 5000))
+            except ValueError:
+                self._json(400, {"ok": False, "error": "offset/limit نامعتبر"})
+                return
+            total, rows = FLEET.index.query(
+                q=arg("q"), node=arg("node"), status=arg("status"), ttype=arg("type"),
+                sort=arg("sort", "node"), desc=arg("desc") in ("1", "true"), offset=offset, limit=limit,
+            )
+            self._json(200, {
+                "ok": True,
+                "version": FLEET.index.version,
+                "refresh_ms": round(FLEET.last_refresh_ms, 1),
+                "total": total,
+                "tunnels": rows,
+            })
+            return
+
+        if path == "/api/fleet/nodes":
+            self._json(200, {"ok": True, "nodes": FLEET.nodes_state()})
+            return
+
+        self._text(404, "Not found")
+
+
+def main():
+    global FLEET
+    cfg = load_config()
+    if not cfg.get("fleet_nodes"):
+        print("هیچ نودی در fleet_nodes تعریف نشده است", file=sys.stderr)
+        sys.exit(1)
+    FLEET = Fleet(cfg)
+    FLEET.start()
+    port = int(cfg.get("fleet_port", DEFAULT_FLEET_PORT))
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    print(f"🌐 Fleet aggregator running on http://0.0.0.0:{port} ({len(FLEET.nodes)} nodes)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
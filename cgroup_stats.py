@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+تله‌متری منابع هر تانل مستقیماً از cgroup v2 (بدون fork کردن systemctl)
+
+برای هر unit فایل‌های memory.current، cpu.stat، pids.current و io.stat زیر
+<root>/<unit>.service یک بار باز می‌شوند و در هر نمونه با pread از offset صفر
+خوانده می‌شوند. نرخ‌ها (CPU٪، بایت بر ثانیه IO، رشد حافظه) بین دو نمونه متوالی
+محاسبه می‌شوند. root قابل تنظیم است تا در تست یک درخت cgroup جعلی جایگزین شود.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Optional
+
+from health_checks import HealthCheck, register_check
+
+DEFAULT_CGROUP_ROOT = "/sys/fs/cgroup/system.slice"
+
+CGROUP_FILES = ("memory.current", "cpu.stat", "pids.current", "io.stat")
+
+# کلیدهای مجاز در resource_limits
+LIMIT_KEYS = ("memory_bytes", "memory_growth_bps", "cpu_percent", "pids", "io_read_bps", "io_write_bps")
+
+
+def _parse_kv(text: str) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) == 2:
+            try:
+                out[parts[0]] = int(parts[1])
+            except ValueError:
+                pass
+    return out
+
+
+def _parse_io(text: str) -> Dict[str, int]:
+    """جمع rbytes/wbytes همه دیوایس‌ها؛ سطرها مثل: 8:0 rbytes=1 wbytes=2 rios=3 ..."""
+    total = {"rbytes": 0, "wbytes": 0}
+    for line in text.splitlines():
+        for field in line.split()[1:]:
+            k, _, v = field.partition("=")
+            if k in total:
+                try:
+                    total[k] += int(v)
+                except ValueError:
+                    pass
+    return total
+
+
+class CgroupReader:
+    def __init__(self, root: str = DEFAULT_CGROUP_ROOT):
+        self.root = root
+        self._fds: Dict[str, Dict[str, int]] = {}
+        self._prev: Dict[str, Dict[str, float]] = {}
+        self.latest: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger("rathole-monitor")
+
+    def _open(self, unit: str) -> Dict[str, int]:
+        fds = self._fds.get(unit)
+        if fds is not None:
+            return fds
+        base = os.path.join(self.root, f"{unit}.service")
+        fds = {}
+        for name in CGROUP_FILES:
+            try:
+                fds[name] = os.open(os.path.join(base, name), os.O_RDONLY | getattr(os, "O_CLOEXEC", 0))
+            except OSError:
+                continue
+        if fds:
+            self._fds[unit] = fds
+        return fds
+
+    def _close(self, unit: str):
+        for fd in self._fds.pop(unit, {}).values():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def _read_all(self, unit: str) -> Optional[Dict[str, str]]:
+        fds = self._open(unit)
+        if not fds:
+            return None
+        out = {}
+        for name, fd in fds.items():
+            out[name] = os.pread(fd, 65536, 0).decode("ascii", "replace")
+        return out
+
+    def sample(self, unit: str) -> Optional[Dict[str, float]]:
+        """یک نمونه + نرخ‌ها نسبت به نمونه قبلی؛ None اگر cgroup وجود ندارد (سرویس متوقف)."""
+        with self._lock:
+            try:
+                raw = self._read_all(unit)
+            except OSError:
+                # پس از ریستارت سرویس، cgroup از نو ساخته می‌شود و fdهای قبلی باطل‌اند
+                self._close(unit)
+                try:
+                    raw = self._read_all(unit)
+                except OSError:
+                    self._close(unit)
+                    raw = None
+            if raw is None:
+                self._prev.pop(unit, None)
+                self.latest.pop(unit, None)
+                return None
+
+            now = time.monotonic()
+            cur: Dict[str, float] = {"ts": now}
+            if "memory.current" in raw:
+                cur["memory_bytes"] = int(raw["memory.current"].strip() or 0)
+            if "pids.current" in raw:
+                cur["pids"] = int(raw["pids.current"].strip() or 0)
+            if "cpu.stat" in raw:
+                cur["cpu_usec"] = _parse_kv(raw["cpu.stat"]).get("usage_usec", 0)
+            if "io.stat" in raw:
+                io = _parse_io(raw["io.stat"])
+                cur["io_rbytes"] = io["rbytes"]
+                cur["io_wbytes"] = io["wbytes"]
+
+            prev = self._prev.get(unit)
+            self._prev[unit] = cur
+            out = {k: v for k, v in cur.items() if k != "ts"}
+            if prev:
+                dt = now - prev["ts"]
+                if dt > 0:
+                    # شمارنده‌ها بعد از ریستارت سرویس صفر می‌شوند؛ نرخ منفی معنی ندارد
+                    if "cpu_usec" in cur and "cpu_usec" in prev:
+                        out["cpu_percent"] = max(0.0, (cur["cpu_usec"] - prev["cpu_usec"]) / 1e6 / dt * 100.0)
+                    if "io_rbytes" in cur and "io_rbytes" in prev:
+                        out["io_read_bps"] = max(0.0, (cur["io_rbytes"] - prev["io_rbytes"]) / dt)
+                        out["io_write_bps"] = max(0.0, (cur["io_wbytes"] - prev["io_wbytes"]) / dt)
+                    if "memory_bytes" in cur and "memory_bytes" in prev:
+                        out["memory_growth_bps"] = (cur["memory_bytes"] - prev["memory_bytes"]) / dt
+            self.latest[unit] = out
+            return out
+
+    def forget(self, unit: str):
+        with self._lock:
+            self._close(unit)
+            self._prev.pop(unit, None)
+            self.latest.pop(unit, None)
+
+    def retain(self, units):
+        """بستن fdهای unitهایی که دیگر وجود ندارند."""
+        keep = set(units)
+        for unit in [u for u in self._fds if u not in keep]:
+            self.forget(unit)
+
+    def close(self):
+        for unit in list(self._fds):
+            self.forget(unit)
+
+
+def exceeded_limits(sample: Dict[str, float], limits: Dict) -> Optional[str]:
+    """اولین محدودیتی که نمونه از آن عبور کرده (یا None)."""
+    for key in LIMIT_KEYS:
+        lim = limits.get(key)
+        if lim is None or key not in sample:
+            continue
+        if sample[key] > float(lim):
+            return f"{key} {sample[key]:.0f} > {lim}"
+    return None
+
+
+@register_check
+class CgroupCheck(HealthCheck):
+    """
+    قوانین آستانه روی آخرین نمونه cgroup که monitor در همین دور گرفته.
+    پارامترها همان کلیدهای LIMIT_KEYS؛ اگر نبودند از resource_limits در config خوانده می‌شود.
+    """
+
+    name = "cgroup"
+    cost = 5
+
+    def run(self, monitor, tunnel):
+        reader = getattr(monitor, "cgroups", None)
+        sample = reader.latest.get(tunnel["name"]) if reader else None
+        if not sample:
+            return True, "no cgroup"
+        limits = {k: self.params[k] for k in LIMIT_KEYS if k in self.params}
+        if not limits:
+            limits = monitor.policy_for(tunnel["name"]).settings.resource_limits or {}
+        reason = exceeded_limits(sample, limits)
+        if reason:
+            monitor.logger.warning(f"مصرف منابع {tunnel['name']} از حد مجاز گذشت: {reason}")
+            return False, reason
+        return True, ""
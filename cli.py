@@ -0,0 +1,580 @@
+# -*- coding: utf-8 -*-
+"""
+CLI سریع و غیرتعاملی مانیتور (بدون ساختن RatholeMonitor)
+
+  monitor.py status [glob]                  وضعیت تانل‌ها (snapshot آماده سرویس)
+  monitor.py check <glob>                   اجرای چک سلامت تانل‌های منطبق
+  monitor.py restart <glob>                 ریستارت دستی تانل‌های منطبق
+  monitor.py logs <name> [-n 50] [-f]       لاگ journal یک تانل
+  monitor.py config get [key]
+  monitor.py config set key=value ...       (مقدار به صورت JSON، در غیر این صورت رشته)
+  monitor.py history <name|all> [--days 7] [--type restart_attempt,backoff] [--limit 200]
+  monitor.py bench [-n 200]                 تاخیر پرس‌وجوی وضعیت از سرویس
+  monitor.py predict train [--days 30] [--horizon 900] [--step 60]   آموزش مدل پیش‌بینی خرابی (numpy)
+  monitor.py predict show                   خلاصه مدل فعلی
+  monitor.py silence list
+  monitor.py silence add <glob|all> [--type T] [--tag T] (--duration 2h | --end ISO) [--start ISO] [--comment C]
+  monitor.py silence add <glob|all> --cron "0 3 * * 0" --duration 1h      پنجره نگهداری تکرارشونده
+  monitor.py silence remove <id>
+  monitor.py notify test                    ارسال مستقیم پیام آزمایشی به همه مقصدهای اعلان
+  monitor.py notify queue                   پیام‌های در انتظار ارسال (صف دیسکی)
+  monitor.py slo [--month 2026-10 | --since D --until D | --days 30] [--tunnel glob] [--html FILE]
+                                            دسترس‌پذیری، MTTR/MTBF و زمان‌های بازیابی (کد خروج ۱ اگر هدف نقض شده)
+
+خروجی: --json یک سند JSON، --ndjson یک شیء JSON در هر خط (برای check/restart به محض آماده
+شدن هر نتیجه چاپ می‌شود). کد خروج: 0 موفق، 1 شکست (ریستارت ناموفق/چک ناسالم)، 2 استفاده
+نادرست، 3 سرویس در دسترس نیست.
+
+دستورات از سوکت کنترل سرویس در حال اجرا استفاده می‌کنند؛ اگر سرویس در دسترس نبود، status و
+config از config.json و restart مستقیماً با systemctl انجام می‌شوند. این ماژول عمداً فقط
+ماژول‌های سبک را import می‌کند؛ بقیه فقط در صورت نیاز.
+"""
+
+import os
+import sys
+import json
+import time
+import fnmatch
+import argparse
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import control
+
+MONITOR_DIR = "/root/rathole-monitor"
+CONFIG_FILE = os.path.join(MONITOR_DIR, "config.json")
+CONTROL_SOCKET = os.path.join(MONITOR_DIR, "monitor.sock")
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_NO_DAEMON = 3
+
+# فقط این خطاها یعنی سرویس اصلاً درخواست را نگرفته؛ خطای بعد از ارسال (timeout/reset) ممکن است
+# یعنی سرویس دستور را اجرا کرده یا در حال اجراست و اجرای مستقیم دوباره آن را تکرار می‌کند
+DAEMON_DOWN = (FileNotFoundError, ConnectionRefusedError)
+
+
+def _uptime(started: Optional[str]) -> str:
+    try:
+        return str(datetime.now() - datetime.fromisoformat(started)).split(".")[0]
+    except (TypeError, ValueError):
+        return "نامشخص"
+
+
+def _load_config_file() -> Dict:
+    try:
+        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            cfg = json.load(f)
+        return cfg if isinstance(cfg, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _offline_status() -> Dict:
+    tunnels = _load_config_file().get("tunnels", [])
+    return {"daemon": False, "tunnels": tunnels if isinstance(tunnels, list) else []}
+
+
+def _warn_offline(what: str):
+    print(f"⚠️ سرویس مانیتور در دسترس نیست؛ {what}", file=sys.stderr)
+
+
+def _emit(obj):
+    sys.stdout.write(json.dumps(obj, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def _output(args, items: Iterable[Dict], human) -> List[Dict]:
+    """چاپ نتایج لیستی: ndjson به محض رسیدن هر مورد، json یک آرایه در پایان، وگرنه متن."""
+    collected = []
+    for item in items:
+        collected.append(item)
+        if args.ndjson:
+            _emit(item)
+        elif not args.json:
+            human(item)
+            sys.stdout.flush()
+    if args.json:
+        _emit(collected)
+    return collected
+
+
+def fetch_status() -> Dict:
+    try:
+        status = control.request(CONTROL_SOCKET, "status")
+        status["daemon"] = True
+        return status
+    except (OSError, RuntimeError, ValueError):
+        return _offline_status()
+
+
+def print_tunnel(t: Dict, width: int = 30):
+    health = t.get("health") or {}
+    flags = []
+    if health.get("quarantined"):
+        flags.append("quarantined")
+    if t.get("depends_on"):
+        flags.append("deps=" + ",".join(t["depends_on"]))
+    if t.get("failure_risk") is not None:
+        flags.append(f"risk={t['failure_risk']}")
+    if t.get("silenced"):
+        flags.append("silenced")
+    sys.stdout.write(
+        f"{t.get('name', '?'):<{width}}  {t.get('type', '?'):<7} {t.get('status', '?'):<9}"
+        f"{health.get('state', '-'):<10} {health.get('score', '-')!s:<6} "
+        f"{t.get('restart_count', 0):>3}  {t.get('last_restart') or '-'}  {' '.join(flags)}\n"
+    )
+
+
+# ----- commands -----
+def cmd_status(args) -> int:
+    status = fetch_status()
+    tunnels = status.get("tunnels", [])
+    if args.pattern:
+        tunnels = [t for t in tunnels if fnmatch.fnmatchcase(t.get("name", ""), args.pattern)]
+        status["tunnels"] = tunnels
+    if not status.get("daemon"):
+        _warn_offline("آخرین وضعیت ذخیره‌شده:")
+    if args.ndjson:
+        for t in tunnels:
+            _emit(t)
+    elif args.json:
+        _emit(status)
+    else:
+        if status.get("daemon"):
+            print(f"مدت زمان اجرا: {_uptime(status.get('started'))} | آخرین دور: {status.get('updated', '?')}")
+        print(f"تعداد تانل‌ها: {len(tunnels)}")
+        width = max([len(t.get("name", "")) for t in tunnels] + [4])
+        for t in tunnels:
+            print_tunnel(t, width)
+    return EXIT_OK if status.get("daemon") else EXIT_NO_DAEMON
+
+
+def cmd_check(args) -> int:
+    def human(r):
+        failed = [f"{k}: {v.get('detail')}" for k, v in r.get("checks", {}).items() if not v.get("ok", True)]
+        mark = "✅" if r["healthy"] else "❌"
+        print(f"{mark} {r['name']:<30} {r.get('status', '?'):<9} {'; '.join(failed)}")
+
+    try:
+        results = _output(args, control.stream(CONTROL_SOCKET, "check", timeout=args.timeout,
+                                               pattern=args.pattern), human)
+    except OSError:
+        _warn_offline("چک سلامت فقط از طریق سرویس اجرا می‌شود")
+        return EXIT_NO_DAEMON
+    except RuntimeError as e:
+        print(f"خطا: {e}", file=sys.stderr)
+        return EXIT_FAILED
+    return EXIT_OK if all(r["healthy"] for r in results) else EXIT_FAILED
+
+
+def _restart_direct(pattern: str) -> Iterable[Dict]:
+    """
+    ریستارت با systemctl بدون سرویس، فقط برای تانل‌های شناخته‌شده (config یا کشف از systemd).
+    glob هرگز مستقیم به systemctl داده نمی‌شود؛ systemctl آن را روی همه unitهای میزبان باز می‌کند.
+    """
+    import subprocess
+    from web_server import filter_service_name, list_rathole_units
+    names = {t.get("name") for t in _offline_status()["tunnels"] if isinstance(t, dict)}
+    names.update(list_rathole_units())
+    matched = sorted(n for n in names if isinstance(n, str) and filter_service_name(n)
+                     and fnmatch.fnmatchcase(n, pattern))
+    if not matched:
+        raise ValueError(f"هیچ تانلی با {pattern} منطبق نیست")
+    for name in matched:
+        try:
+            ok = subprocess.run(["systemctl", "restart", name], capture_output=True, timeout=60).returncode == 0
+        except subprocess.TimeoutExpired:
+            ok = False
+        yield {"name": name, "ok": ok, "direct": True}
+
+
+def cmd_restart(args) -> int:
+    def human(r):
+        print(f"{'✅' if r['ok'] else '❌'} {r['name']}")
+
+    try:
+        results = _output(args, control.stream(CONTROL_SOCKET, "restart", timeout=args.timeout,
+                                               pattern=args.pattern), human)
+    except DAEMON_DOWN:
+        _warn_offline("ریستارت مستقیم با systemctl")
+        try:
+            results = _output(args, _restart_direct(args.pattern), human)
+        except ValueError as e:
+            print(f"خطا: {e}", file=sys.stderr)
+            return EXIT_FAILED
+    except OSError as e:
+        print(f"خطا در ارتباط با سرویس بعد از ارسال درخواست (ریستارت تکرار نشد): {e}", file=sys.stderr)
+        return EXIT_FAILED
+    except RuntimeError as e:
+        print(f"خطا: {e}", file=sys.stderr)
+        return EXIT_FAILED
+    return EXIT_OK if results and all(r["ok"] for r in results) else EXIT_FAILED
+
+
+def cmd_logs(args) -> int:
+    cmd = ["journalctl", "-u", args.name, "-n", str(args.lines), "--no-pager"]
+    if args.json or args.ndjson:
+        cmd += ["-o", "json"]
+    if args.follow:
+        cmd.append("-f")
+    sys.stdout.flush()
+    os.execvp(cmd[0], cmd)
+    return EXIT_OK
+
+
+def _parse_assignments(pairs: List[str]) -> Dict:
+    updates = {}
+    for pair in pairs:
+        key, sep, raw = pair.partition("=")
+        if not sep or not key:
+            raise ValueError(f"قالب نامعتبر {pair!r} (باید key=value باشد)")
+        try:
+            updates[key] = json.loads(raw)
+        except ValueError:
+            updates[key] = raw
+    return updates
+
+
+def _config_set_offline(updates: Dict) -> Dict:
+    from settings import ConfigError, default_config, validate_config
+    cfg = default_config()
+    cfg.update(_load_config_file())
+    cfg.update(updates)
+    errors = validate_config(cfg)
+    if errors:
+        raise ConfigError(errors)
+    tmp = CONFIG_FILE + ".tmp.cli"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cfg, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, CONFIG_FILE)
+    return {"changed": True, "values": {k: cfg[k] for k in updates}}
+
+
+def cmd_config(args) -> int:
+    try:
+        if args.action == "get":
+            try:
+                result = control.request(CONTROL_SOCKET, "config_get", key=args.key)
+            except OSError:
+                _warn_offline("مقدار از config.json خوانده شد")
+                cfg = _load_config_file()
+                cfg.pop("tunnels", None)
+                result = {args.key: cfg.get(args.key)} if args.key else cfg
+        else:
+            updates = _parse_assignments(args.assignments)
+            try:
+                result = control.request(CONTROL_SOCKET, "config_set", timeout=30.0, updates=updates)
+            except DAEMON_DOWN:
+                _warn_offline("تغییر مستقیماً در config.json نوشته شد")
+                result = _config_set_offline(updates)
+            except OSError as e:
+                raise RuntimeError(f"ارتباط با سرویس بعد از ارسال تغییر قطع شد (دوباره نوشته نشد): {e}")
+    except (RuntimeError, ValueError) as e:
+        print(f"خطا: {e}", file=sys.stderr)
+        return EXIT_FAILED
+    if args.json or args.ndjson:
+        _emit(result)
+    else:
+        values = result.get("values", {}) if args.action == "set" else result
+        for k, v in values.items():
+            print(f"{k} = {json.dumps(v, ensure_ascii=False)}")
+    return EXIT_OK
+
+
+def cmd_history(args) -> int:
+    from event_journal import EventJournal
+    journal = EventJournal(MONITOR_DIR)
+    events = journal.query(
+        tunnel=None if args.name in ("all", "*") else args.name,
+        types=[t.strip() for t in (args.type or "").split(",") if t.strip()] or None,
+        since=time.time() - args.days * 86400,
+        limit=args.limit,
+    )
+
+    def human(ev):
+        ts = datetime.fromtimestamp(ev.get("ts", 0)).isoformat(sep=" ", timespec="seconds")
+        extra = " ".join(f"{k}={v}" for k, v in ev.items() if k not in ("ts", "type", "tunnel"))
+        print(f"{ts}  {ev.get('type', '?'):<16} {ev.get('tunnel') or '-':<30} {extra}")
+
+    _output(args, events, human)
+    return EXIT_OK
+
+
+def cmd_bench(args) -> int:
+    timings = []
+    try:
+        for _ in range(max(1, args.count)):
+            t0 = time.perf_counter()
+            status = control.request(CONTROL_SOCKET, "status")
+            timings.append((time.perf_counter() - t0) * 1000)
+    except (OSError, RuntimeError) as e:
+        _warn_offline(str(e))
+        return EXIT_NO_DAEMON
+    timings.sort()
+    result = {
+        "requests": len(timings),
+        "tunnels": len(status.get("tunnels", [])),
+        "p50_ms": round(timings[len(timings) // 2], 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        "max_ms": round(timings[-1], 3),
+    }
+    if args.json or args.ndjson:
+        _emit(result)
+    else:
+        print(f"{result['requests']} درخواست status ({result['tunnels']} تانل): "
+              f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms max={result['max_ms']}ms")
+    return EXIT_OK
+
+
+def cmd_predict(args) -> int:
+    path = os.path.join(MONITOR_DIR, "predict_model.json")
+    if args.action == "show":
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                model = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"مدلی وجود ندارد ({e})؛ ابتدا: monitor.py predict train", file=sys.stderr)
+            return EXIT_FAILED
+        if args.json or args.ndjson:
+            _emit(model)
+        else:
+            print(f"آموزش: {model.get('trained')}  نمونه: {model.get('samples')}  خرابی: {model.get('positives')}  "
+                  f"AUC: {model.get('auc')}  افق: {model.get('horizon')} ثانیه")
+            for name, w in zip(model.get("features", []), model.get("weights", [])):
+                print(f"  {name:<20} {w:+.4f}")
+        return EXIT_OK
+
+    from event_journal import EventJournal
+    import predictor
+    now = time.time()
+    events = EventJournal(MONITOR_DIR).query(types=predictor.TRAIN_EVENTS, since=now - args.days * 86400,
+                                             limit=10 ** 8)
+    try:
+        model = predictor.train(events, now, horizon=args.horizon, step=args.step)
+    except ImportError:
+        print("آموزش مدل به numpy نیاز دارد: apt install python3-numpy", file=sys.stderr)
+        return EXIT_FAILED
+    except ValueError as e:
+        print(f"خطا: {e}", file=sys.stderr)
+        return EXIT_FAILED
+    predictor.save_model(path, model)
+    if args.json or args.ndjson:
+        _emit(model)
+    else:
+        print(f"مدل ذخیره شد: {path} ({model['samples']} نمونه، {model['positives']} خرابی، AUC={model['auc']}); "
+              f"سرویس در دور بعد آن را بارگذاری می‌کند")
+    return EXIT_OK
+
+
+def _fmt_ts(ts) -> str:
+    return datetime.fromtimestamp(ts).isoformat(sep=" ", timespec="minutes") if ts else "-"
+
+
+def cmd_silence(args) -> int:
+    # سکوت‌ها مستقیم در silences.json نوشته می‌شوند؛ سرویس در دور بعد تغییر را می‌بیند
+    from maintenance import MaintenanceSchedule, SilenceStore, build_silence
+    store = SilenceStore(os.path.join(MONITOR_DIR, "silences.json"))
+    if args.action == "add":
+        try:
+            entry = store.add(build_silence(args.pattern, args.type, args.tag, args.start, args.end,
+                                            args.duration, args.cron, args.comment), created_by="cli")
+        except ValueError as e:
+            print(f"خطا: {e}", file=sys.stderr)
+            return EXIT_FAILED
+        if args.json or args.ndjson:
+            _emit(entry)
+        else:
+            print(f"سکوت {entry['id']} ثبت شد")
+        return EXIT_OK
+    if args.action == "remove":
+        ok = store.remove(args.id)
+        if args.json or args.ndjson:
+            _emit({"id": args.id, "ok": ok})
+        else:
+            print(f"سکوت {args.id} حذف شد" if ok else f"سکوت {args.id} پیدا نشد")
+        return EXIT_OK if ok else EXIT_FAILED
+
+    schedule = MaintenanceSchedule(store)
+    schedule.refresh()
+
+    def human(r):
+        match = " ".join(f"{k}={v}" for k, v in r.get("match", {}).items()) or "all"
+        when = f"cron '{r['cron']}'" if r.get("cron") else "once"
+        state = "فعال " if r["active"] else ""
+        print(f"{r['id']:<10} {match:<32} {when:<18} {state}{_fmt_ts(r['next_start'])} → {_fmt_ts(r['next_end'])}"
+              f"  {r.get('comment', '')}")
+
+    _output(args, schedule.upcoming(), human)
+    return EXIT_OK
+
+
+def cmd_notify(args) -> int:
+    from notifications import NotificationPipeline, NotificationQueue
+    queue_dir = os.path.join(MONITOR_DIR, "notify_queue")
+    if args.action == "queue":
+        def human(m):
+            err = f"  ({m['last_error']})" if m.get("last_error") else ""
+            print(f"{m['id']:<28} {m['sink']:<12} تلاش={m['attempts']} بعدی={_fmt_ts(m['next_try'])}  "
+                  f"{m['subject']}{err}")
+
+        keys = ("id", "sink", "subject", "attempts", "next_try", "last_error")
+        _output(args, ({k: m.get(k) for k in keys} for m in NotificationQueue(queue_dir).load()), human)
+        return EXIT_OK
+
+    pipeline = NotificationPipeline(queue_dir, _load_config_file().get("notification") or {})
+    if not pipeline.sinks:
+        print("هیچ مقصد اعلانی در notification تنظیم نشده است", file=sys.stderr)
+        return EXIT_FAILED
+
+    def human(r):
+        print(f"{r['sink']:<12} " + ("ارسال شد" if r["ok"] else f"خطا: {r['error']}"))
+
+    results = _output(args, ({"sink": name, "ok": not err, "error": err}
+                             for name, err in pipeline.send_test().items()), human)
+    return EXIT_OK if all(r["ok"] for r in results) else EXIT_FAILED
+
+
+SLO_HEADERS = ("AVAIL", "DOWN", "INC", "MTTR", "MTBF", "DETECT", "RESTART", "TTR-MAX", "BUDGET")
+
+
+def cmd_slo(args) -> int:
+    import slo
+    try:
+        since, until = slo.period(args.month, args.since, args.until, args.days)
+    except ValueError as e:
+        print(f"خطا: بازه نامعتبر ({e})", file=sys.stderr)
+        return EXIT_FAILED
+    target = args.target if args.target is not None else \
+        _load_config_file().get("slo_target", slo.DEFAULT_SLO_TARGET)
+    report = slo.build_report(os.path.join(MONITOR_DIR, "slo"), since, until, args.tunnel or "*", target)
+    if args.html:
+        with open(args.html, "w", encoding="utf-8") as f:
+            f.write(slo.render_html(report))
+    if args.json:
+        _emit(report)
+    elif args.ndjson:
+        _emit(dict(name="*", **report["fleet"]))
+        for t in report["tunnels"]:
+            _emit(t)
+    else:
+        def line(name, m):
+            cells = " ".join(f"{fmt(m.get(key)):>10}" for key, _label, fmt in slo.REPORT_COLUMNS)
+            print(f"{name:<30} {cells}" + ("  ✗" if m.get("meets_target") is False else ""))
+
+        print(f"بازه {since} تا {until}، هدف {target}% ({report['took_ms']} ms)")
+        print(f"{'TUNNEL':<30} " + " ".join(f"{h:>10}" for h in SLO_HEADERS))
+        line(f"* ({report['fleet']['tunnels']})", report["fleet"])
+        for t in report["tunnels"]:
+            line(t["name"], t)
+        for inc in report["open_incidents"]:
+            print(f"رخداد باز: {inc['name']} از {_fmt_ts(inc['start'])} ({slo.fmt_duration(inc['down_s'])})")
+        if args.html:
+            print(f"گزارش HTML: {args.html}")
+    return EXIT_FAILED if report["fleet"]["meets_target"] is False else EXIT_OK
+
+
+def build_parser() -> argparse.ArgumentParser:
+    # --json/--ndjson هم قبل و هم بعد از زیرفرمان پذیرفته می‌شوند
+    common = argparse.ArgumentParser(add_help=False)
+    fmt = common.add_mutually_exclusive_group()
+    fmt.add_argument("--json", action="store_true", default=argparse.SUPPRESS, help="خروجی یک سند JSON")
+    fmt.add_argument("--ndjson", action="store_true", default=argparse.SUPPRESS, help="یک شیء JSON در هر خط")
+
+    parser = argparse.ArgumentParser(prog="monitor.py", description="Rathole Tunnel Monitor", parents=[common])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("status", parents=[common], help="وضعیت تانل‌ها از سرویس در حال اجرا")
+    p.add_argument("pattern", nargs="?", help="glob نام تانل")
+    p.set_defaults(func=cmd_status)
+
+    p = sub.add_parser("check", parents=[common], help="اجرای چک سلامت تانل‌های منطبق")
+    p.add_argument("pattern")
+    p.add_argument("--timeout", type=float, default=120.0)
+    p.set_defaults(func=cmd_check)
+
+    p = sub.add_parser("restart", parents=[common], help="ریستارت دستی تانل‌های منطبق با glob")
+    p.add_argument("pattern")
+    p.add_argument("--timeout", type=float, default=300.0)
+    p.set_defaults(func=cmd_restart)
+
+    p = sub.add_parser("logs", parents=[common], help="لاگ journal یک تانل")
+    p.add_argument("name")
+    p.add_argument("-n", "--lines", type=int, default=50)
+    p.add_argument("-f", "--follow", action="store_true")
+    p.set_defaults(func=cmd_logs)
+
+    p = sub.add_parser("config", parents=[common], help="خواندن/تغییر تنظیمات")
+    csub = p.add_subparsers(dest="action", required=True)
+    g = csub.add_parser("get", parents=[common])
+    g.add_argument("key", nargs="?")
+    s = csub.add_parser("set", parents=[common])
+    s.add_argument("assignments", nargs="+", metavar="key=value")
+    p.set_defaults(func=cmd_config)
+
+    p = sub.add_parser("history", parents=[common], help="رویدادهای ثبت‌شده یک تانل")
+    p.add_argument("name", help='نام تانل یا "all"')
+    p.add_argument("--days", type=float, default=7.0)
+    p.add_argument("--type", help="انواع رویداد با کاما، مثلاً restart_attempt,backoff")
+    p.add_argument("--limit", type=int, default=200)
+    p.set_defaults(func=cmd_history)
+
+    p = sub.add_parser("bench", parents=[common], help="اندازه‌گیری تاخیر پرس‌وجوی وضعیت")
+    p.add_argument("-n", "--count", type=int, default=200)
+    p.set_defaults(func=cmd_bench)
+
+    p = sub.add_parser("predict", parents=[common], help="مدل پیش‌بینی خرابی")
+    psub = p.add_subparsers(dest="action", required=True)
+    t = psub.add_parser("train", parents=[common])
+    t.add_argument("--days", type=float, default=30.0, help="بازه تاریخچه ژورنال")
+    t.add_argument("--horizon", type=float, default=900.0, help="افق پیش‌بینی (ثانیه)")
+    t.add_argument("--step", type=float, default=60.0, help="فاصله نمونه‌ها (ثانیه)")
+    psub.add_parser("show", parents=[common])
+    p.set_defaults(func=cmd_predict)
+
+    p = sub.add_parser("silence", parents=[common], help="پنجره‌های نگهداری و سکوت تانل‌ها")
+    ssub = p.add_subparsers(dest="action", required=True)
+    ssub.add_parser("list", parents=[common])
+    a = ssub.add_parser("add", parents=[common])
+    a.add_argument("pattern", help='glob نام تانل یا "all"')
+    a.add_argument("--type", default="", help="نوع تانل (iran/kharej)")
+    a.add_argument("--tag", default="")
+    a.add_argument("--start", help="زمان شروع ISO (پیش‌فرض: الان)")
+    a.add_argument("--end", help="زمان پایان ISO")
+    a.add_argument("--duration", help="مدت، مثلاً 90m یا 2h")
+    a.add_argument("--cron", default="", help='تکرار: "دقیقه ساعت روز ماه روزهفته"')
+    a.add_argument("--comment", default="")
+    r = ssub.add_parser("remove", parents=[common])
+    r.add_argument("id")
+    p.set_defaults(func=cmd_silence)
+
+    p = sub.add_parser("notify", parents=[common], help="مقصدها و صف اعلان هشدارها")
+    nsub = p.add_subparsers(dest="action", required=True)
+    nsub.add_parser("test", parents=[common])
+    nsub.add_parser("queue", parents=[common])
+    p.set_defaults(func=cmd_notify)
+
+    p = sub.add_parser("slo", parents=[common], help="گزارش دسترس‌پذیری و زمان بازیابی تانل‌ها")
+    p.add_argument("--month", help="ماه، مثلاً 2026-10")
+    p.add_argument("--since", help="روز شروع (YYYY-MM-DD)")
+    p.add_argument("--until", help="روز پایان (YYYY-MM-DD)")
+    p.add_argument("--days", type=int, default=30, help="چند روز اخیر (پیش‌فرض 30)")
+    p.add_argument("--tunnel", help="glob نام تانل")
+    p.add_argument("--target", type=float, help="هدف دسترس‌پذیری (درصد؛ پیش‌فرض slo_target)")
+    p.add_argument("--html", metavar="FILE", help="ذخیره گزارش HTML")
+    p.set_defaults(func=cmd_slo)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    args.json = getattr(args, "json", False)
+    args.ndjson = getattr(args, "ndjson", False)
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
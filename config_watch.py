@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+پایش تغییر config.json برای بارگذاری مجدد تنظیمات بدون ریستارت سرویس
+
+- روی لینوکس از inotify (از طریق ctypes، بدون وابستگی خارجی) روی پوشه فایل استفاده
+  می‌شود تا جایگزینی اتمیک (rename) هم دیده شود.
+- اگر inotify در دسترس نبود، هر poll_interval ثانیه mtime/size/inode فایل مقایسه می‌شود.
+
+callback فقط «درخواست» بارگذاری مجدد را ثبت می‌کند؛ اعمال تغییرات در thread حلقه
+مانیتور و بین دو دور انجام می‌شود.
+"""
+
+import os
+import errno
+import ctypes
+import ctypes.util
+import struct
+import logging
+import threading
+from typing import Callable, Optional
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+DEFAULT_CONFIG_POLL_INTERVAL = 5.0
+
+
+def _inotify_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class ConfigWatcher:
+    def __init__(self, path: str, callback: Callable[[str], None],
+                 poll_interval: float = DEFAULT_CONFIG_POLL_INTERVAL):
+        self.path = path
+        self.dir = os.path.dirname(path) or "."
+        self.name = os.path.basename(path).encode()
+        self.callback = callback
+        self.poll_interval = float(poll_interval)
+        self.mode = ""
+        self._fd: Optional[int] = None
+        self._stop = threading.Event()
+        self.logger = logging.getLogger("rathole-monitor")
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size, st.st_ino
+        except OSError:
+            return None
+
+    def _open_inotify(self) -> bool:
+        libc = _inotify_libc()
+        if libc is None:
+            return False
+        fd = libc.inotify_init1(IN_CLOEXEC)
+        if fd < 0:
+            return False
+        wd = libc.inotify_add_watch(fd, self.dir.encode(), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+        if wd < 0:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def _run_inotify(self):
+        while not self._stop.is_set():
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                self.logger.warning(f"inotify متوقف شد ({e})؛ ادامه با بررسی دوره‌ای mtime")
+                self.mode = "poll"
+                self._run_poll()
+                return
+            pos = 0
+            hit = False
+            while pos + _EVENT_HEADER.size <= len(buf):
+                _wd, _mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, pos)
+                name = buf[pos + _EVENT_HEADER.size:pos + _EVENT_HEADER.size + length].rstrip(b"\0")
+                pos += _EVENT_HEADER.size + length
+                if name == self.name:
+                    hit = True
+            if hit:
+                self.callback("inotify")
+
+    def _run_poll(self):
+        last = self._stat()
+        while not self._stop.wait(self.poll_interval):
+            cur = self._stat()
+            if cur != last:
+                last = cur
+                self.callback("mtime")
+
+    def start(self):
+        if self._open_inotify():
+            self.mode = "inotify"
+            target = self._run_inotify
+        else:
+            self.mode = "poll"
+            target = self._run_poll
+        threading.Thread(target=target, name="config-watch", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+تله‌متری اتصال‌های TCP هر تانل (جایگزین اجرای دستی ss)
+
+در هر دور فقط یک dump برای همه تانل‌ها گرفته می‌شود:
+- ترجیحاً از netlink sock_diag (شامل RTT و بایت‌های ورودی/خروجی از tcp_info)
+- در صورت در دسترس نبودن، از /proc/net/tcp و /proc/net/tcp6 (بدون RTT/بایت)
+سوکت‌ها با inode → pid → unit به تانل نسبت داده می‌شوند (pidها از cgroup.procs یا MainPID)
+و اگر pid قابل خواندن نبود، با پورت‌های کانفیگ TOML تانل تطبیق داده می‌شوند.
+"""
+
+import os
+import socket
+import struct
+import logging
+from typing import Dict, Iterable, List, Optional, Set
+
+from health_checks import HealthCheck, register_check
+from tunnel_config import load_tunnel_toml, remote_endpoint, tunnel_ports
+
+TCP_STATES = {
+    1: "ESTABLISHED", 2: "SYN_SENT", 3: "SYN_RECV", 4: "FIN_WAIT1", 5: "FIN_WAIT2",
+    6: "TIME_WAIT", 7: "CLOSE", 8: "CLOSE_WAIT", 9: "LAST_ACK", 10: "LISTEN", 11: "CLOSING",
+}
+
+# ثابت‌های netlink / inet_diag
+NETLINK_SOCK_DIAG = 4
+SOCK_DIAG_BY_FAMILY = 20
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+INET_DIAG_INFO = 2
+
+_NLMSGHDR = struct.Struct("=IHHII")
+_REQ_V2 = struct.Struct("=BBBBI48s")
+_DIAG_MSG = struct.Struct("=BBBBHH16s16sIQIIIII")
+_RTATTR = struct.Struct("=HH")
+
+
+class SockEntry:
+    __slots__ = ("lport", "rport", "state", "inode", "rtt_us", "bytes_in", "bytes_out")
+
+    def __init__(self, lport: int, rport: int, state: int, inode: int,
+                 rtt_us: Optional[int] = None, bytes_in: Optional[int] = None, bytes_out: Optional[int] = None):
+        self.lport = lport
+        self.rport = rport
+        self.state = state
+        self.inode = inode
+        self.rtt_us = rtt_us
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+
+
+def _align4(n: int) -> int:
+    return (n + 3) & ~3
+
+
+def dump_sock_diag() -> List[SockEntry]:
+    """dump همه سوکت‌های TCP (IPv4 و IPv6) با یک درخواست netlink برای هر خانواده."""
+    entries: List[SockEntry] = []
+    with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_SOCK_DIAG) as nl:
+        nl.settimeout(2.0)
+        for seq, family in enumerate((socket.AF_INET, socket.AF_INET6), 1):
+            req = _REQ_V2.pack(family, socket.IPPROTO_TCP, 1 << (INET_DIAG_INFO - 1), 0, 0xFFFFFFFF, b"\0" * 48)
+            hdr = _NLMSGHDR.pack(_NLMSGHDR.size + len(req), SOCK_DIAG_BY_FAMILY, NLM_F_REQUEST | NLM_F_DUMP, seq, 0)
+            nl.send(hdr + req)
+            done = False
+            while not done:
+                data = nl.recv(1 << 16)
+                off = 0
+                while off + _NLMSGHDR.size <= len(data):
+                    length, mtype, _flags, _seq, _pid = _NLMSGHDR.unpack_from(data, off)
+                    if length < _NLMSGHDR.size:
+                        done = True
+                        break
+                    if mtype == NLMSG_DONE:
+                        done = True
+                        break
+                    if mtype == NLMSG_ERROR:
+                        raise OSError("sock_diag: netlink error")
+                    if mtype == SOCK_DIAG_BY_FAMILY:
+                        entries.append(_parse_diag_msg(data, off + _NLMSGHDR.size, off + length))
+                    off += _align4(length)
+    return entries
+
+
+def _parse_diag_msg(data: bytes, start: int, end: int) -> SockEntry:
+    (_fam, state, _timer, _retrans, sport, dport, _src, _dst, _if, _cookie,
+     _expires, _rq, _wq, _uid, inode) = _DIAG_MSG.unpack_from(data, start)
+    entry = SockEntry(socket.ntohs(sport), socket.ntohs(dport), state, inode)
+    off = start + _DIAG_MSG.size
+    while off + _RTATTR.size <= end:
+        alen, atype = _RTATTR.unpack_from(data, off)
+        if alen < _RTATTR.size:
+            break
+        if atype == INET_DIAG_INFO:
+            payload = data[off + _RTATTR.size: off + alen]
+            # struct tcp_info: ۸ بایت u8 و سپس u32ها؛ tcpi_rtt در offset 68،
+            # tcpi_bytes_acked در 120 و tcpi_bytes_received در 128 (کرنل 4.1+)
+            if len(payload) >= 72:
+                entry.rtt_us = struct.unpack_from("=I", payload, 68)[0]
+            if len(payload) >= 136:
+                entry.bytes_out, entry.bytes_in = struct.unpack_from("=QQ", payload, 120)
+        off += _align4(alen)
+    return entry
+
+
+def dump_proc_net(proc_root: str = "/proc") -> List[SockEntry]:
+    entries: List[SockEntry] = []
+    for name in ("tcp", "tcp6"):
+        try:
+            with open(f"{proc_root}/net/{name}", "r") as f:
+                next(f, None)  # سطر عنوان
+                for line in f:
+                    parts = line.split()
+                    if len(parts) < 10:
+                        continue
+                    try:
+                        lport = int(parts[1].rsplit(":", 1)[1], 16)
+                        rport = int(parts[2].rsplit(":", 1)[1], 16)
+                        entries.append(SockEntry(lport, rport, int(parts[3], 16), int(parts[9])))
+                    except (IndexError, ValueError):
+                        continue
+        except OSError:
+            continue
+    return entries
+
+
+def unit_pids(cgroup_root: str, unit: str, main_pid: int = 0) -> List[int]:
+    try:
+        with open(os.path.join(cgroup_root, f"{unit}.service", "cgroup.procs"), "r") as f:
+            pids = [int(x) for x in f.read().split()]
+        if pids:
+            return pids
+    except (OSError, ValueError):
+        pass
+    return [main_pid] if main_pid else []
+
+
+def socket_inodes(pids: Iterable[int], proc_root: str = "/proc") -> Set[int]:
+    inodes: Set[int] = set()
+    for pid in pids:
+        fd_dir = f"{proc_root}/{pid}/fd"
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            continue
+        for fd in fds:
+            try:
+                link = os.readlink(f"{fd_dir}/{fd}")
+            except OSError:
+                continue
+            if link.startswith("socket:["):
+                inodes.add(int(link[8:-1]))
+    return inodes
+
+
+class ConnCollector:
+    def __init__(self, cgroup_root: str, use_netlink: bool = True, proc_root: str = "/proc"):
+        self.cgroup_root = cgroup_root
+        self.use_netlink = use_netlink
+        self.proc_root = proc_root
+        self.source = ""
+        self.latest: Dict[str, Dict] = {}
+        self.logger = logging.getLogger("rathole-monitor")
+
+    def dump(self) -> List[SockEntry]:
+        if self.use_netlink:
+            try:
+                entries = dump_sock_diag()
+                self.source = "sock_diag"
+                return entries
+            except OSError as e:
+                self.logger.debug(f"sock_diag در دسترس نیست، استفاده از /proc/net/tcp: {e}")
+                self.use_netlink = False
+        self.source = "proc"
+        return dump_proc_net(self.proc_root)
+
+    def collect(self, tunnels: List[Dict]) -> Dict[str, Dict]:
+        entries = self.dump()
+        by_inode = {e.inode: e for e in entries if e.inode}
+        result: Dict[str, Dict] = {}
+        for t in tunnels:
+            name = t["name"]
+            cfg = load_tunnel_toml(t.get("config_path"))
+            ports = set(tunnel_ports(cfg))
+            rem = remote_endpoint(cfg)
+            remote_port = rem[1] if rem else None
+
+            inodes = socket_inodes(unit_pids(self.cgroup_root, name, int(t.get("pid") or 0)), self.proc_root)
+            if inodes:
+                owned = [by_inode[i] for i in inodes if i in by_inode]
+            else:
+                # pid در دسترس نیست → تطبیق با پورت‌های کانفیگ
+                owned = [e for e in entries if e.lport in ports or (remote_port and e.rport == remote_port)]
+            result[name] = self._summarize(owned, ports, remote_port)
+        self.latest = result
+        return result
+
+    @staticmethod
+    def _summarize(owned: List[SockEntry], ports: Set[int], remote_port: Optional[int]) -> Dict:
+        states: Dict[str, int] = {}
+        per_port: Dict[str, int] = {}
+        rtts: List[int] = []
+        bytes_in = bytes_out = 0
+        has_bytes = False
+        for e in owned:
+            st = TCP_STATES.get(e.state, str(e.state))
+            states[st] = states.get(st, 0) + 1
+            if e.state != 1:
+                continue
+            port = e.lport if e.lport in ports else (e.rport if e.rport in ports or e.rport == remote_port else None)
+            if port is not None:
+                per_port[str(port)] = per_port.get(str(port), 0) + 1
+            if e.rtt_us:
+                rtts.append(e.rtt_us)
+            if e.bytes_in is not None:
+                has_bytes = True
+                bytes_in += e.bytes_in
+                bytes_out += e.bytes_out or 0
+        out = {
+            "total": len(owned),
+            "established": states.get("ESTABLISHED", 0),
+            "states": states,
+            "ports": per_port,
+        }
+        if rtts:
+            out["rtt_ms_avg"] = round(sum(rtts) / len(rtts) / 1000.0, 2)
+            out["rtt_ms_max"] = round(max(rtts) / 1000.0, 2)
+        if has_bytes:
+            out["bytes_in"] = bytes_in
+            out["bytes_out"] = bytes_out
+        return out
+
+
+@register_check
+class ConnectionsCheck(HealthCheck):
+    """حداقل اتصال ESTABLISHED و حداکثر RTT بر اساس آخرین dump همین دور."""
+
+    name = "connections"
+    cost = 5
+
+    def run(self, monitor, tunnel):
+        collector = getattr(monitor, "connections", None)
+        summary = collector.latest.get(tunnel["name"]) if collector else None
+        if summary is None:
+            return True, "no data"
+        est = summary.get("established", 0)
+        lo = self.params.get("min_established")
+        if lo is not None and est < int(lo):
+            return False, f"{est} established < {lo}"
+        max_rtt = self.params.get("max_rtt_ms")
+        if max_rtt is not None and summary.get("rtt_ms_avg", 0) > float(max_rtt):
+            return False, f"rtt {summary['rtt_ms_avg']}ms > {max_rtt}"
+        return True, f"{est} established"
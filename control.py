@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+سوکت کنترل محلی (Unix domain) بین سرویس مانیتور و CLI
+
+پروتکل: هر اتصال یک درخواست JSON در یک خط ({"cmd": "status", ...}) و پاسخ به صورت
+خطوط JSON و بعد بستن اتصال:
+- پاسخ ساده: {"ok": true, "result": ...} یا {"ok": false, "error": "..."}
+- پاسخ جریانی (handler یک iterator برگرداند، مثل ریستارت صدها تانل): هر نتیجه در یک خط
+  {"item": ...} به محض آماده شدن، و در پایان {"ok": true, "done": true}
+سوکت فقط برای root قابل دسترسی است (0600).
+
+handler می‌تواند bytes برگرداند (JSON از پیش سریال‌شده، مثل snapshot وضعیت که یک بار در
+هر دور ساخته می‌شود) تا پاسخ‌های پرتکرار بدون json.dumps مجدد ارسال شوند.
+"""
+
+import os
+import json
+import socket
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional
+
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+def _connect(path: str, cmd: str, timeout: float, args: Dict) -> socket.socket:
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.settimeout(timeout)
+        s.connect(path)
+        s.sendall(json.dumps(dict(args, cmd=cmd)).encode("utf-8") + b"\n")
+    except OSError:
+        s.close()
+        raise
+    return s
+
+
+def request(path: str, cmd: str, timeout: float = 2.0, **args) -> Any:
+    """ارسال یک دستور به سرویس؛ OSError اگر سرویس در دسترس نباشد، RuntimeError اگر خطا برگرداند."""
+    with _connect(path, cmd, timeout, args) as s:
+        chunks = []
+        while True:
+            chunk = s.recv(256 * 1024)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    reply = json.loads(b"".join(chunks) or b"{}")
+    if not reply.get("ok"):
+        raise RuntimeError(reply.get("error") or "پاسخ نامعتبر از سرویس")
+    return reply.get("result")
+
+
+def stream(path: str, cmd: str, timeout: float = 120.0, **args) -> Iterator[Any]:
+    """دریافت نتایج دستور جریانی یکی‌یکی (timeout برای فاصله بین دو نتیجه است)."""
+    with _connect(path, cmd, timeout, args) as s, s.makefile("rb") as f:
+        for line in f:
+            reply = json.loads(line)
+            if "item" in reply:
+                yield reply["item"]
+            elif not reply.get("ok"):
+                raise RuntimeError(reply.get("error") or "پاسخ نامعتبر از سرویس")
+            elif "result" in reply:
+                # دستور غیرجریانی
+                yield reply["result"]
+                return
+            else:
+                return
+
+
+class ControlServer:
+    def __init__(self, path: str, handlers: Dict[str, Callable[[Dict], Any]]):
+        self.path = path
+        self.handlers = handlers
+        self._sock: Optional[socket.socket] = None
+        self.logger = logging.getLogger("rathole-monitor")
+
+    def _in_use(self) -> bool:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.settimeout(0.5)
+                s.connect(self.path)
+            return True
+        except OSError:
+            return False
+
+    def start(self) -> bool:
+        if os.path.exists(self.path):
+            if self._in_use():
+                self.logger.warning(f"سوکت کنترل {self.path} در دست نمونه دیگری است؛ سوکت کنترل راه‌اندازی نشد")
+                return False
+            os.remove(self.path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            sock.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        sock.listen(16)
+        self._sock = sock
+        threading.Thread(target=self._serve, name="control", daemon=True).start()
+        return True
+
+    def stop(self):
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            sock.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def _serve(self):
+        while self._sock is not None:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            # هر درخواست در thread جدا (ریستارت ممکن است چند ثانیه طول بکشد)
+            threading.Thread(target=self._handle, args=(conn,), name="control-conn", daemon=True).start()
+
+    def _handle(self, conn: socket.socket):
+        with conn:
+            try:
+                conn.settimeout(5.0)
+                data = b""
+                while not data.endswith(b"\n") and len(data) < MAX_REQUEST_BYTES:
+                    chunk = conn.recv(4096)
+                    if not chunk:
+                        break
+                    data += chunk
+                msg = json.loads(data or b"{}")
+                handler = self.handlers.get(msg.get("cmd"))
+                if handler is None:
+                    raise ValueError(f"دستور ناشناخته: {msg.get('cmd')}")
+                result = handler(msg)
+                if isinstance(result, bytes):
+                    reply = b'{"ok":true,"result":' + result + b"}\n"
+                elif hasattr(result, "__next__"):
+                    conn.settimeout(None)
+                    for item in result:
+                        conn.sendall(_line({"item": item}))
+                    reply = _line({"ok": True, "done": True})
+                else:
+                    reply = _line({"ok": True, "result": result})
+            except Exception as e:
+                reply = _line({"ok": False, "error": str(e)})
+            try:
+                conn.sendall(reply)
+            except OSError:
+                pass
+
+
+def _line(obj: Dict) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+تشخیص خرابی‌های همبسته: وقتی چند تانل هم‌نوع با یک مقصد مشترک همزمان خراب می‌شوند
+مشکل از لینک/سرور مقصد است نه از خود سرویس‌ها؛ در این حالت ریستارت‌ها متوقف می‌شوند
+و به‌جای آن وابستگی مشترک probe می‌شود تا برگردد.
+"""
+
+import time
+import socket
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+from tunnel_config import load_tunnel_toml, remote_endpoint, split_addr
+
+DEFAULT_CORRELATION_WINDOW_SECONDS = 600
+DEFAULT_CORRELATION_MIN_FAILURES = 2
+DEFAULT_CORRELATION_MIN_FRACTION = 0.6
+DEFAULT_CORRELATION_PROBE_TIMEOUT = 3.0
+
+# (نوع تانل، مقصد مشترک به صورت host:port یا "")
+GroupKey = Tuple[str, str]
+
+
+def failure_kind(tunnel: Dict) -> str:
+    return "inactive" if tunnel.get("status") == "inactive" else "unhealthy"
+
+
+class Outage:
+    __slots__ = ("key", "kind", "probe", "since", "last_probe", "units")
+
+    def __init__(self, key: GroupKey, kind: str, probe: Tuple[str, int], since: float):
+        self.key = key
+        self.kind = kind
+        self.probe = probe
+        self.since = since
+        self.last_probe = since
+        self.units: Set[str] = set()
+
+    def label(self) -> str:
+        return f"{self.key[0]}@{self.key[1] or 'uplink'}"
+
+
+class CorrelationEngine:
+    def __init__(self, window_seconds: float = DEFAULT_CORRELATION_WINDOW_SECONDS,
+                 min_failures: int = DEFAULT_CORRELATION_MIN_FAILURES,
+                 min_fraction: float = DEFAULT_CORRELATION_MIN_FRACTION,
+                 probe_timeout: float = DEFAULT_CORRELATION_PROBE_TIMEOUT,
+                 default_probe: str = ""):
+        self.window_seconds = float(window_seconds)
+        self.min_failures = max(2, int(min_failures))
+        self.min_fraction = float(min_fraction)
+        self.probe_timeout = float(probe_timeout)
+        # مقصد probe برای گروه‌هایی که remote_addr ندارند (مثلاً سمت server)
+        self.default_probe = split_addr(default_probe or "")
+        # (group, kind) → {unit: last_failure_ts}
+        self._failures: Dict[Tuple[GroupKey, str], Dict[str, float]] = {}
+        self.outages: Dict[Tuple[GroupKey, str], Outage] = {}
+        self.logger = logging.getLogger("rathole-monitor")
+
+    @classmethod
+    def from_config(cls, cfg: Dict) -> "CorrelationEngine":
+        return cls(
+            window_seconds=cfg.get("correlation_window_seconds", DEFAULT_CORRELATION_WINDOW_SECONDS),
+            min_failures=cfg.get("correlation_min_failures", DEFAULT_CORRELATION_MIN_FAILURES),
+            min_fraction=cfg.get("correlation_min_fraction", DEFAULT_CORRELATION_MIN_FRACTION),
+            probe_timeout=cfg.get("correlation_probe_timeout", DEFAULT_CORRELATION_PROBE_TIMEOUT),
+            default_probe=cfg.get("correlation_default_probe", ""),
+        )
+
+    # ----- helpers -----
+    @staticmethod
+    def group_key(tunnel: Dict) -> GroupKey:
+        ep = remote_endpoint(load_tunnel_toml(tunnel.get("config_path")))
+        return tunnel.get("type", "?"), (f"{ep[0]}:{ep[1]}" if ep else "")
+
+    def _probe_target(self, key: GroupKey) -> Optional[Tuple[str, int]]:
+        return split_addr(key[1]) if key[1] else self.default_probe
+
+    def probe(self, target: Tuple[str, int]) -> bool:
+        try:
+            with socket.create_connection(target, timeout=self.probe_timeout):
+                return True
+        except OSError:
+            return False
+
+    # ----- main entry -----
+    def filter(self, tunnels: List[Dict], failed: List[Dict], now: Optional[float] = None) -> List[Dict]:
+        """
+        ثبت خرابی‌های این دور، تشخیص/بستن قطعی‌های مشترک و برگرداندن تانل‌هایی که
+        هنوز باید ریستارت شوند. تانل‌های متوقف‌شده فیلد suppressed_by می‌گیرند.
+        """
+        now = time.time() if now is None else now
+        members: Dict[GroupKey, int] = {}
+        keys: Dict[str, GroupKey] = {}
+        for t in tunnels:
+            k = self.group_key(t)
+            keys[t["name"]] = k
+            members[k] = members.get(k, 0) + 1
+            t.pop("suppressed_by", None)
+
+        for t in failed:
+            fk = (keys.get(t["name"]) or self.group_key(t), failure_kind(t))
+            self._failures.setdefault(fk, {})[t["name"]] = now
+
+        # پاکسازی خرابی‌های خارج از پنجره
+        cutoff = now - self.window_seconds
+        for fk in list(self._failures):
+            units = {u: ts for u, ts in self._failures[fk].items() if ts >= cutoff}
+            if units:
+                self._failures[fk] = units
+            else:
+                del self._failures[fk]
+
+        # قطعی‌های فعال: probe؛ در صورت برگشت وابستگی، از سرگیری ریستارت‌ها
+        for fk, outage in list(self.outages.items()):
+            outage.last_probe = now
+            if self.probe(outage.probe):
+                self.logger.info(
+                    f"وابستگی مشترک {outage.label()} برگشت ({int(now - outage.since)} ثانیه قطعی)؛ "
+                    f"ریستارت‌های {', '.join(sorted(outage.units)) or '-'} از سر گرفته می‌شود"
+                )
+                del self.outages[fk]
+                self._failures.pop(fk, None)
+
+        # تشخیص قطعی مشترک جدید
+        for fk, units in self._failures.items():
+            if fk in self.outages:
+                continue
+            key, kind = fk
+            total = members.get(key, 0)
+            if len(units) < self.min_failures or not total or len(units) / total < self.min_fraction:
+                continue
+            target = self._probe_target(key)
+            if not target:
+                continue
+            if self.probe(target):
+                # مقصد در دسترس است → خرابی‌ها مستقل‌اند
+                continue
+            outage = Outage(key, kind, target, now)
+            self.outages[fk] = outage
+            self.logger.warning(
+                f"خرابی همبسته {kind} در {len(units)}/{total} تانل {outage.label()}؛ "
+                f"ریستارت‌ها تا برگشت {target[0]}:{target[1]} متوقف می‌شود"
+            )
+
+        if not self.outages:
+            return failed
+
+        remaining: List[Dict] = []
+        for t in failed:
+            fk = (keys.get(t["name"]) or self.group_key(t), failure_kind(t))
+            outage = self.outages.get(fk)
+            if outage is None:
+                remaining.append(t)
+                continue
+            outage.units.add(t["name"])
+            t["suppressed_by"] = outage.label()
+        return remaining
+
+    def snapshot(self) -> List[Dict]:
+        return [
+            {"group": o.label(), "kind": o.kind, "since": o.since, "units": sorted(o.units),
+             "probe": f"{o.probe[0]}:{o.probe[1]}"}
+            for o in self.outages.values()
+        ]
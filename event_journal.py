@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+ژورنال رویدادهای ساختاریافته مانیتور (تغییر وضعیت، تلاش ریستارت، بک‌آف، برخورد الگو ...)
+
+فایل‌ها (کنار هم در MONITOR_DIR):
+- events.jsonl   : هر خط یک رویداد JSON (فقط افزودنی)
+- events.idx     : ایندکس باینری با رکوردهای ثابت ۲۴ بایتی
+                   <ts:float64><offset:uint64><tunnel_id:uint32><type_id:uint16><pad:2>
+- events.names   : جدول نام‌ها؛ هر خط "t <tunnel>" یا "e <type>"، id = ترتیب در همان نوع
+- events.t/<id>.idx : همان رکوردهای events.idx فقط برای یک تانل (tunnel_id = id)
+
+چون رویدادها به ترتیب زمان اضافه می‌شوند، پرس‌وجوی بازه زمانی با جستجوی دودویی روی
+ایندکس انجام می‌شود و فقط خطوط منطبق از events.jsonl با seek خوانده می‌شوند؛ کل فایل
+اسکن نمی‌شود. پرس‌وجوی یک تانل فقط ایندکس همان تانل را می‌خواند، نه رکورد همه تانل‌ها.
+"""
+
+import os
+import json
+import mmap
+import time
+import fcntl
+import struct
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+IDX_RECORD = struct.Struct("<dQIH2x")
+
+EVENT_STATE_CHANGE = "state_change"
+EVENT_RESTART_ATTEMPT = "restart_attempt"
+EVENT_RESTART_RESULT = "restart_result"
+EVENT_ACTIVATION = "activation"
+EVENT_BACKOFF = "backoff"
+EVENT_PATTERN_HIT = "pattern_hit"
+EVENT_OUTAGE = "outage"
+EVENT_CONFIG_RELOAD = "config_reload"
+EVENT_DEPENDENCY_SKIP = "dependency_skip"
+EVENT_QUARANTINE = "quarantine"
+EVENT_LOG_RATE = "log_rate"
+EVENT_PREDICTIVE_RESTART = "predictive_restart"
+EVENT_SILENCE = "silence"
+EVENT_INCIDENT = "incident"
+
+
+class EventJournal:
+    def __init__(self, base_dir: str, prefix: str = "events"):
+        self.data_path = os.path.join(base_dir, f"{prefix}.jsonl")
+        self.idx_path = os.path.join(base_dir, f"{prefix}.idx")
+        self.names_path = os.path.join(base_dir, f"{prefix}.names")
+        self.tunnel_dir = os.path.join(base_dir, f"{prefix}.t")
+        self._tunnels: Dict[str, int] = {}
+        self._types: Dict[str, int] = {}
+        self._names_mtime = None
+        self._lock = threading.Lock()
+        self._data = None
+        self._idx = None
+        self._names = None
+        # فراخوانی با هر رویداد ثبت‌شده (مثلاً به‌روزرسانی ویژگی‌های پیش‌بینی خرابی)
+        self.listeners: List[Callable[[Dict], None]] = []
+        self.logger = logging.getLogger("rathole-monitor")
+
+    # ----- names table -----
+    def _load_names(self):
+        try:
+            st = os.stat(self.names_path)
+        except OSError:
+            return
+        if self._names_mtime == (st.st_mtime_ns, st.st_size):
+            return
+        tunnels: Dict[str, int] = {}
+        types: Dict[str, int] = {}
+        with open(self.names_path, "r", encoding="utf-8") as f:
+            for line in f:
+                kind, _, name = line.rstrip("\n").partition(" ")
+                table = tunnels if kind == "t" else types if kind == "e" else None
+                # نام خالی ("t " برای رویدادهای بدون تانل) هم یک id دارد و باید شمرده شود
+                if table is not None and name not in table:
+                    table[name] = len(table)
+        self._tunnels, self._types = tunnels, types
+        self._names_mtime = (st.st_mtime_ns, st.st_size)
+
+    def _name_id(self, table: Dict[str, int], kind: str, name: str) -> int:
+        nid = table.get(name)
+        if nid is None:
+            nid = table[name] = len(table)
+            os.write(self._names, f"{kind} {name}\n".encode("utf-8"))
+        return nid
+
+    # ----- per-tunnel index -----
+    def _tunnel_idx_path(self, tid: int) -> str:
+        return os.path.join(self.tunnel_dir, f"{tid}.idx")
+
+    def _append_tunnel(self, tid: int, records: bytes):
+        fd = os.open(self._tunnel_idx_path(tid), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, records)
+        finally:
+            os.close(fd)
+
+    def _tunnel_tail(self, tid: int) -> int:
+        """offset آخرین رکورد ایندکس تانل (-1 اگر خالی)؛ رکورد نیمه‌کاره حذف می‌شود."""
+        path = self._tunnel_idx_path(tid)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return -1
+        whole = size - size % IDX_RECORD.size
+        if whole != size:
+            os.truncate(path, whole)
+        if not whole:
+            return -1
+        with open(path, "rb") as f:
+            f.seek(whole - IDX_RECORD.size)
+            return IDX_RECORD.unpack(f.read(IDX_RECORD.size))[1]
+
+    def _rebuild_tunnels(self):
+        """ساخت ایندکس همه تانل‌ها از events.idx (ژورنال قدیمی یا بعد از بازسازی کامل)."""
+        for entry in os.listdir(self.tunnel_dir):
+            os.unlink(os.path.join(self.tunnel_dir, entry))
+        empty = self._tunnels.get("")
+        grouped: Dict[int, List[bytes]] = {}
+        with open(self.idx_path, "rb") as f:
+            while True:
+                chunk = f.read(IDX_RECORD.size * 4096)
+                if not chunk:
+                    break
+                for i in range(0, len(chunk) - IDX_RECORD.size + 1, IDX_RECORD.size):
+                    rec = chunk[i:i + IDX_RECORD.size]
+                    tid = IDX_RECORD.unpack(rec)[2]
+                    if tid != empty:
+                        grouped.setdefault(tid, []).append(rec)
+        for tid, records in grouped.items():
+            self._append_tunnel(tid, b"".join(records))
+
+    # ----- writer -----
+    def open(self):
+        """باز کردن برای نوشتن + ترمیم ایندکس اگر با فایل داده همخوان نبود (مثلاً بعد از crash)."""
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+        with self._lock:
+            self._data = os.open(self.data_path, flags, 0o644)
+            self._idx = os.open(self.idx_path, (flags & ~os.O_WRONLY) | os.O_RDWR, 0o644)
+            self._names = os.open(self.names_path, flags, 0o644)
+            fcntl.flock(self._data, fcntl.LOCK_EX)
+            try:
+                self._load_names()
+                self._recover()
+            finally:
+                fcntl.flock(self._data, fcntl.LOCK_UN)
+
+    def _recover(self):
+        # ترتیب نوشتن: داده، ایندکس تانل، ایندکس اصلی؛ پس ایندکس تانل هیچ‌وقت از داده جلوتر نیست
+        rebuild_tunnels = not os.path.isdir(self.tunnel_dir)
+        os.makedirs(self.tunnel_dir, exist_ok=True)
+        data_size = os.fstat(self._data).st_size
+        idx_size = os.fstat(self._idx).st_size
+        whole = idx_size - idx_size % IDX_RECORD.size
+        if whole != idx_size:
+            os.ftruncate(self._idx, whole)
+        indexed_end = 0
+        if whole:
+            _ts, off, _t, _e = IDX_RECORD.unpack(os.pread(self._idx, IDX_RECORD.size, whole - IDX_RECORD.size))
+            if off >= data_size:
+                # ایندکس از داده جلوتر است → بازسازی کامل
+                os.ftruncate(self._idx, 0)
+                rebuild_tunnels = True
+            else:
+                with open(self.data_path, "rb") as f:
+                    f.seek(off)
+                    line = f.readline()
+                indexed_end = off + len(line)
+        if rebuild_tunnels:
+            self._rebuild_tunnels()
+        if indexed_end >= data_size:
+            return
+        # ایندکس خطوطی که بعد از آخرین رکورد ایندکس نوشته شده‌اند
+        self.logger.info("ترمیم ایندکس ژورنال رویدادها...")
+        records = []
+        with open(self.data_path, "rb") as df:
+            df.seek(indexed_end)
+            off = indexed_end
+            for line in df:
+                if not line.endswith(b"\n"):
+                    # خط نیمه‌کاره (crash وسط نوشتن) حذف می‌شود تا رویداد بعدی به آن نچسبد
+                    os.ftruncate(self._data, off)
+                    break
+                try:
+                    ev = json.loads(line)
+                    tunnel = ev.get("tunnel") or ""
+                    record = IDX_RECORD.pack(
+                        float(ev["ts"]), off,
+                        self._name_id(self._tunnels, "t", tunnel),
+                        self._name_id(self._types, "e", ev["type"]),
+                    )
+                    records.append(record)
+                    if tunnel:
+                        tid = self._tunnels[tunnel]
+                        if self._tunnel_tail(tid) < off:
+                            self._append_tunnel(tid, record)
+                except (ValueError, KeyError):
+                    pass
+                off += len(line)
+        os.write(self._idx, b"".join(records))
+
+    def emit(self, etype: str, tunnel: Optional[str] = None, **data):
+        ev = {"ts": round(time.time(), 3), "type": etype, "tunnel": tunnel or ""}
+        ev.update(data)
+        line = (json.dumps(ev, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            if self._data is None:
+                return
+            # قفل فایل: ممکن است منوی CLI و سرویس همزمان بنویسند
+            fcntl.flock(self._data, fcntl.LOCK_EX)
+            try:
+                self._load_names()
+                off = os.fstat(self._data).st_size
+                tid = self._name_id(self._tunnels, "t", ev["tunnel"])
+                record = IDX_RECORD.pack(ev["ts"], off, tid, self._name_id(self._types, "e", etype))
+                os.write(self._data, line)
+                if ev["tunnel"]:
+                    self._append_tunnel(tid, record)
+                os.write(self._idx, record)
+            except Exception as e:
+                self.logger.error(f"خطا در ثبت رویداد: {e}")
+            finally:
+                fcntl.flock(self._data, fcntl.LOCK_UN)
+        for listener in self.listeners:
+            try:
+                listener(ev)
+            except Exception as e:
+                self.logger.error(f"خطا در پردازش رویداد {etype}: {e}")
+
+    def close(self):
+        with self._lock:
+            for fd in (self._data, self._idx, self._names):
+                if fd is not None:
+                    os.close(fd)
+            self._data = self._idx = self._names = None
+
+    # ----- reader -----
+    def query(self, tunnel: Optional[str] = None, types: Optional[Iterable[str]] = None,
+              since: Optional[float] = None, until: Optional[float] = None, limit: int = 1000) -> List[Dict]:
+        """رویدادهای منطبق به ترتیب زمان (حداکثر limit مورد آخر)."""
+        with self._lock:
+            self._load_names()
+            tunnels, etypes = dict(self._tunnels), dict(self._types)
+        tid = None
+        if tunnel:
+            tid = tunnels.get(tunnel)
+            if tid is None:
+                return []
+        type_ids = None
+        if types:
+            type_ids = {etypes[t] for t in types if t in etypes}
+            if not type_ids:
+                return []
+        # ایندکس با mmap خوانده می‌شود: فقط صفحه‌هایی که جستجوی دودویی/بازه لمس می‌کند بارگذاری می‌شوند.
+        # پرس‌وجوی یک تانل از ایندکس همان تانل (اگر هنوز ساخته نشده، ایندکس اصلی با فیلتر)
+        path = self.idx_path
+        if tid is not None and os.path.exists(self._tunnel_idx_path(tid)):
+            path = self._tunnel_idx_path(tid)
+        try:
+            with open(path, "rb") as f:
+                raw = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return []
+        try:
+            return self._scan(raw, tid, type_ids, since, until, limit)
+        finally:
+            raw.close()
+
+    def _scan(self, raw, tid, type_ids, since, until, limit) -> List[Dict]:
+        n = len(raw) // IDX_RECORD.size
+        lo = self._bisect(raw, n, since) if since is not None else 0
+        hi = self._bisect(raw, n, until, right=True) if until is not None else n
+
+        offsets: List[int] = []
+        for i in range(hi - 1, lo - 1, -1):
+            _ts, off, t, e = IDX_RECORD.unpack_from(raw, i * IDX_RECORD.size)
+            if tid is not None and t != tid:
+                continue
+            if type_ids is not None and e not in type_ids:
+                continue
+            offsets.append(off)
+            if len(offsets) >= limit:
+                break
+        offsets.reverse()
+
+        out: List[Dict] = []
+        if not offsets:
+            return out
+        with open(self.data_path, "rb") as f:
+            for off in offsets:
+                f.seek(off)
+                try:
+                    out.append(json.loads(f.readline()))
+                except ValueError:
+                    continue
+        return out
+
+    @staticmethod
+    def _bisect(raw: bytes, n: int, ts: float, right: bool = False) -> int:
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mts = IDX_RECORD.unpack_from(raw, mid * IDX_RECORD.size)[0]
+            if mts < ts or (right and mts == ts):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
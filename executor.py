@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+اجرای دستورات خارجی (systemctl/journalctl) با سقف زمانی، kill گروه پردازه و سقف همزمانی
+
+- هر دستور در یک «کلاس» است و سقف زمانی همان کلاس را دارد (command_timeouts):
+  query = پرس‌وجوی وضعیت systemctl، journal = journalctl، action = start/stop/restart و ...
+- هر فرزند در process group خودش اجرا می‌شود؛ با عبور از سقف زمانی کل گروه SIGKILL می‌گیرد
+  تا نوه‌هایی که pipe خروجی را نگه داشته‌اند هم حلقه را معطل نکنند. returncode = 124
+- حداکثر max_concurrent_commands دستور همزمان (بقیه صبر می‌کنند)
+- دستورات فقط‌خواندنی (query/journal) بعد از timeout تا command_retries بار دوباره اجرا می‌شوند
+- با command_posix_spawn فرزند با os.posix_spawnp ساخته می‌شود (glibc از vfork استفاده
+  می‌کند) تا هزینه fork در پردازه‌ای با حافظه زیاد پرداخت نشود
+"""
+
+import os
+import time
+import signal
+import logging
+import selectors
+import subprocess
+import threading
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_COMMAND_TIMEOUTS = {"query": 10.0, "journal": 20.0, "action": 60.0, "default": 30.0}
+DEFAULT_MAX_CONCURRENT_COMMANDS = 8
+DEFAULT_COMMAND_RETRIES = 1
+COMMAND_CLASSES = tuple(DEFAULT_COMMAND_TIMEOUTS)
+TIMEOUT_RETURNCODE = 124
+
+# زیرفرمان‌های systemctl که فقط وضعیت می‌خوانند (تکرار آن‌ها بی‌خطر است)
+SYSTEMCTL_QUERIES = frozenset((
+    "is-active", "is-failed", "is-enabled", "show", "status", "list-units", "list-unit-files",
+))
+RETRYABLE_CLASSES = ("query", "journal")
+# فرصت خواندن باقی‌مانده خروجی بعد از kill
+KILL_GRACE_SECONDS = 2.0
+
+
+def classify(cmd: List[str]) -> str:
+    prog = os.path.basename(cmd[0]) if cmd else ""
+    if prog == "journalctl":
+        return "journal"
+    if prog == "systemctl":
+        sub = next((a for a in cmd[1:] if not a.startswith("-")), "")
+        return "query" if sub in SYSTEMCTL_QUERIES else "action"
+    return "default"
+
+
+def _exit_code(status: int) -> int:
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _killpg(pid: int):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+class CommandStats:
+    __slots__ = ("runs", "timeouts", "retries", "failures", "waited", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.runs = 0
+        self.timeouts = 0
+        self.retries = 0
+        # returncode غیرصفر یا اجرا نشدن (مثلاً دستور پیدا نشد)
+        self.failures = 0
+        # اجراهایی که به خاطر سقف همزمانی صبر کردند
+        self.waited = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def snapshot(self) -> Dict:
+        return {
+            "runs": self.runs,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "failures": self.failures,
+            "waited": self.waited,
+            "avg_ms": round(self.total_ms / self.runs, 1) if self.runs else 0.0,
+            "max_ms": round(self.max_ms, 1),
+        }
+
+
+class CommandExecutor:
+    def __init__(self, timeouts: Optional[Dict[str, float]] = None,
+                 max_concurrent: int = DEFAULT_MAX_CONCURRENT_COMMANDS,
+                 retries: int = DEFAULT_COMMAND_RETRIES,
+                 posix_spawn: bool = False):
+        self.logger = logging.getLogger("rathole-monitor")
+        self._lock = threading.Lock()
+        self._stats: Dict[str, CommandStats] = {}
+        self._in_flight = 0
+        self.configure(timeouts, max_concurrent, retries, posix_spawn)
+
+    @classmethod
+    def from_config(cls, cfg: Dict) -> "CommandExecutor":
+        ex = cls()
+        ex.apply_config(cfg)
+        return ex
+
+    def apply_config(self, cfg: Dict):
+        self.configure(
+            timeouts=cfg.get("command_timeouts") or {},
+            max_concurrent=cfg.get("max_concurrent_commands", DEFAULT_MAX_CONCURRENT_COMMANDS),
+            retries=cfg.get("command_retries", DEFAULT_COMMAND_RETRIES),
+            posix_spawn=cfg.get("command_posix_spawn", False),
+        )
+
+    def configure(self, timeouts: Optional[Dict[str, float]], max_concurrent: int, retries: int,
+                  posix_spawn: bool):
+        """تغییر تنظیمات در جا (آمار حفظ می‌شود؛ دستورات در حال اجرا با سمافور قبلی تمام می‌شوند)."""
+        merged = dict(DEFAULT_COMMAND_TIMEOUTS)
+        merged.update({k: float(v) for k, v in (timeouts or {}).items()})
+        self.timeouts = merged
+        self.max_concurrent = max(1, int(max_concurrent))
+        self._sem = threading.BoundedSemaphore(self.max_concurrent)
+        self.retries = max(0, int(retries))
+        self.posix_spawn = bool(posix_spawn) and hasattr(os, "posix_spawnp")
+
+    def run(self, cmd: List[str], cls: Optional[str] = None,
+            timeout: Optional[float] = None) -> subprocess.CompletedProcess:
+        cls = cls or classify(cmd)
+        if timeout is None:
+            timeout = self.timeouts.get(cls, self.timeouts["default"])
+        attempts = 1 + (self.retries if cls in RETRYABLE_CLASSES else 0)
+        for attempt in range(attempts):
+            sem = self._sem
+            waited = not sem.acquire(blocking=False)
+            if waited:
+                sem.acquire()
+            with self._lock:
+                self._in_flight += 1
+            started = time.monotonic()
+            try:
+                if self.posix_spawn:
+                    result, timed_out = self._run_spawn(cmd, timeout)
+                else:
+                    result, timed_out = self._run_popen(cmd, timeout)
+            finally:
+                sem.release()
+            took = (time.monotonic() - started) * 1000
+            with self._lock:
+                self._in_flight -= 1
+                st = self._stats.get(cls)
+                if st is None:
+                    st = self._stats[cls] = CommandStats()
+                st.runs += 1
+                st.total_ms += took
+                st.max_ms = max(st.max_ms, took)
+                st.waited += waited
+                st.retries += attempt > 0
+                st.timeouts += timed_out
+                st.failures += result.returncode != 0 and not timed_out
+            if not timed_out:
+                return result
+            retry = attempt + 1 < attempts
+            self.logger.warning(
+                f"دستور {' '.join(cmd)} بعد از {timeout:g} ثانیه پاسخ نداد و گروه پردازه‌اش kill شد"
+                + ("؛ تلاش دوباره" if retry else "")
+            )
+        return result
+
+    def _run_popen(self, cmd: List[str], timeout: float) -> Tuple[subprocess.CompletedProcess, bool]:
+        try:
+            proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE, encoding="utf-8", errors="replace",
+                                    start_new_session=True)
+        except OSError as e:
+            return subprocess.CompletedProcess(cmd, 127, "", str(e)), False
+        try:
+            out, err = proc.communicate(timeout=timeout)
+            return subprocess.CompletedProcess(cmd, proc.returncode, out, err), False
+        except subprocess.TimeoutExpired:
+            _killpg(proc.pid)
+            try:
+                out, _err = proc.communicate(timeout=KILL_GRACE_SECONDS)
+            except subprocess.TimeoutExpired:
+                # فرزندی که session خودش را ساخته هنوز pipe را نگه داشته است
+                proc.stdout.close()
+                proc.stderr.close()
+                proc.wait()
+                out = ""
+            return subprocess.CompletedProcess(cmd, TIMEOUT_RETURNCODE, out or "",
+                                               f"timeout after {timeout:g}s"), True
+
+    def _run_spawn(self, cmd: List[str], timeout: float) -> Tuple[subprocess.CompletedProcess, bool]:
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        try:
+            pid = os.posix_spawnp(cmd[0], cmd, os.environ, file_actions=[
+                (os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0),
+                (os.POSIX_SPAWN_DUP2, out_w, 1),
+                (os.POSIX_SPAWN_DUP2, err_w, 2),
+            ], setpgroup=0)
+        except OSError as e:
+            os.close(out_r)
+            os.close(err_r)
+            return subprocess.CompletedProcess(cmd, 127, "", str(e)), False
+        finally:
+            os.close(out_w)
+            os.close(err_w)
+
+        chunks: Dict[int, List[bytes]] = {out_r: [], err_r: []}
+        deadline = time.monotonic() + timeout
+        timed_out = False
+        with selectors.DefaultSelector() as sel:
+            sel.register(out_r, selectors.EVENT_READ)
+            sel.register(err_r, selectors.EVENT_READ)
+            while sel.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    if timed_out:
+                        break
+                    timed_out = True
+                    _killpg(pid)
+                    deadline = time.monotonic() + KILL_GRACE_SECONDS
+                    continue
+                for key, _ in sel.select(remaining):
+                    data = os.read(key.fd, 65536)
+                    if data:
+                        chunks[key.fd].append(data)
+                    else:
+                        sel.unregister(key.fd)
+        os.close(out_r)
+        os.close(err_r)
+        _, status = os.waitpid(pid, 0)
+        out = b"".join(chunks[out_r]).decode("utf-8", "replace")
+        err = b"".join(chunks[err_r]).decode("utf-8", "replace")
+        if timed_out:
+            return subprocess.CompletedProcess(cmd, TIMEOUT_RETURNCODE, out, f"timeout after {timeout:g}s"), True
+        return subprocess.CompletedProcess(cmd, _exit_code(status), out, err), False
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "max_concurrent": self.max_concurrent,
+                "spawn": "posix_spawn" if self.posix_spawn else "fork",
+                "classes": {cls: st.snapshot() for cls, st in sorted(self._stats.items())},
+            }
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+پایپ‌لاین بررسی سلامت تانل‌ها با چک‌های افزونه‌ای (plugin)
+
+هر چک یک کلاس با نام یکتا، هزینه (cost) و TTL کش است و با @register_check ثبت می‌شود؛
+اضافه کردن نوع جدید نیازی به تغییر RatholeMonitor ندارد. چک‌ها به ترتیب هزینه اجرا
+می‌شوند و اولین شکست، اجرای چک‌های گران‌تر را متوقف می‌کند. نتیجه هر چک تا پایان
+TTL خودش از کش خوانده می‌شود و زمان اجرای هر چک جداگانه ثبت می‌شود.
+
+تعریف در config:
+    "health_checks": ["systemd", "log_patterns", {"type": "tcp_probe", "ttl": 30}]
+    "tunnel_health_checks": {"rathole-iran-*": ["systemd", "process"]}
+"""
+
+import os
+import json
+import time
+import socket
+import fnmatch
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple, Type, Union
+
+from tunnel_config import load_tunnel_toml, remote_endpoint, split_addr, tunnel_ports
+
+DEFAULT_HEALTH_CHECKS = ["systemd", "log_patterns"]
+
+CheckSpec = Union[str, Dict]
+
+CHECK_TYPES: Dict[str, Type["HealthCheck"]] = {}
+
+
+def register_check(cls: Type["HealthCheck"]) -> Type["HealthCheck"]:
+    """ثبت یک نوع چک جدید (قابل استفاده به‌عنوان decorator)."""
+    CHECK_TYPES[cls.name] = cls
+    return cls
+
+
+class CheckResult:
+    __slots__ = ("check", "ok", "detail", "duration", "ts")
+
+    def __init__(self, check: str, ok: bool, detail: str, duration: float, ts: float):
+        self.check = check
+        self.ok = ok
+        self.detail = detail
+        self.duration = duration
+        self.ts = ts
+
+    def to_dict(self) -> Dict:
+        return {"ok": self.ok, "detail": self.detail, "ms": round(self.duration * 1000, 2), "ts": int(self.ts)}
+
+
+class HealthCheck:
+    """کلاس پایه؛ run باید (ok, detail) برگرداند. monitor همان RatholeMonitor است."""
+
+    name = ""
+    cost = 0            # عدد کمتر = ارزان‌تر = زودتر اجرا می‌شود
+    default_ttl = 0.0   # ثانیه؛ ۰ یعنی هر بار اجرا شود
+
+    def __init__(self, params: Optional[Dict] = None):
+        self.params = dict(params or {})
+        self.ttl = float(self.params.get("ttl", self.default_ttl))
+        self.cost = int(self.params.get("cost", self.cost))
+
+    def run(self, monitor, tunnel: Dict) -> Tuple[bool, str]:
+        raise NotImplementedError
+
+    def peek(self, monitor, tunnel: Dict) -> Tuple[bool, str]:
+        """مثل run ولی بدون تغییر وضعیت بلندمدت (برای چک دستی از CLI)؛ پیش‌فرض همان run."""
+        return self.run(monitor, tunnel)
+
+
+# ----- Built-in checks -----
+@register_check
+class SystemdCheck(HealthCheck):
+    name = "systemd"
+    cost = 0
+
+    def run(self, monitor, tunnel):
+        name = tunnel["name"]
+        if not monitor.is_active(name):
+            monitor.logger.warning(f"سرویس {name} active نیست")
+            tunnel["status"] = "inactive"
+            return False, "inactive"
+        tunnel["status"] = "active"
+        return True, "active"
+
+
+@register_check
+class LogPatternCheck(HealthCheck):
+    name = "log_patterns"
+    cost = 10
+
+    def run(self, monitor, tunnel, peek: bool = False):
+        name = tunnel["name"]
+        reason = monitor.log_error_reason(name, peek=peek)
+        if reason:
+            monitor.logger.warning(f"خطای لاگ سرویس {name}: {reason}")
+            return False, reason
+        return True, ""
+
+    def peek(self, monitor, tunnel):
+        # cursor journal و baseline خطا فقط در دور مانیتور جلو می‌روند
+        return self.run(monitor, tunnel, peek=True)
+
+
+@register_check
+class TcpProbeCheck(HealthCheck):
+    """اتصال TCP به target (پارامتر) یا به remote_addr/bind_addr کانفیگ تانل."""
+
+    name = "tcp_probe"
+    cost = 20
+    default_ttl = 30.0
+
+    def _target(self, tunnel: Dict) -> Optional[Tuple[str, int]]:
+        if self.params.get("target"):
+            return split_addr(str(self.params["target"]))
+        cfg = load_tunnel_toml(tunnel.get("config_path"))
+        ep = remote_endpoint(cfg)
+        if ep:
+            return ep
+        ports = tunnel_ports(cfg)
+        return ("127.0.0.1", ports[0]) if ports else None
+
+    def run(self, monitor, tunnel):
+        target = self._target(tunnel)
+        if not target:
+            return True, "no target"
+        try:
+            with socket.create_connection(target, timeout=float(self.params.get("timeout", 3))):
+                return True, f"{target[0]}:{target[1]}"
+        except OSError as e:
+            return False, f"{target[0]}:{target[1]} {e}"
+
+
+def _main_pid(tunnel: Dict) -> int:
+    try:
+        return int(tunnel.get("pid") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+@register_check
+class ProcessCheck(HealthCheck):
+    """مصرف CPU (درصد بین دو نمونه) و RSS پروسه اصلی از /proc."""
+
+    name = "process"
+    cost = 30
+    default_ttl = 60.0
+
+    _clk = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+    _page = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def __init__(self, params=None):
+        super().__init__(params)
+        self._prev: Dict[str, Tuple[float, float]] = {}
+
+    def run(self, monitor, tunnel):
+        pid = _main_pid(tunnel)
+        if not pid:
+            return True, "no pid"
+        try:
+            with open(f"/proc/{pid}/stat", "r") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{pid}/statm", "r") as f:
+                rss = int(f.read().split()[1]) * self._page
+        except (OSError, IndexError, ValueError):
+            return True, "no proc"
+        cpu_sec = (int(fields[11]) + int(fields[12])) / self._clk  # utime + stime
+        now = time.monotonic()
+        prev = self._prev.get(tunnel["name"])
+        self._prev[tunnel["name"]] = (now, cpu_sec)
+        cpu_pct = 0.0
+        if prev and now > prev[0]:
+            cpu_pct = 100.0 * (cpu_sec - prev[1]) / (now - prev[0])
+
+        max_rss = self.params.get("max_rss_mb")
+        if max_rss is not None and rss > float(max_rss) * 1024 * 1024:
+            return False, f"rss {rss // (1024 * 1024)}MB"
+        max_cpu = self.params.get("max_cpu_percent")
+        if max_cpu is not None and cpu_pct > float(max_cpu):
+            return False, f"cpu {cpu_pct:.1f}%"
+        return True, f"cpu {cpu_pct:.1f}% rss {rss // (1024 * 1024)}MB"
+
+
+@register_check
+class SocketCountCheck(HealthCheck):
+    """تعداد سوکت‌های باز پروسه اصلی (از /proc/<pid>/fd)."""
+
+    name = "sockets"
+    cost = 30
+    default_ttl = 60.0
+
+    def run(self, monitor, tunnel):
+        pid = _main_pid(tunnel)
+        if not pid:
+            return True, "no pid"
+        fd_dir = f"/proc/{pid}/fd"
+        count = 0
+        try:
+            for fd in os.listdir(fd_dir):
+                try:
+                    if os.readlink(f"{fd_dir}/{fd}").startswith("socket:"):
+                        count += 1
+                except OSError:
+                    continue
+        except OSError:
+            return True, "no proc"
+        lo = self.params.get("min_sockets")
+        hi = self.params.get("max_sockets")
+        if lo is not None and count < int(lo):
+            return False, f"{count} sockets < {lo}"
+        if hi is not None and count > int(hi):
+            return False, f"{count} sockets > {hi}"
+        return True, f"{count} sockets"
+
+
+# ----- Pipeline -----
+class HealthPipeline:
+    def __init__(self, specs: List[CheckSpec]):
+        checks: List[HealthCheck] = []
+        for spec in specs:
+            if isinstance(spec, str):
+                ctype, params = spec, {}
+            elif isinstance(spec, dict):
+                ctype, params = spec.get("type", ""), spec
+            else:
+                raise ValueError(f"invalid health check spec: {spec!r}")
+            cls = CHECK_TYPES.get(ctype)
+            if cls is None:
+                raise ValueError(f"unknown health check type: {ctype}")
+            checks.append(cls(params))
+        # sorted پایدار است؛ چک‌های هم‌هزینه ترتیب config را حفظ می‌کنند
+        self.checks = sorted(checks, key=lambda c: c.cost)
+        # کلید کش (تانل، جایگاه چک)؛ دو چک هم‌نوع (مثلاً دو tcp_probe) نتیجه هم را برنمی‌گردانند
+        self._cache: Dict[Tuple[str, int], CheckResult] = {}
+        self.stats: Dict[str, List[float]] = {}  # name → [runs, total_sec, failures, cache_hits]
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger("rathole-monitor")
+
+    def _stat(self, name: str) -> List[float]:
+        st = self.stats.get(name)
+        if st is None:
+            st = self.stats[name] = [0, 0.0, 0, 0]
+        return st
+
+    def evaluate(self, monitor, tunnel: Dict, peek: bool = False) -> Tuple[bool, List[CheckResult]]:
+        """peek=True: چک‌ها با HealthCheck.peek اجرا می‌شوند و نتیجه در کش نوشته نمی‌شود."""
+        results: List[CheckResult] = []
+        name = tunnel["name"]
+        for i, check in enumerate(self.checks):
+            key = (name, i)
+            now = time.time()
+            cached = self._cache.get(key)
+            if cached is not None and check.ttl > 0 and now - cached.ts < check.ttl:
+                with self._lock:
+                    self._stat(check.name)[3] += 1
+                res = cached
+            else:
+                t0 = time.perf_counter()
+                try:
+                    ok, detail = check.peek(monitor, tunnel) if peek else check.run(monitor, tunnel)
+                except Exception as e:
+                    self.logger.error(f"خطا در چک {check.name} برای {name}: {e}")
+                    ok, detail = True, f"error: {e}"  # خطای خود چک دلیل ریستارت نیست
+                res = CheckResult(check.name, bool(ok), detail, time.perf_counter() - t0, now)
+                if not peek:
+                    self._cache[key] = res
+                with self._lock:
+                    st = self._stat(check.name)
+                    st[0] += 1
+                    st[1] += res.duration
+                    if not res.ok:
+                        st[2] += 1
+            results.append(res)
+            if not res.ok:
+                # چک‌های گران‌تر اجرا نمی‌شوند
+                return False, results
+        return True, results
+
+    def forget(self, tunnel_name: str):
+        for key in [k for k in self._cache if k[0] == tunnel_name]:
+            del self._cache[key]
+
+    def stats_snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                name: {"runs": int(st[0]), "avg_ms": round(st[1] / st[0] * 1000, 3) if st[0] else 0.0,
+                       "failures": int(st[2]), "cache_hits": int(st[3])}
+                for name, st in self.stats.items()
+            }
+
+
+class HealthPipelines:
+    """انتخاب پایپ‌لاین هر تانل بر اساس tunnel_health_checks (اولین glob منطبق) یا پیش‌فرض."""
+
+    def __init__(self, default_specs: List[CheckSpec], per_tunnel: Optional[Dict[str, List[CheckSpec]]] = None):
+        self.default = HealthPipeline(default_specs or DEFAULT_HEALTH_CHECKS)
+        self.rules: List[Tuple[str, HealthPipeline]] = [
+            (pattern, HealthPipeline(specs)) for pattern, specs in (per_tunnel or {}).items()
+        ]
+        self._resolved: Dict[str, HealthPipeline] = {}
+        # پایپ‌لاین‌های سیاست‌های اختصاصی (policy.py)، یکی برای هر لیست چک متمایز
+        self._by_specs: Dict[str, HealthPipeline] = {}
+
+    @classmethod
+    def from_config(cls, cfg: Dict) -> "HealthPipelines":
+        return cls(cfg.get("health_checks") or DEFAULT_HEALTH_CHECKS, cfg.get("tunnel_health_checks") or {})
+
+    def for_tunnel(self, name: str) -> HealthPipeline:
+        p = self._resolved.get(name)
+        if p is None:
+            p = self.default
+            for pattern, pipeline in self.rules:
+                if fnmatch.fnmatchcase(name, pattern):
+                    p = pipeline
+                    break
+            self._resolved[name] = p
+        return p
+
+    def for_specs(self, specs: List[CheckSpec]) -> HealthPipeline:
+        key = json.dumps(specs, sort_keys=True)
+        p = self._by_specs.get(key)
+        if p is None:
+            p = self._by_specs[key] = HealthPipeline(specs)
+        return p
+
+    def forget(self, tunnel_name: str):
+        """پاک کردن نتایج کش‌شده تانل در همه پایپ‌لاین‌ها (بعد از ترمیم، نتیجه قبلی معتبر نیست)."""
+        for p in [self.default] + [p for _, p in self.rules] + list(self._by_specs.values()):
+            p.forget(tunnel_name)
+
+    def stats_snapshot(self) -> Dict[str, Dict]:
+        merged: Dict[str, Dict] = {}
+        for p in [self.default] + [p for _, p in self.rules] + list(self._by_specs.values()):
+            for name, st in p.stats_snapshot().items():
+                m = merged.setdefault(name, {"runs": 0, "total_ms": 0.0, "failures": 0, "cache_hits": 0})
+                m["runs"] += st["runs"]
+                m["total_ms"] += st["avg_ms"] * st["runs"]
+                m["failures"] += st["failures"]
+                m["cache_hits"] += st["cache_hits"]
+        for m in merged.values():
+            m["avg_ms"] = round(m.pop("total_ms") / m["runs"], 3) if m["runs"] else 0.0
+        return merged
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+ردیابی وضعیت سلامت هر تانل با hysteresis و تشخیص flap
+
+- یک نمونه ناموفق به‌تنهایی باعث ریستارت نمی‌شود: تانل وقتی «ناسالم» اعلام می‌شود که
+  حداقل health_fail_threshold نمونه از health_sample_window نمونه آخر ناموفق باشند.
+  بعد از هر نمونه ناموفق تاییدنشده، چک بعدی زودتر (health_recheck_seconds) انجام می‌شود.
+- برگشت به «سالم» بعد از health_recover_samples نمونه موفق پشت سر هم.
+- امتیاز سلامت = میانگین نمایی وزن‌دار (EWMA) نمونه‌ها، بین ۰ و ۱ (فقط برای گزارش).
+- اگر در flap_window_seconds حداقل flap_threshold بار سالم→ناسالم رخ دهد، تانل
+  flapping است و قرنطینه می‌شود: حداکثر یک ترمیم در هر quarantine_seconds، تا وقتی
+  یک flap_window کامل بدون افت بگذرد.
+"""
+
+import time
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+DEFAULT_HEALTH_FAIL_THRESHOLD = 2      # N نمونه ناموفق ...
+DEFAULT_HEALTH_SAMPLE_WINDOW = 3       # ... از M نمونه آخر
+DEFAULT_HEALTH_RECOVER_SAMPLES = 2
+DEFAULT_HEALTH_RECHECK_SECONDS = 15
+DEFAULT_HEALTH_EWMA_ALPHA = 0.3
+DEFAULT_FLAP_WINDOW_SECONDS = 3600
+DEFAULT_FLAP_THRESHOLD = 4
+DEFAULT_QUARANTINE_SECONDS = 1800
+
+STATE_HEALTHY = "healthy"
+STATE_SUSPECT = "suspect"
+STATE_UNHEALTHY = "unhealthy"
+
+
+class TunnelHealth:
+    __slots__ = ("samples", "score", "state", "ok_streak", "drops", "quarantined", "last_remediation")
+
+    def __init__(self):
+        self.samples: deque = deque()
+        self.score = 1.0
+        self.state = STATE_HEALTHY
+        self.ok_streak = 0
+        # زمان (monotonic) گذارهای سالم→ناسالم در پنجره flap
+        self.drops: deque = deque()
+        self.quarantined = False
+        self.last_remediation: Optional[float] = None
+
+    def snapshot(self) -> Dict:
+        return {
+            "state": self.state,
+            "score": round(self.score, 3),
+            "failed_samples": sum(1 for ok in self.samples if not ok),
+            "flaps": len(self.drops),
+            "quarantined": self.quarantined,
+        }
+
+
+class HealthTracker:
+    def __init__(self):
+        self._tunnels: Dict[str, TunnelHealth] = {}
+
+    def get(self, name: str) -> TunnelHealth:
+        th = self._tunnels.get(name)
+        if th is None:
+            th = self._tunnels[name] = TunnelHealth()
+        return th
+
+    def observe(self, name: str, ok: bool, settings, now: Optional[float] = None) -> TunnelHealth:
+        """ثبت یک نمونه و به‌روزرسانی وضعیت؛ settings = تنظیمات (سیاست) همان تانل."""
+        now = time.monotonic() if now is None else now
+        th = self.get(name)
+        th.samples.append(ok)
+        while len(th.samples) > settings.health_sample_window:
+            th.samples.popleft()
+        alpha = settings.health_ewma_alpha
+        th.score = alpha * (1.0 if ok else 0.0) + (1 - alpha) * th.score
+
+        window = settings.flap_window_seconds
+        while th.drops and now - th.drops[0] > window:
+            th.drops.popleft()
+
+        if ok:
+            th.ok_streak += 1
+            if th.state == STATE_SUSPECT:
+                th.state = STATE_HEALTHY
+            elif th.state == STATE_UNHEALTHY and th.ok_streak >= settings.health_recover_samples:
+                th.state = STATE_HEALTHY
+                # شکست‌های قبل از بهبود نباید با یک خطای گذرای بعدی جمع شوند
+                th.samples.clear()
+        else:
+            th.ok_streak = 0
+            failed = sum(1 for s in th.samples if not s)
+            if failed >= settings.health_fail_threshold:
+                if th.state != STATE_UNHEALTHY:
+                    th.drops.append(now)
+                th.state = STATE_UNHEALTHY
+            elif th.state == STATE_HEALTHY:
+                th.state = STATE_SUSPECT
+
+        if len(th.drops) >= settings.flap_threshold:
+            th.quarantined = True
+        elif th.quarantined and not th.drops:
+            th.quarantined = False
+        return th
+
+    def may_remediate(self, name: str, settings, now: Optional[float] = None) -> bool:
+        """در قرنطینه، ترمیم فقط هر quarantine_seconds یک بار مجاز است."""
+        th = self.get(name)
+        if not th.quarantined or th.last_remediation is None:
+            return True
+        now = time.monotonic() if now is None else now
+        return now - th.last_remediation >= settings.quarantine_seconds
+
+    def remediated(self, name: str, now: Optional[float] = None):
+        self.get(name).last_remediation = time.monotonic() if now is None else now
+
+    def retain(self, names: Iterable[str]):
+        keep = set(names)
+        for name in [n for n in self._tunnels if n not in keep]:
+            del self._tunnels[name]
@@ -105,7 +105,9 @@ make_dirs() {
 # کپی فایل‌ها
 copy_files() {
   info "کپی فایل‌ها به $MONITOR_DIR ..."
-  local need=("monitor.py" "web_server.py" "web_panel.html")
+  # ماژول‌های کمکی که monitor.py از آن‌ها import می‌کند
+  local modules=("log_setup.py" "restart_budget.py" "restart_state.py" "tunnel_config.py" "correlation.py" "health_checks.py" "cgroup_stats.py" "conn_stats.py" "traffic.py" "event_journal.py" "settings.py" "config_watch.py" "policy.py" "tunnel_deps.py" "health_state.py" "log_anomaly.py" "control.py" "cli.py" "error_patterns.py" "systemd_notify.py" "executor.py" "predictor.py" "maintenance.py" "notifications.py" "slo.py")
+  local need=("monitor.py" "web_server.py" "web_panel.html" "aggregator.py" "fleet_panel.html" "${modules[@]}")
   for f in "${need[@]}"; do
     if [[ ! -f "./$f" ]]; then
       err "فایل یافت نشد: ./$f — لطفاً این فایل را کنار install.sh قرار دهید"
@@ -115,8 +117,14 @@ copy_files() {
   cp -f ./monitor.py "$MONITOR_DIR/monitor.py"
   cp -f ./web_server.py "$MONITOR_DIR/web_server.py"
   cp -f ./web_panel.html "$MONITOR_DIR/web_panel.html"
-  chmod +x "$MONITOR_DIR/monitor.py" "$MONITOR_DIR/web_server.py"
-  chmod 644 "$MONITOR_DIR/web_panel.html"
+  cp -f ./aggregator.py "$MONITOR_DIR/aggregator.py"
+  cp -f ./fleet_panel.html "$MONITOR_DIR/fleet_panel.html"
+  for f in "${modules[@]}"; do
+    cp -f "./$f" "$MONITOR_DIR/$f"
+    chmod 644 "$MONITOR_DIR/$f"
+  done
+  chmod +x "$MONITOR_DIR/monitor.py" "$MONITOR_DIR/web_server.py" "$MONITOR_DIR/aggregator.py"
+  chmod 644 "$MONITOR_DIR/web_panel.html" "$MONITOR_DIR/fleet_panel.html"
   ok "فایل‌ها کپی شدند"
 }
 
@@ -139,6 +147,43 @@ create_config() {
   "log_level": "INFO",
   "restart_on_inactive": true,
   "journal_since_seconds": 300,
+  "log_max_bytes": 10485760,
+  "log_backup_count": 5,
+  "log_rotate_when": "",
+  "log_compress": true,
+  "log_json": false,
+  "log_dedup_seconds": 300,
+  "global_restart_rate": 6,
+  "global_restart_burst": 3,
+  "max_concurrent_restarts": 2,
+  "restart_jitter_seconds": 5,
+  "tunnel_priorities": {},
+  "correlation_window_seconds": 600,
+  "correlation_min_failures": 2,
+  "correlation_min_fraction": 0.6,
+  "correlation_default_probe": "",
+  "health_checks": ["systemd", "log_patterns"],
+  "tunnel_health_checks": {},
+  "ignored_error_patterns": [],
+  "critical_error_patterns": [],
+  "log_anomaly_detection": true,
+  "log_pattern_weights": {},
+  "health_fail_threshold": 2,
+  "health_sample_window": 3,
+  "health_recover_samples": 2,
+  "health_recheck_seconds": 15,
+  "flap_window_seconds": 3600,
+  "flap_threshold": 4,
+  "quarantine_seconds": 1800,
+  "cgroup_telemetry": true,
+  "resource_limits": {},
+  "connection_telemetry": true,
+  "traffic_accounting": true,
+  "traffic_history": 60,
+  "tunnel_tags": {},
+  "tunnel_policies": [],
+  "tunnel_groups": {},
+  "tunnel_dependencies": {},
   "notification": {
     "enabled": false,
     "webhook_url": "",
@@ -161,11 +206,15 @@ After=network.target network-online.target
 Wants=network-online.target
 
 [Service]
-Type=simple
+Type=notify
+NotifyAccess=main
+# دو برابر بدترین زمان یک ریستارت با سقف‌های پیش‌فرض: 2 × (stop 60 + restart_delay 10 + start 60 + is-active 2×10)
+WatchdogSec=300
 User=root
 Group=root
 WorkingDirectory=${MONITOR_DIR}
 ExecStart=/usr/bin/python3 ${MONITOR_DIR}/monitor.py --daemon
+ExecReload=/bin/kill -HUP \$MAINPID
 Restart=always
 RestartSec=10
 Environment=PYTHONUNBUFFERED=1
@@ -278,6 +327,12 @@ EOF
 #!/usr/bin/env bash
 cd /root/rathole-monitor
 python3 web_server.py
+EOF
+
+  cat > "$MONITOR_DIR/scripts/tunnels.sh" << 'EOF'
+#!/usr/bin/env bash
+# وضعیت/ریستارت/لاگ تانل‌ها از سرویس در حال اجرا (مثلاً: tunnels.sh status --json)
+exec python3 /root/rathole-monitor/cli.py "${@:-status}"
 EOF
 
   cat > "$MONITOR_DIR/scripts/menu.sh" << 'EOF'
@@ -294,6 +349,7 @@ EOF
   ln -sf "$MONITOR_DIR/scripts/logs.sh"    "$MONITOR_DIR/logs.sh"
   ln -sf "$MONITOR_DIR/scripts/web.sh"     "$MONITOR_DIR/web.sh"
   ln -sf "$MONITOR_DIR/scripts/menu.sh"    "$MONITOR_DIR/menu.sh"
+  ln -sf "$MONITOR_DIR/scripts/tunnels.sh" "$MONITOR_DIR/tunnels.sh"
   ok "اسکریپت‌ها آماده شدند"
 }
 
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+امتیازدهی ناهنجاری لاگ بر اساس نرخ خطا (به‌جای «هر برخورد = خرابی»)
+
+برای هر تانل فقط خطوط جدید journal از آخرین cursor خوانده می‌شود (جریان پیوسته، بدون
+شمارش دوباره). در هر نمونه:
+- score = مجموع وزن الگوهای منطبق تقسیم بر دقیقه (وزن پیش‌فرض ۱، از log_pattern_weights)
+- میانگین و واریانس نمایی (EWMA) score و نرخ کل خطوط به‌عنوان خط پایه خود همان تانل
+- حلقه ثابت LOG_BASELINE_RING نمونه آخر برای صدک ۹۵ خط پایه
+
+تانل فقط وقتی ناسالم است که score حداقل log_anomaly_min_score باشد و از
+mean + log_anomaly_z × std و (بعد از log_anomaly_warmup نمونه) از صدک ۹۵ خط پایه بیشتر باشد.
+std حداقل به اندازه نویز پواسون شمارش (sqrt(mean / دقیقه)) در نظر گرفته می‌شود تا چند
+نمونه آرام اول آستانه را بی‌جهت پایین نیاورند. نمونه‌های ناهنجار فقط با وزن یک‌چهارم وارد
+میانگین (و نه واریانس) می‌شوند: یک قطعی کوتاه خط پایه را جابه‌جا نمی‌کند ولی سطح جدید پایدار به‌تدریج عادی
+می‌شود. حافظه هر تانل ثابت است (چند عدد + یک آرایه).
+"""
+
+import math
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_LOG_ANOMALY_ALPHA = 0.1
+DEFAULT_LOG_ANOMALY_Z = 3.0
+DEFAULT_LOG_ANOMALY_MIN_SCORE = 1.0    # امتیاز وزن‌دار در دقیقه
+DEFAULT_LOG_ANOMALY_WARMUP = 5         # نمونه
+
+LOG_BASELINE_RING = 64
+
+
+class LogStats:
+    __slots__ = ("cursor", "last_read", "samples", "normal", "mean", "var", "rate_mean", "ring", "ring_pos",
+                 "last_score", "last_rate", "last_hits", "level")
+
+    def __init__(self):
+        self.cursor: Optional[str] = None
+        self.last_read: Optional[float] = None
+        self.samples = 0
+        # تعداد نمونه‌های غیرناهنجار ثبت‌شده در ring
+        self.normal = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.rate_mean = 0.0
+        self.ring = array("d", bytes(8 * LOG_BASELINE_RING))
+        self.ring_pos = 0
+        self.last_score = 0.0
+        self.last_rate = 0.0
+        self.last_hits: Tuple[Tuple[str, int], ...] = ()
+        # آخرین سطح ثبت‌شده نرخ خطا در ژورنال (predictor.rate_level)
+        self.level = -1
+
+    def copy(self) -> "LogStats":
+        """کپی مستقل (برای ارزیابی بدون جابه‌جا کردن cursor و baseline)."""
+        st = LogStats.__new__(LogStats)
+        for name in self.__slots__:
+            setattr(st, name, getattr(self, name))
+        st.ring = array("d", self.ring)
+        return st
+
+    def p95(self) -> float:
+        n = min(self.normal, LOG_BASELINE_RING)
+        if not n:
+            return 0.0
+        values = sorted(self.ring[:n])
+        return values[min(n - 1, int(math.ceil(0.95 * n)) - 1)]
+
+    def snapshot(self) -> Dict:
+        return {
+            "score": round(self.last_score, 3),
+            "lines_per_min": round(self.last_rate, 1),
+            "lines_baseline": round(self.rate_mean, 1),
+            "baseline": round(self.mean, 3),
+            "std": round(math.sqrt(self.var), 3),
+            "p95": round(self.p95(), 3),
+            "samples": self.samples,
+            "hits": dict(self.last_hits),
+        }
+
+
+class LogAnomalyDetector:
+    def __init__(self):
+        self._tunnels: Dict[str, LogStats] = {}
+
+    def get(self, name: str) -> LogStats:
+        st = self._tunnels.get(name)
+        if st is None:
+            st = self._tunnels[name] = LogStats()
+        return st
+
+    def peek(self, name: str) -> Optional[LogStats]:
+        return self._tunnels.get(name)
+
+    @staticmethod
+    def count(lines: Iterable[str], ignored: Iterable[str],
+              patterns: Iterable[Tuple[str, str, float]]) -> Tuple[int, float, List[Tuple[str, int]]]:
+        """(تعداد خطوط، امتیاز وزن‌دار، [(الگو، تعداد خطوط منطبق)]) ؛ خطوط باید lowercase باشند."""
+        patterns = tuple(patterns)
+        ignored = tuple(ignored)
+        hits = [0] * len(patterns)
+        total = 0
+        for line in lines:
+            total += 1
+            for ign in ignored:
+                if ign in line:
+                    line = line.replace(ign, "")
+            for i, (_orig, lower, _w) in enumerate(patterns):
+                if lower in line:
+                    hits[i] += 1
+        score = sum(h * w for h, (_o, _l, w) in zip(hits, patterns))
+        return total, score, [(p[0], h) for p, h in zip(patterns, hits) if h]
+
+    def observe(self, name: str, total: int, score: float, hits: List[Tuple[str, int]],
+                minutes: float, settings, stats: Optional[LogStats] = None) -> Tuple[bool, str]:
+        """ثبت یک نمونه در stats (پیش‌فرض: آمار ذخیره‌شده تانل)؛ خروجی (ناهنجار؟، توضیح)."""
+        st = stats if stats is not None else self.get(name)
+        minutes = max(minutes, 1.0 / 60)
+        rate = score / minutes
+        st.last_score = rate
+        st.last_rate = total / minutes
+        st.last_hits = tuple(hits)
+
+        std = max(math.sqrt(st.var), math.sqrt(st.mean / minutes))
+        threshold = max(settings.log_anomaly_min_score, st.mean + settings.log_anomaly_z * std)
+        if st.samples >= settings.log_anomaly_warmup:
+            threshold = max(threshold, st.p95())
+        anomalous = rate >= threshold and rate > 0
+        reason = ""
+        if anomalous:
+            top = ", ".join(f"{p}×{n}" for p, n in sorted(hits, key=lambda x: -x[1])[:3])
+            reason = f"error rate {rate:.2f}/min > baseline {st.mean:.2f}±{std:.2f} ({top})"
+
+        alpha = settings.log_anomaly_alpha / 4 if anomalous else settings.log_anomaly_alpha
+        if st.samples == 0:
+            st.mean, st.rate_mean = rate, st.last_rate
+        else:
+            diff = rate - st.mean
+            incr = alpha * diff
+            st.mean += incr
+            if not anomalous:
+                st.var = (1 - alpha) * (st.var + diff * incr)
+            st.rate_mean += alpha * (st.last_rate - st.rate_mean)
+        if not anomalous:
+            st.ring[st.ring_pos] = rate
+            st.ring_pos = (st.ring_pos + 1) % LOG_BASELINE_RING
+            st.normal += 1
+        st.samples += 1
+        return anomalous, reason
+
+    def retain(self, names: Iterable[str]):
+        keep = set(names)
+        for name in [n for n in self._tunnels if n not in keep]:
+            del self._tunnels[name]
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+لاگ‌گیری غیرهمزمان برای مانیتور
+
+- QueueHandler در thread صدازننده فقط رکورد را در صف می‌گذارد؛ نوشتن روی دیسک/کنسول
+  در thread پس‌زمینه (QueueListener) انجام می‌شود تا کندی دیسک حلقه سلامت را متوقف نکند.
+- چرخش فایل بر اساس حجم (log_max_bytes) یا زمان (log_rotate_when) با فشرده‌سازی gzip.
+- خروجی اختیاری JSON-lines در فایل جداگانه (log_json).
+- پیام‌های تکراری یکسان (مثلاً همان خطای یک تانل در هر دور) در بازه log_dedup_seconds
+  فقط یک بار نوشته می‌شوند و تعداد تکرار در پیام بعدی ذکر می‌شود.
+"""
+
+import os
+import gzip
+import json
+import queue
+import atexit
+import shutil
+import logging
+import threading
+import logging.handlers
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+DEFAULT_LOG_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_LOG_BACKUP_COUNT = 5
+DEFAULT_LOG_DEDUP_SECONDS = 300
+DEFAULT_LOG_QUEUE_SIZE = 10000
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+
+def _gz_namer(name: str) -> str:
+    return name + ".gz"
+
+
+def _gz_rotator(source: str, dest: str):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key in ("tunnel", "event"):
+            if hasattr(record, key):
+                entry[key] = getattr(record, key)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RepeatFilter(logging.Filter):
+    """حذف پیام‌های یکسان تکراری در یک بازه زمانی (حافظه محدود با LRU)."""
+
+    def __init__(self, interval: float, max_keys: int = 2048):
+        super().__init__()
+        self.interval = float(interval)
+        self.max_keys = max_keys
+        # پیام → (زمان آخرین انتشار، تعداد سرکوب‌شده)
+        self._seen: "OrderedDict[Tuple[int, str], Tuple[float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.interval <= 0:
+            return True
+        key = (record.levelno, record.getMessage())
+        now = record.created
+        with self._lock:
+            hit = self._seen.get(key)
+            if hit is not None and now - hit[0] < self.interval:
+                self._seen[key] = (hit[0], hit[1] + 1)
+                self._seen.move_to_end(key)
+                return False
+            suppressed = hit[1] if hit else 0
+            self._seen[key] = (now, 0)
+            self._seen.move_to_end(key)
+            while len(self._seen) > self.max_keys:
+                self._seen.popitem(last=False)
+        if suppressed:
+            record.msg = f"{record.getMessage()} (تکرار {suppressed} بار در {int(self.interval)} ثانیه گذشته)"
+            record.args = None
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """اگر صف پر بود رکورد دور ریخته می‌شود تا thread صدازننده هرگز منتظر نماند."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _file_handler(path: str, cfg: Dict) -> logging.Handler:
+    when = cfg.get("log_rotate_when") or ""
+    backups = int(cfg.get("log_backup_count", DEFAULT_LOG_BACKUP_COUNT))
+    if when:
+        h = logging.handlers.TimedRotatingFileHandler(path, when=when, backupCount=backups, encoding="utf-8")
+    else:
+        h = logging.handlers.RotatingFileHandler(
+            path, maxBytes=int(cfg.get("log_max_bytes", DEFAULT_LOG_MAX_BYTES)),
+            backupCount=backups, encoding="utf-8",
+        )
+    if cfg.get("log_compress", True):
+        h.namer = _gz_namer
+        h.rotator = _gz_rotator
+    return h
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[DroppingQueueHandler] = None
+
+
+def setup_async_logging(log_file: str, level: int, cfg: Dict) -> logging.Logger:
+    """پیکربندی (یا بازپیکربندی) لاگر rathole-monitor با صف و writer پس‌زمینه."""
+    global _listener, _queue_handler
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+
+    handlers = []
+    fh = _file_handler(log_file, cfg)
+    fh.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers.append(fh)
+    if cfg.get("log_json", False):
+        jh = _file_handler(os.path.splitext(log_file)[0] + ".jsonl", cfg)
+        jh.setFormatter(JsonLinesFormatter())
+        handlers.append(jh)
+    sh = logging.StreamHandler()
+    sh.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers.append(sh)
+
+    logger = logging.getLogger("rathole-monitor")
+    if _queue_handler is not None:
+        logger.removeHandler(_queue_handler)
+    shutdown_logging()
+
+    q: "queue.Queue" = queue.Queue(maxsize=int(cfg.get("log_queue_size", DEFAULT_LOG_QUEUE_SIZE)))
+    _queue_handler = DroppingQueueHandler(q)
+    _queue_handler.addFilter(RepeatFilter(float(cfg.get("log_dedup_seconds", DEFAULT_LOG_DEDUP_SECONDS))))
+    _listener = logging.handlers.QueueListener(q, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    logger.addHandler(_queue_handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+
+def shutdown_logging():
+    """خالی کردن صف و بستن فایل‌ها (در خروج برنامه)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for h in _listener.handlers:
+            try:
+                h.close()
+            except Exception:
+                pass
+        _listener = None
+
+
+def dropped_records() -> int:
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+atexit.register(shutdown_logging)
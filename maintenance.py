@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+پنجره‌های نگهداری و سکوت (silence) تانل‌ها
+
+هر مورد در silences.json:
+  {"id": "3fa2c1d0", "match": {"name": "rathole-iran-*", "type": "iran", "tag": "edge"},
+   "start": 1718000000, "end": 1718003600,            ← یک‌باره (epoch)
+   "cron": "0 3 * * 0", "duration": 3600,             ← تکرارشونده (دقیقه ساعت روز ماه روزهفته، وقت محلی)
+   "comment": "...", "created": ..., "created_by": "cli"}
+در مورد تکرارشونده start/end (اختیاری) بازه اعتبار تکرار است. match خالی یعنی همه تانل‌ها.
+
+در مدت سکوت، مانیتور تانل را چک و ترمیم نمی‌کند (نه ریستارت، نه restart_on_inactive) و
+فرزندانش در گراف وابستگی هم ترمیم نمی‌شوند.
+
+ایندکس: رخدادهای تکرارشونده تا SILENCE_HORIZON_SECONDS جلوتر باز می‌شوند و همه بازه‌ها به
+قطعه‌های مقدماتی (بین مرزهای متوالی) تقسیم می‌شوند؛ برای هر قطعه فهرست سکوت‌های فعال از
+پیش ساخته می‌شود. پرس‌وجوی «الان ساکت است؟» = یک جستجوی دودویی روی مرزها، O(log n).
+"""
+
+import os
+import json
+import time
+import fcntl
+import bisect
+import fnmatch
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+SILENCE_HORIZON_SECONDS = 7 * 86400
+SILENCE_MATCH_KEYS = ("name", "type", "tag")
+MAX_CRON_DURATION = 7 * 86400
+
+# (نام فیلد، کمینه، بیشینه)
+_CRON_FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 7))
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def parse_duration(text) -> float:
+    """"90" (ثانیه)، "30m"، "2h"، "1d"، "1w" → ثانیه."""
+    if isinstance(text, (int, float)) and not isinstance(text, bool):
+        value = float(text)
+    else:
+        text = str(text).strip().lower()
+        unit = _DURATION_UNITS.get(text[-1:]) if text else None
+        try:
+            value = float(text[:-1]) * unit if unit else float(text)
+        except ValueError:
+            raise ValueError(f"مدت نامعتبر: {text}")
+    if value <= 0:
+        raise ValueError("مدت باید مثبت باشد")
+    return value
+
+
+class CronSpec:
+    """عبارت cron پنج‌بخشی (* ، a-b ، a,b ، */n ، a-b/n)؛ روز ماه و روز هفته مثل cron با «یا» ترکیب می‌شوند."""
+
+    def __init__(self, expr: str):
+        parts = expr.split()
+        if len(parts) != 5:
+            raise ValueError(f"عبارت cron باید ۵ بخش داشته باشد: {expr!r}")
+        self.expr = expr
+        sets = []
+        for part, (name, lo, hi) in zip(parts, _CRON_FIELDS):
+            sets.append(self._parse_field(part, name, lo, hi))
+        self.minutes, self.hours, self.days, self.months, weekdays = sets
+        # 7 هم یکشنبه است؛ در datetime دوشنبه=0 ... یکشنبه=6
+        self.weekdays = {(d - 1) % 7 for d in weekdays}
+        self.day_any = parts[2] == "*"
+        self.weekday_any = parts[4] == "*"
+
+    @staticmethod
+    def _parse_field(part: str, name: str, lo: int, hi: int) -> set:
+        out = set()
+        for item in part.split(","):
+            rng, _, step = item.partition("/")
+            try:
+                step_n = int(step) if step else 1
+                if rng == "*":
+                    a, b = lo, hi
+                elif "-" in rng:
+                    a, b = (int(x) for x in rng.split("-", 1))
+                else:
+                    a = b = int(rng)
+            except ValueError:
+                raise ValueError(f"بخش {name} نامعتبر است: {item!r}")
+            if step_n < 1 or not lo <= a <= b <= hi:
+                raise ValueError(f"بخش {name} خارج از بازه {lo}-{hi}: {item!r}")
+            out.update(range(a, b + 1, step_n))
+        return out
+
+    def _day_matches(self, day: datetime) -> bool:
+        if day.month not in self.months:
+            return False
+        dom = day.day in self.days
+        dow = day.weekday() in self.weekdays
+        if self.day_any or self.weekday_any:
+            return dom and dow
+        return dom or dow
+
+    def occurrences(self, since: float, until: float) -> Iterator[float]:
+        """زمان شروع رخدادها در [since, until) به ترتیب."""
+        day = datetime.fromtimestamp(since).replace(hour=0, minute=0, second=0, microsecond=0)
+        hours, minutes = sorted(self.hours), sorted(self.minutes)
+        while day.timestamp() < until:
+            if self._day_matches(day):
+                for h in hours:
+                    for m in minutes:
+                        ts = day.replace(hour=h, minute=m).timestamp()
+                        if since <= ts < until:
+                            yield ts
+            day += timedelta(days=1)
+
+
+def validate_silence(entry: Dict) -> Optional[str]:
+    if not isinstance(entry, dict):
+        return "باید شیء JSON باشد"
+    match = entry.get("match", {})
+    if not isinstance(match, dict) or not all(isinstance(v, str) for v in match.values()):
+        return "match باید دیکشنری رشته‌ای باشد"
+    unknown = set(match) - set(SILENCE_MATCH_KEYS)
+    if unknown:
+        return f"شرط ناشناخته در match: {', '.join(sorted(unknown))}"
+    for key in ("start", "end", "duration"):
+        value = entry.get(key)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            return f"{key} باید عدد باشد"
+    if entry.get("cron"):
+        try:
+            CronSpec(entry["cron"])
+        except ValueError as e:
+            return str(e)
+        if not entry.get("duration") or not 0 < entry["duration"] <= MAX_CRON_DURATION:
+            return f"duration (ثانیه) برای cron لازم است و حداکثر {MAX_CRON_DURATION} است"
+    elif entry.get("start") is None or entry.get("end") is None:
+        return "start و end (یا cron و duration) لازم است"
+    if entry.get("start") is not None and entry.get("end") is not None and entry["end"] <= entry["start"]:
+        return "end باید بعد از start باشد"
+    return None
+
+
+def parse_time(value) -> float:
+    """epoch (عدد) یا زمان ISO محلی ("2024-06-10 03:00") → epoch."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).strip()).timestamp()
+    except ValueError:
+        raise ValueError(f"زمان نامعتبر: {value}")
+
+
+def build_silence(name: str = "", ttype: str = "", tag: str = "", start=None, end=None, duration=None,
+                  cron: str = "", comment: str = "", now: Optional[float] = None) -> Dict:
+    """ساخت مورد سکوت از ورودی CLI/وب. بدون cron: از start (پیش‌فرض الان) تا end یا به مدت duration."""
+    now = time.time() if now is None else now
+    match = {}
+    if name and name not in ("*", "all"):
+        match["name"] = name
+    if ttype:
+        match["type"] = ttype
+    if tag:
+        match["tag"] = tag
+    entry: Dict = {"match": match}
+    if comment:
+        entry["comment"] = comment
+    if start is not None and start != "":
+        entry["start"] = parse_time(start)
+    if end is not None and end != "":
+        entry["end"] = parse_time(end)
+    if cron:
+        entry["cron"] = cron
+        if duration is not None and duration != "":
+            entry["duration"] = parse_duration(duration)
+    else:
+        entry.setdefault("start", now)
+        if "end" not in entry:
+            if duration is None or duration == "":
+                raise ValueError("end یا duration لازم است")
+            entry["end"] = entry["start"] + parse_duration(duration)
+    return entry
+
+
+def matches(match: Dict, name: str, ttype: str, tags: Callable[[], List[str]]) -> bool:
+    if "name" in match and not fnmatch.fnmatchcase(name, match["name"]):
+        return False
+    if "type" in match and match["type"] != ttype:
+        return False
+    if "tag" in match and match["tag"] not in tags():
+        return False
+    return True
+
+
+class IntervalIndex:
+    """ایندکس ایستای بازه‌های [start, end) برای پرس‌وجوی نقطه‌ای با جستجوی دودویی."""
+
+    def __init__(self, intervals: List[Tuple[float, float, object]]):
+        edges: List[Tuple[float, int, int]] = []
+        for i, (start, end, _item) in enumerate(intervals):
+            if end > start:
+                edges.append((start, 1, i))
+                edges.append((end, 0, i))
+        edges.sort()
+        self.bounds: List[float] = []
+        self.segments: List[Tuple[object, ...]] = []
+        active: Dict[int, None] = {}
+        k = 0
+        while k < len(edges):
+            ts = edges[k][0]
+            while k < len(edges) and edges[k][0] == ts:
+                _, opening, i = edges[k]
+                if opening:
+                    active[i] = None
+                else:
+                    active.pop(i, None)
+                k += 1
+            self.bounds.append(ts)
+            self.segments.append(tuple(intervals[i][2] for i in active))
+
+    def __len__(self) -> int:
+        return len(self.bounds)
+
+    def at(self, ts: float) -> Tuple[object, ...]:
+        i = bisect.bisect_right(self.bounds, ts) - 1
+        return self.segments[i] if i >= 0 else ()
+
+
+class SilenceStore:
+    """silences.json با قفل فایل؛ CLI، وب‌پنل و سرویس همه مستقیم از همین فایل استفاده می‌کنند."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.logger = logging.getLogger("rathole-monitor")
+
+    def stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def load(self) -> List[Dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            self.logger.error(f"خطا در خواندن {self.path}: {e}")
+            return []
+        entries = [e for e in data.get("silences", []) if validate_silence(e) is None]
+        for i, e in enumerate(entries):
+            # مورد دستی بدون id
+            e.setdefault("id", f"manual-{i}")
+        return entries
+
+    def _modify(self, fn: Callable[[List[Dict]], object]):
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = self.load()
+            now = time.time()
+            # موارد منقضی حذف می‌شوند
+            entries = [e for e in entries if e.get("end") is None or e["end"] > now]
+            result = fn(entries)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"silences": entries}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+            return result
+
+    def add(self, entry: Dict, created_by: str = "") -> Dict:
+        """افزودن سکوت؛ ValueError اگر نامعتبر باشد."""
+        entry = {k: v for k, v in entry.items() if v is not None and v != ""}
+        entry.setdefault("match", {})
+        error = validate_silence(entry)
+        if error:
+            raise ValueError(error)
+        entry["id"] = os.urandom(4).hex()
+        entry["created"] = round(time.time(), 3)
+        if created_by:
+            entry["created_by"] = created_by
+
+        def add(entries):
+            entries.append(entry)
+            return entry
+        return self._modify(add)
+
+    def remove(self, silence_id: str) -> bool:
+        def remove(entries):
+            before = len(entries)
+            entries[:] = [e for e in entries if e.get("id") != silence_id]
+            return len(entries) != before
+        return self._modify(remove)
+
+
+class MaintenanceSchedule:
+    """نمای ایندکس‌شده silences.json؛ با تغییر فایل یا رسیدن به انتهای افق دوباره ساخته می‌شود."""
+
+    def __init__(self, store: SilenceStore, horizon: float = SILENCE_HORIZON_SECONDS):
+        self.store = store
+        self.horizon = horizon
+        self.entries: List[Dict] = []
+        self.index = IntervalIndex([])
+        self._stat = None
+        self._valid_until = 0.0
+
+    def refresh(self, now: Optional[float] = None) -> bool:
+        """یک stat در هر دور؛ ساخت دوباره ایندکس فقط در صورت نیاز."""
+        now = time.time() if now is None else now
+        st = self.store.stat()
+        if st == self._stat and now < self._valid_until:
+            return False
+        self._stat = st
+        self.entries = self.store.load()
+        self.index = IntervalIndex(self.intervals(now - MAX_CRON_DURATION, now + self.horizon))
+        self._valid_until = now + self.horizon / 2
+        return True
+
+    def intervals(self, since: float, until: float) -> List[Tuple[float, float, Tuple[Dict, float]]]:
+        out: List[Tuple[float, float, Tuple[Dict, float]]] = []
+        for entry in self.entries:
+            if entry.get("cron"):
+                duration = float(entry["duration"])
+                lo = max(since, entry.get("start", since))
+                hi = min(until, entry.get("end", until))
+                for start in CronSpec(entry["cron"]).occurrences(lo - duration, hi):
+                    out.append((start, start + duration, (entry, start + duration)))
+            elif entry["end"] > since and entry["start"] < until:
+                out.append((entry["start"], entry["end"], (entry, entry["end"])))
+        return out
+
+    def silenced(self, name: str, ttype: str, tags: Callable[[], List[str]],
+                 now: Optional[float] = None) -> Optional[Dict]:
+        """سکوت فعال منطبق با تانل (با زمان پایان همین رخداد) یا None."""
+        now = time.time() if now is None else now
+        best = None
+        for entry, end in self.index.at(now):
+            if matches(entry.get("match", {}), name, ttype, tags) and (best is None or end > best["until"]):
+                best = {"id": entry["id"], "until": end, "comment": entry.get("comment", "")}
+        return best
+
+    def upcoming(self, now: Optional[float] = None, limit: int = 100) -> List[Dict]:
+        """هر سکوت با رخداد فعلی یا بعدی‌اش (برای نمایش)؛ active یعنی الان در جریان است."""
+        now = time.time() if now is None else now
+        rows: Dict[str, Dict] = {}
+        for start, end, (entry, _end) in self.intervals(now, now + self.horizon):
+            if end > now and (entry["id"] not in rows or start < rows[entry["id"]]["next_start"]):
+                rows[entry["id"]] = dict(entry, next_start=start, next_end=end, active=start <= now)
+        for entry in self.entries:
+            # تکرار بدون رخداد در افق
+            if entry["id"] not in rows:
+                rows[entry["id"]] = dict(entry, next_start=None, next_end=None, active=False)
+        return sorted(rows.values(), key=lambda r: (r["next_start"] is None, r["next_start"] or 0))[:limit]
@@ -7,875 +7,103 @@ Rathole Tunnel Monitor System
 
 import os
 import sys
+
+# مسیر سریع CLI (status/check/restart/logs/config/history/bench/predict/silence): بدون ساختن RatholeMonitor و بدون import ماژول‌های سنگین؛
+# فقط از snapshot سرویس در حال اجرا از طریق سوکت کنترل استفاده می‌کند
+if __name__ == "__main__" and next((a for a in sys.argv[1:] if not a.startswith("-")), None) in (
+        "status", "check", "restart", "logs", "config", "history", "bench", "predict", "silence", "notify", "slo"):
+    from cli import main as cli_main
+    sys.exit(cli_main(sys.argv[1:]))
+
 import json
 import time
+import signal
 import socket
 import logging
+import fnmatch
 import subprocess
 import threading
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from datetime import datetime
+from typing import Iterator, List, Dict, Optional, Set
+
+from restart_budget import RestartBudget
+from restart_state import RestartStateStore
+from log_setup import setup_async_logging
+from health_checks import HealthPipelines
+from cgroup_stats import CgroupReader
+from conn_stats import ConnCollector
+from traffic import TrafficMeter
+from settings import Settings, ConfigError, config_diff, default_config, DEFAULT_RESTART_DELAY
+from config_watch import ConfigWatcher
+from policy import PolicyResolver, TunnelPolicy
+from tunnel_deps import DependencyGraph
+from health_state import HealthTracker, STATE_HEALTHY, STATE_SUSPECT, STATE_UNHEALTHY
+from log_anomaly import LogAnomalyDetector, LogStats
+from event_journal import (
+    EventJournal,
+    EVENT_STATE_CHANGE,
+    EVENT_RESTART_ATTEMPT,
+    EVENT_RESTART_RESULT,
+    EVENT_ACTIVATION,
+    EVENT_BACKOFF,
+    EVENT_PATTERN_HIT,
+    EVENT_CONFIG_RELOAD,
+    EVENT_DEPENDENCY_SKIP,
+    EVENT_QUARANTINE,
+    EVENT_LOG_RATE,
+    EVENT_PREDICTIVE_RESTART,
+    EVENT_SILENCE,
+    EVENT_INCIDENT,
+)
+from correlation import CorrelationEngine
+from control import ControlServer
+from systemd_notify import SystemdNotifier
+from executor import CommandExecutor
+from predictor import FailurePredictor, rate_level
+from maintenance import MaintenanceSchedule, SilenceStore
+from notifications import NotificationPipeline
+from slo import SloTracker
 
 # مسیرها و فایل‌ها
 MONITOR_DIR = "/root/rathole-monitor"
 CONFIG_FILE = f"{MONITOR_DIR}/config.json"
 LOG_FILE = f"{MONITOR_DIR}/monitor.log"
+RESTART_STATE_BASE = f"{MONITOR_DIR}/restart_state"
+CONTROL_SOCKET = f"{MONITOR_DIR}/monitor.sock"
+PREDICT_MODEL_FILE = f"{MONITOR_DIR}/predict_model.json"
+SILENCES_FILE = f"{MONITOR_DIR}/silences.json"
+NOTIFY_QUEUE_DIR = f"{MONITOR_DIR}/notify_queue"
+SLO_DIR = f"{MONITOR_DIR}/slo"
 
-# مقادیر پیش‌فرض
-DEFAULT_CHECK_INTERVAL = 300           # ثانیه
-DEFAULT_WEB_PORT = 8080
-DEFAULT_RESTART_DELAY = 10             # ثانیه
-DEFAULT_MAX_RESTART_ATTEMPTS = 3
-DEFAULT_RESTART_WINDOW_SECONDS = 900   # پنجره محدودسازی ریستارت (۱۵ دقیقه)
-DEFAULT_LOG_LEVEL = "INFO"
-DEFAULT_RESTART_ON_INACTIVE = True     # اگر سرویس inactive/failed بود، تلاش برای فعال‌سازی
-
-# List of error patterns that should be ignored (not critical)
-IGNORED_ERRORS=(
-    "Connection refused"
-    "Connection reset by peer"
-    "Broken pipe"
-    "Connection timeout"
-    "Temporary failure in name resolution"
-    "No route to host"
-    "Connection timed out"
-    "Network is unreachable"
-    "Connection closed"
-    "Connection lost"
-    "Failed to establish connection"
-    "Client.* disconnected"
-    "Handshake failed"
-    "Read timeout"
-    "Write timeout"
-    "Stream closed"
-    "Connection dropped"
-    "Connection aborted"
-    "SSL handshake failed"
-    "TLS handshake failed"
-    "Retry limit exceeded"
-    "Connection reset"
-    "Invalid response"
-    "Protocol error"
-    "Connection refused by server"
-    "Connection terminated"
-    "Connection interrupted"
-    "Authentication failed"
-    "Websocket connection failed"
-    "Failed to read from socket"
-    "Failed to write to socket"
-    "EOF while reading"
-    "Unexpected EOF"
-    "Connection rejected"
-    "Remote connection closed"
-    "Host unreachable"
-    "Connection pooling failed"
-    "Keepalive failed"
-    "Peer closed connection"
-    "Socket closed"
-    "Connection was closed"
-    "Connection has been closed"
-    "Connection lost to server"
-    "Connection was reset"
-    "Connection was terminated"
-    "Connection was dropped"
-    "connection failed"
-    "failed to connect"
-    "Connection refused by remote host"
-    "Connection reset by remote host"
-    "Network connection failed"
-    "Connection broken"
-    "Connection unstable"
-    "Connection error"
-    "Connection exception"
-    "Connection closed by remote"
-    "Connection ended"
-    "Connection closed unexpectedly"
-    "Connection was interrupted"
-    "Connection was aborted"
-    "Connection was terminated by remote"
-    "Connection closed by peer"
-    "Connection closed by server"
-    "Connection was closed by remote"
-    "Connection was reset by remote"
-    "Connection was terminated unexpectedly"
-    "Connection has been reset"
-    "Connection was broken"
-    "Connection was lost"
-    "Connection was dropped by remote"
-    "Connection was forcefully closed"
-    "Connection closed due to timeout"
-    "Connection was closed due to inactivity"
-    "Connection was closed due to error"
-    "Connection was closed abnormally"
-    "Connection was closed gracefully"
-    "Connection was ended by remote"
-    "Connection was ended by client"
-    "Connection was ended by server"
-    "Connection was ended due to timeout"
-    "Connection was ended abnormally"
-    "Connection was ended gracefully"
-    "Network error"
-    "Network timeout"
-    "Network connection lost"
-    "Network connection failed"
-    "Network connection closed"
-    "Network connection terminated"
-    "Network connection reset"
-    "Network connection aborted"
-    "Network connection broken"
-    "Network connection unstable"
-    "Network connection error"
-    "Network connection exception"
-    "Network connection timeout"
-    "Network connection refused"
-    "Network connection dropped"
-    "Network connection interrupted"
-    "Network connection reset by peer"
-    "Network connection closed by peer"
-    "Network connection closed by remote"
-    "Network connection closed by server"
-    "Network connection closed by client"
-    "Network connection closed due to timeout"
-    "Network connection closed due to inactivity"
-    "Network connection closed due to error"
-    "Network connection closed abnormally"
-    "Network connection closed gracefully"
-    "Network connection ended by remote"
-    "Network connection ended by client"
-    "Network connection ended by server"
-    "Network connection ended due to timeout"
-    "Network connection ended abnormally"
-    "Network connection ended gracefully"
-    "Unable to connect"
-    "Failed to connect"
-    "Connection attempt failed"
-    "Connection attempt timed out"
-    "Connection attempt rejected"
-    "Connection attempt refused"
-    "Connection attempt aborted"
-    "Connection attempt reset"
-    "Connection attempt dropped"
-    "Connection attempt interrupted"
-    "Connection attempt terminated"
-    "Connection attempt failed due to timeout"
-    "Connection attempt failed due to error"
-    "Connection attempt failed due to refusal"
-    "Connection attempt failed due to unreachable"
-    "Connection attempt failed due to reset"
-    "Connection attempt failed due to abort"
-    "Connection attempt failed due to drop"
-    "Connection attempt failed due to interrupt"
-    "Connection attempt failed due to termination"
-    "Connection attempt failed due to closure"
-    "Connection attempt failed due to broken pipe"
-    "Connection attempt failed due to network error"
-    "Connection attempt failed due to network timeout"
-    "Connection attempt failed due to network issue"
-    "Connection attempt failed due to network unreachable"
-    "Connection attempt failed due to network down"
-    "Connection attempt failed due to network congestion"
-    "Connection attempt failed due to network overload"
-    "Connection attempt failed due to network instability"
-    "Connection attempt failed due to network maintenance"
-    "Connection attempt failed due to network configuration"
-    "Connection attempt failed due to network security"
-    "Connection attempt failed due to network policy"
-    "Connection attempt failed due to network restriction"
-    "Connection attempt failed due to network limitation"
-    "Connection attempt failed due to network throttling"
-    "Connection attempt failed due to network blocking"
-    "Connection attempt failed 1 time"
-    "Connection attempt failed 2 times"
-    "Connection attempt failed 3 times"
-    "Connection attempt failed 4 times"
-    "Connection attempt failed 5 times"
-    "Connection attempt failed 6 times"
-    "Connection attempt failed 7 times"
-    "Connection attempt failed 8 times"
-    "Connection attempt failed 9 times"
-    "Connection attempt failed 10 times"
-)
+# الگوهای فعال بررسی لاگ (پیش‌فرض خالی؛ از config: ignored_error_patterns / critical_error_patterns)
+# فهرست مرجع الگوها در error_patterns.py است (در اجرای عادی import نمی‌شود).
+IGNORED_ERROR_PATTERNS: List[str] = []
+CRITICAL_ERROR_PATTERNS: List[str] = []
 
-# List of critical error patterns that require restart
-CRITICAL_ERRORS=(
-    "panic"
-    "fatal"
-    "segmentation fault"
-    "core dumped"
-    "invalid memory"
-    "out of memory"
-    "memory leak"
-    "stack overflow"
-    "buffer overflow"
-    "null pointer"
-    "access violation"
-    "illegal instruction"
-    "abort"
-    "crashed"
-    "failed to start"
-    "process exited"
-    "service stopped"
-    "service failed"
-    "bind failed"
-    "failed to bind"
-    "address already in use"
-    "permission denied"
-    "file not found"
-    "configuration error"
-    "config error"
-    "invalid config"
-    "failed to load config"
-    "failed to parse config"
-    "failed to read config"
-    "failed to open"
-    "failed to create"
-    "failed to write"
-    "failed to read"
-    "failed to close"
-    "failed to flush"
-    "failed to seek"
-    "failed to stat"
-    "failed to sync"
-    "failed to lock"
-    "failed to unlock"
-    "failed to allocate"
-    "failed to free"
-    "failed to initialize"
-    "failed to cleanup"
-    "failed to finalize"
-    "failed to destroy"
-    "failed to create thread"
-    "failed to join thread"
-    "failed to spawn thread"
-    "failed to send"
-    "failed to receive"
-    "failed to process"
-    "failed to execute"
-    "failed to run"
-    "failed to start process"
-    "failed to stop process"
-    "failed to kill process"
-    "failed to restart process"
-    "failed to reload"
-    "failed to update"
-    "failed to upgrade"
-    "failed to downgrade"
-    "failed to install"
-    "failed to uninstall"
-    "failed to configure"
-    "failed to setup"
-    "failed to init"
-    "failed to boot"
-    "failed to shutdown"
-    "failed to reboot"
-    "failed to mount"
-    "failed to unmount"
-    "failed to format"
-    "failed to backup"
-    "failed to restore"
-    "failed to recover"
-    "failed to repair"
-    "failed to validate"
-    "failed to verify"
-    "failed to authenticate"
-    "failed to authorize"
-    "failed to login"
-    "failed to logout"
-    "failed to register"
-    "failed to unregister"
-    "failed to enable"
-    "failed to disable"
-    "failed to activate"
-    "failed to deactivate"
-    "failed to suspend"
-    "failed to resume"
-    "failed to pause"
-    "failed to continue"
-    "failed to stop"
-    "failed to start"
-    "failed to restart"
-    "failed to reload"
-    "failed to reset"
-    "failed to clear"
-    "failed to flush"
-    "failed to sync"
-    "failed to commit"
-    "failed to rollback"
-    "failed to save"
-    "failed to load"
-    "failed to import"
-    "failed to export"
-    "failed to copy"
-    "failed to move"
-    "failed to delete"
-    "failed to remove"
-    "failed to rename"
-    "failed to create directory"
-    "failed to create file"
-    "failed to delete directory"
-    "failed to delete file"
-    "failed to read directory"
-    "failed to read file"
-    "failed to write directory"
-    "failed to write file"
-    "failed to access directory"
-    "failed to access file"
-    "failed to find directory"
-    "failed to find file"
-    "failed to open directory"
-    "failed to open file"
-    "failed to close directory"
-    "failed to close file"
-    "failed to lock directory"
-    "failed to lock file"
-    "failed to unlock directory"
-    "failed to unlock file"
-    "failed to chmod"
-    "failed to chown"
-    "failed to chgrp"
-    "failed to link"
-    "failed to symlink"
-    "failed to unlink"
-    "failed to stat"
-    "failed to lstat"
-    "failed to fstat"
-    "failed to truncate"
-    "failed to expand"
-    "failed to compress"
-    "failed to decompress"
-    "failed to archive"
-    "failed to unarchive"
-    "failed to encrypt"
-    "failed to decrypt"
-    "failed to hash"
-    "failed to checksum"
-    "failed to generate"
-    "failed to compute"
-    "failed to calculate"
-    "failed to measure"
-    "failed to test"
-    "failed to check"
-    "failed to validate"
-    "failed to verify"
-    "failed to confirm"
-    "failed to ensure"
-    "failed to assert"
-    "failed to evaluate"
-    "failed to analyze"
-    "failed to diagnose"
-    "failed to debug"
-    "failed to trace"
-    "failed to profile"
-    "failed to monitor"
-    "failed to watch"
-    "failed to observe"
-    "failed to track"
-    "failed to follow"
-    "failed to inspect"
-    "failed to examine"
-    "failed to investigate"
-    "failed to explore"
-    "failed to discover"
-    "failed to search"
-    "failed to find"
-    "failed to locate"
-    "failed to retrieve"
-    "failed to fetch"
-    "failed to get"
-    "failed to obtain"
-    "failed to acquire"
-    "failed to collect"
-    "failed to gather"
-    "failed to compile"
-    "failed to build"
-    "failed to make"
-    "failed to create"
-    "failed to generate"
-    "failed to produce"
-    "failed to construct"
-    "failed to assemble"
-    "failed to link"
-    "failed to package"
-    "failed to deploy"
-    "failed to release"
-    "failed to publish"
-    "failed to distribute"
-    "failed to install"
-    "failed to uninstall"
-    "failed to setup"
-    "failed to configure"
-    "failed to customize"
-    "failed to adapt"
-    "failed to adjust"
-    "failed to modify"
-    "failed to change"
-    "failed to update"
-    "failed to upgrade"
-    "failed to downgrade"
-    "failed to migrate"
-    "failed to convert"
-    "failed to transform"
-    "failed to format"
-    "failed to parse"
-    "failed to serialize"
-    "failed to deserialize"
-    "failed to encode"
-    "failed to decode"
-    "failed to compress"
-    "failed to decompress"
-    "failed to zip"
-    "failed to unzip"
-    "failed to tar"
-    "failed to untar"
-    "failed to gzip"
-    "failed to gunzip"
-    "failed to encrypt"
-    "failed to decrypt"
-    "failed to sign"
-    "failed to verify signature"
-    "failed to hash"
-    "failed to checksum"
-    "failed to validate checksum"
-    "failed to compare"
-    "failed to match"
-    "failed to filter"
-    "failed to sort"
-    "failed to group"
-    "failed to aggregate"
-    "failed to summarize"
-    "failed to reduce"
-    "failed to map"
-    "failed to transform"
-    "failed to apply"
-    "failed to execute"
-    "failed to run"
-    "failed to call"
-    "failed to invoke"
-    "failed to trigger"
-    "failed to fire"
-    "failed to emit"
-    "failed to broadcast"
-    "failed to publish"
-    "failed to subscribe"
-    "failed to unsubscribe"
-    "failed to notify"
-    "failed to alert"
-    "failed to warn"
-    "failed to report"
-    "failed to log"
-    "failed to record"
-    "failed to store"
-    "failed to persist"
-    "failed to commit"
-    "failed to save"
-    "failed to backup"
-    "failed to restore"
-    "failed to recover"
-    "failed to repair"
-    "failed to fix"
-    "failed to resolve"
-    "failed to solve"
-    "failed to handle"
-    "failed to process"
-    "failed to manage"
-    "failed to control"
-    "failed to operate"
-    "failed to function"
-    "failed to work"
-    "failed to perform"
-    "failed to execute"
-    "failed to complete"
-    "failed to finish"
-    "failed to done"
-    "failed to succeed"
-    "failed to fail"
-    "failed to error"
-    "failed to crash"
-    "failed to exit"
-    "failed to terminate"
-    "failed to quit"
-    "failed to stop"
-    "failed to end"
-    "failed to close"
-    "failed to shutdown"
-    "failed to restart"
-    "failed to reboot"
-    "failed to reset"
-    "failed to clear"
-    "failed to flush"
-    "failed to sync"
-    "failed to wait"
-    "failed to sleep"
-    "failed to pause"
-    "failed to resume"
-    "failed to continue"
-    "failed to yield"
-    "failed to return"
-    "failed to respond"
-    "failed to reply"
-    "failed to answer"
-    "failed to acknowledge"
-    "failed to confirm"
-    "failed to accept"
-    "failed to reject"
-    "failed to deny"
-    "failed to allow"
-    "failed to permit"
-    "failed to grant"
-    "failed to revoke"
-    "failed to authorize"
-    "failed to authenticate"
-    "failed to login"
-    "failed to logout"
-    "failed to register"
-    "failed to unregister"
-    "failed to subscribe"
-    "failed to unsubscribe"
-    "failed to connect"
-    "failed to disconnect"
-    "failed to bind"
-    "failed to unbind"
-    "failed to attach"
-    "failed to detach"
-    "failed to associate"
-    "failed to disassociate"
-    "failed to link"
-    "failed to unlink"
-    "failed to couple"
-    "failed to decouple"
-    "failed to join"
-    "failed to leave"
-    "failed to enter"
-    "failed to exit"
-    "failed to open"
-    "failed to close"
-    "failed to lock"
-    "failed to unlock"
-    "failed to acquire"
-    "failed to release"
-    "failed to allocate"
-    "failed to free"
-    "failed to reserve"
-    "failed to unreserve"
-    "failed to claim"
-    "failed to unclaim"
-    "failed to take"
-    "failed to give"
-    "failed to get"
-    "failed to set"
-    "failed to put"
-    "failed to push"
-    "failed to pop"
-    "failed to peek"
-    "failed to insert"
-    "failed to remove"
-    "failed to delete"
-    "failed to add"
-    "failed to append"
-    "failed to prepend"
-    "failed to concat"
-    "failed to merge"
-    "failed to split"
-    "failed to slice"
-    "failed to cut"
-    "failed to copy"
-    "failed to move"
-    "failed to swap"
-    "failed to replace"
-    "failed to substitute"
-    "failed to change"
-    "failed to modify"
-    "failed to update"
-    "failed to upgrade"
-    "failed to downgrade"
-    "failed to migrate"
-    "failed to convert"
-    "failed to transform"
-    "failed to format"
-    "failed to parse"
-    "failed to serialize"
-    "failed to deserialize"
-    "config validation failed"
-    "invalid configuration"
-    "configuration syntax error"
-    "missing configuration"
-    "configuration file not found"
-    "configuration parse error"
-    "configuration load error"
-    "configuration read error"
-    "configuration write error"
-    "configuration save error"
-    "configuration backup error"
-    "configuration restore error"
-    "configuration validation error"
-    "configuration check error"
-    "configuration test error"
-    "configuration apply error"
-    "configuration update error"
-    "configuration upgrade error"
-    "configuration downgrade error"
-    "configuration migration error"
-    "configuration conversion error"
-    "configuration transformation error"
-    "configuration format error"
-    "configuration parse error"
-    "configuration serialization error"
-    "configuration deserialization error"
-    "configuration encoding error"
-    "configuration decoding error"
-    "configuration compression error"
-    "configuration decompression error"
-    "configuration encryption error"
-    "configuration decryption error"
-    "configuration signing error"
-    "configuration verification error"
-    "configuration hash error"
-    "configuration checksum error"
-    "configuration validation error"
-    "configuration comparison error"
-    "configuration match error"
-    "configuration filter error"
-    "configuration sort error"
-    "configuration group error"
-    "configuration aggregate error"
-    "configuration summarize error"
-    "configuration reduce error"
-    "configuration map error"
-    "configuration transform error"
-    "configuration apply error"
-    "configuration execute error"
-    "configuration run error"
-    "configuration call error"
-    "configuration invoke error"
-    "configuration trigger error"
-    "configuration fire error"
-    "configuration emit error"
-    "configuration broadcast error"
-    "configuration publish error"
-    "configuration subscribe error"
-    "configuration unsubscribe error"
-    "configuration notify error"
-    "configuration alert error"
-    "configuration warn error"
-    "configuration report error"
-    "configuration log error"
-    "configuration record error"
-    "configuration store error"
-    "configuration persist error"
-    "configuration commit error"
-    "configuration save error"
-    "configuration backup error"
-    "configuration restore error"
-    "configuration recover error"
-    "configuration repair error"
-    "configuration fix error"
-    "configuration resolve error"
-    "configuration solve error"
-    "configuration handle error"
-    "configuration process error"
-    "configuration manage error"
-    "configuration control error"
-    "configuration operate error"
-    "configuration function error"
-    "configuration work error"
-    "configuration perform error"
-    "configuration execute error"
-    "configuration complete error"
-    "configuration finish error"
-    "configuration done error"
-    "configuration success error"
-    "configuration fail error"
-    "configuration error error"
-    "configuration crash error"
-    "configuration exit error"
-    "configuration terminate error"
-    "configuration quit error"
-    "configuration stop error"
-    "configuration end error"
-    "configuration close error"
-    "configuration shutdown error"
-    "configuration restart error"
-    "configuration reboot error"
-    "configuration reset error"
-    "configuration clear error"
-    "configuration flush error"
-    "configuration sync error"
-    "configuration wait error"
-    "configuration sleep error"
-    "configuration pause error"
-    "configuration resume error"
-    "configuration continue error"
-    "configuration yield error"
-    "configuration return error"
-    "configuration respond error"
-    "configuration reply error"
-    "configuration answer error"
-    "configuration acknowledge error"
-    "configuration confirm error"
-    "configuration accept error"
-    "configuration reject error"
-    "configuration deny error"
-    "configuration allow error"
-    "configuration permit error"
-    "configuration grant error"
-    "configuration revoke error"
-    "configuration authorize error"
-    "configuration authenticate error"
-    "configuration login error"
-    "configuration logout error"
-    "configuration register error"
-    "configuration unregister error"
-    "configuration subscribe error"
-    "configuration unsubscribe error"
-    "configuration connect error"
-    "configuration disconnect error"
-    "configuration bind error"
-    "configuration unbind error"
-    "configuration attach error"
-    "configuration detach error"
-    "configuration associate error"
-    "configuration disassociate error"
-    "configuration link error"
-    "configuration unlink error"
-    "configuration couple error"
-    "configuration decouple error"
-    "configuration join error"
-    "configuration leave error"
-    "configuration enter error"
-    "configuration exit error"
-    "configuration open error"
-    "configuration close error"
-    "configuration lock error"
-    "configuration unlock error"
-    "configuration acquire error"
-    "configuration release error"
-    "configuration allocate error"
-    "configuration free error"
-    "configuration reserve error"
-    "configuration unreserve error"
-    "configuration claim error"
-    "configuration unclaim error"
-    "configuration take error"
-    "configuration give error"
-    "configuration get error"
-    "configuration set error"
-    "configuration put error"
-    "configuration push error"
-    "configuration pop error"
-    "configuration peek error"
-    "configuration insert error"
-    "configuration remove error"
-    "configuration delete error"
-    "configuration add error"
-    "configuration append error"
-    "configuration prepend error"
-    "configuration concat error"
-    "configuration merge error"
-    "configuration split error"
-    "configuration slice error"
-    "configuration cut error"
-    "configuration copy error"
-    "configuration move error"
-    "configuration swap error"
-    "configuration replace error"
-    "configuration substitute error"
-    "configuration change error"
-    "configuration modify error"
-    "configuration update error"
-    "PermissionError"
-    "FileNotFoundError"
-    "IOError"
-    "OSError"
-    "SystemError"
-    "RuntimeError"
-    "MemoryError"
-    "OverflowError"
-    "ZeroDivisionError"
-    "ValueError"
-    "TypeError"
-    "AttributeError"
-    "NameError"
-    "SyntaxError"
-    "ImportError"
-    "ModuleNotFoundError"
-    "KeyError"
-    "IndexError"
-    "NotImplementedError"
-    "AssertionError"
-    "StopIteration"
-    "GeneratorExit"
-    "KeyboardInterrupt"
-    "SystemExit"
-    "Exception"
-    "Error"
-    "Failed"
-    "Panic"
-    "Fatal"
-    "Critical"
-    "Emergency"
-    "Alert"
-    "Severe"
-    "Major"
-    "High"
-    "Urgent"
-    "Important"
-    "Serious"
-    "Bad"
-    "Fail"
-    "Err"
-    "Err:"
-    "ERROR"
-    "FATAL"
-    "CRITICAL"
-    "PANIC"
-    "EMERGENCY"
-    "ALERT"
-    "SEVERE"
-    "MAJOR"
-    "HIGH"
-    "URGENT"
-    "IMPORTANT"
-    "SERIOUS"
-    "BAD"
-    "FAIL"
-    "FAILED"
-    "FAILURE"
-    "CRASH"
-    "CRASHED"
-    "ABORT"
-    "ABORTED"
-    "STOP"
-    "STOPPED"
-    "KILL"
-    "KILLED"
-    "TERMINATE"
-    "TERMINATED"
-    "EXIT"
-    "EXITED"
-    "QUIT"
-    "QUITTED"
-    "CLOSE"
-    "CLOSED"
-    "SHUTDOWN"
-    "SHUTDOW"
-    "RESTART"
-    "RESTARTED"
-    "REBOOT"
-    "REBOOTED"
-    "RESET"
-    "RESETED"
-    "CLEAR"
-    "CLEARED"
-    "FLUSH"
-    "FLUSHED"
-    "SYNC"
-    "SYNCED"
-)
+
+# اجراکننده مشترک دستورات خارجی (سقف زمانی هر کلاس دستور، kill گروه پردازه، سقف همزمانی)؛
+# یک دستور گیرکرده نباید کل حلقه و قفل آن را نگه دارد
+EXECUTOR = CommandExecutor()
+
+
+def run_cmd(cmd: List[str], timeout: Optional[float] = None) -> subprocess.CompletedProcess:
+    """اجرای امن دستورات سیستم؛ دستوری که از سقف زمانی‌اش بگذرد kill می‌شود و returncode=124 برمی‌گردد."""
+    return EXECUTOR.run(cmd, timeout=timeout)
 
 
-def run_cmd(cmd: List[str]) -> subprocess.CompletedProcess:
-    """اجرای امن دستورات سیستم با لاگ‌گیری ساده."""
-    return subprocess.run(cmd, capture_output=True, text=True)
+def watchdog_seconds(cfg: Dict) -> int:
+    """
+    WatchdogSec امن برای config: بین دو پینگ در بدترین حالت یک ریستارت کامل اجرا می‌شود
+    (stop + restart_delay + start + is-active با تکرار)؛ دو برابر آن تا کندی عادی سرویس را نکشد.
+    """
+    ex = CommandExecutor.from_config(cfg)
+    delays = [cfg.get("restart_delay", DEFAULT_RESTART_DELAY)] + [
+        (rule.get("settings") or {}).get("restart_delay", 0)
+        for rule in cfg.get("tunnel_policies") or [] if isinstance(rule, dict)
+    ]
+    delay = max(d for d in delays if isinstance(d, (int, float)))
+    restart = 2 * ex.timeouts["action"] + delay + (1 + ex.retries) * ex.timeouts["query"]
+    return int(max(90, 2 * restart))
 
 
 def now_iso() -> str:
@@ -885,12 +113,65 @@ def now_iso() -> str:
 class RatholeMonitor:
     def __init__(self):
         self.running = False
-        self._restart_history: Dict[str, List[datetime]] = {}  # تاریخچه ریستارت‌ها برای هر سرویس
-        self._next_allowed_restart: Dict[str, datetime] = {}   # زمان مجاز بعدی برای ریستارت (بک‌آف)
         self._lock = threading.Lock()
+        # بیدار کردن حلقه قبل از پایان check_interval (توقف یا بارگذاری مجدد تنظیمات)
+        self._wake = threading.Event()
+        self._reload_requested = threading.Event()
+        self._reload_source = ""
+        self._config_stat = None
+        self.watcher: Optional[ConfigWatcher] = None
         self.setup_directories()
-        self.setup_logging()
+        # self.config: دیکشنری خام (همان که در config.json ذخیره می‌شود)
+        # self.settings: نمای تایپ‌شده و فقط‌خواندنی همان، برای خواندن در حلقه
         self.config = self.load_config()
+        EXECUTOR.apply_config(self.config)
+        # زمان چک بعدی هر تانل (سیاست‌ها می‌توانند check_interval متفاوت داشته باشند)
+        self._next_check: Dict[str, float] = {}
+        # تانل‌هایی که آخرین چک سلامتشان ناموفق بوده (برای مسدود کردن ترمیم فرزندان)
+        self._unhealthy: Set[str] = set()
+        # hysteresis/امتیاز سلامت/flap هر تانل
+        self.health_state = HealthTracker()
+        # شمارنده‌های جریانی لاگ و خط پایه نرخ خطای هر تانل
+        self.log_anomaly = LogAnomalyDetector()
+        # وضعیت آماده (JSON سریال‌شده) برای CLI؛ یک بار در پایان هر دور ساخته می‌شود
+        self._snapshot = b'{"tunnels":[]}'
+        self.control: Optional[ControlServer] = None
+        # READY/STATUS/WATCHDOG برای systemd (Type=notify)؛ بدون NOTIFY_SOCKET بی‌اثر
+        self.notifier = SystemdNotifier()
+        self._cycles = 0
+        self.setup_logging()
+        # تاریخچه ریستارت‌ها و بک‌آف هر سرویس (پایدار روی دیسک)
+        self.restart_state = RestartStateStore(
+            RESTART_STATE_BASE,
+            history_size=max(32, self.settings.max_restart_attempts),
+        )
+        self.restart_state.load()
+        # رویدادهای ساختاریافته (قابل پرس‌وجو بر اساس تانل/نوع/زمان)
+        self.events = EventJournal(MONITOR_DIR)
+        self.events.open()
+        # پیش‌بینی خرابی: ویژگی‌ها با هر رویداد به‌روز می‌شوند؛ مدل از predict_model.json
+        self.predictor = FailurePredictor(PREDICT_MODEL_FILE)
+        self.predictor.warm(self.events, time.time())
+        self.events.listeners.append(self.predictor.on_event)
+        self._predictive_at: Dict[str, float] = {}
+        # پنجره‌های نگهداری/سکوت (silences.json) و تانل‌هایی که الان ساکت‌اند (نام → id سکوت)
+        self.maintenance = MaintenanceSchedule(SilenceStore(SILENCES_FILE))
+        self._silenced: Dict[str, str] = {}
+        # اعلان هشدارها: listener فقط رویداد را در صف حافظه می‌گذارد؛ ارسال در thread جدا
+        self.notifications = NotificationPipeline(NOTIFY_QUEUE_DIR, self.config.get("notification") or {})
+        self.events.listeners.append(self.notifications.on_event)
+        # SLO: زمان‌بندی رخدادهای هر تانل و rollup روزانه دسترس‌پذیری/MTTR/MTBF
+        self.slo = SloTracker(SLO_DIR, on_incident=self._incident_closed)
+        self.slo.load()
+        self.events.listeners.append(self.slo.on_event)
+        self.restart_budget = RestartBudget.from_config(self.config)
+        self.correlator = CorrelationEngine.from_config(self.config)
+        self.deps = DependencyGraph.from_config(self.config)
+        self.cgroups = CgroupReader(self.settings.cgroup_root)
+        self.connections = ConnCollector(self.settings.cgroup_root)
+        self.traffic = TrafficMeter(self.settings.cgroup_root, history=self.settings.traffic_history)
+        self.health = HealthPipelines.from_config(self.config)
+        self.policies = PolicyResolver.from_config(self.config, self.settings, self.health)
         self.logger.info("Rathole Monitor initialized")
 
     # ----- Setup -----
@@ -899,32 +180,27 @@ class RatholeMonitor:
         os.chmod(MONITOR_DIR, 0o755)
 
     def setup_logging(self):
-        os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
-        level = getattr(logging, DEFAULT_LOG_LEVEL.upper(), logging.INFO)
-        logging.basicConfig(
-            level=level,
-            format="%(asctime)s - %(levelname)s - %(message)s",
-            handlers=[logging.FileHandler(LOG_FILE, encoding="utf-8"), logging.StreamHandler()],
-        )
-        self.logger = logging.getLogger("rathole-monitor")
+        """لاگ غیرهمزمان (صف + writer پس‌زمینه) با چرخش و فشرده‌سازی فایل لاگ."""
+        level = getattr(logging, self.settings.log_level, logging.INFO)
+        self.logger = setup_async_logging(LOG_FILE, level, self.config)
 
     # ----- Config -----
+    def default_config(self) -> Dict:
+        return default_config()
+
+    def _config_file_stat(self):
+        try:
+            st = os.stat(CONFIG_FILE)
+            return st.st_mtime_ns, st.st_size, st.st_ino
+        except OSError:
+            return None
+
     def load_config(self) -> Dict:
-        defaults = {
-            "tunnels": [],
-            "check_interval": DEFAULT_CHECK_INTERVAL,
-            "web_port": DEFAULT_WEB_PORT,
-            "auto_restart": True,
-            "max_restart_attempts": DEFAULT_MAX_RESTART_ATTEMPTS,
-            "restart_delay": DEFAULT_RESTART_DELAY,
-            "restart_window_seconds": DEFAULT_RESTART_WINDOW_SECONDS,
-            "log_level": DEFAULT_LOG_LEVEL,
-            "restart_on_inactive": DEFAULT_RESTART_ON_INACTIVE,
-            "journal_since_seconds": DEFAULT_CHECK_INTERVAL,
-        }
-        cfg = defaults.copy()
+        defaults = self.default_config()
+        cfg = dict(defaults)
         if os.path.exists(CONFIG_FILE):
             try:
+                self._config_stat = self._config_file_stat()
                 with open(CONFIG_FILE, "r", encoding="utf-8") as f:
                     file_cfg = json.load(f)
                     if isinstance(file_cfg, dict):
@@ -933,21 +209,147 @@ class RatholeMonitor:
                 # قبل از logger آماده است
                 print(f"[WARN] خطا در بارگذاری تنظیمات: {e}", file=sys.stderr)
 
+        # مقدار نامعتبر → پیش‌فرض همان کلید (در بارگذاری مجدد کل فایل رد می‌شود)؛
+        # خطای یک قانون tunnel_policies[i] فقط همان قانون را حذف می‌کند
+        self.settings = Settings.from_dict(cfg, lenient=True)
+        bad_rules = set()
+        for key, err in self.settings.errors.items():
+            field, _, index = key.partition("[")
+            if index:
+                print(f"[WARN] قانون نامعتبر {key}: {err}؛ نادیده گرفته شد", file=sys.stderr)
+                bad_rules.add(int(index.rstrip("]")))
+                continue
+            print(f"[WARN] تنظیم نامعتبر {key}: {err}؛ استفاده از مقدار پیش‌فرض", file=sys.stderr)
+            if key in defaults:
+                cfg[key] = defaults[key]
+            else:
+                cfg.pop(key, None)
+        if bad_rules:
+            cfg["tunnel_policies"] = [rule for i, rule in enumerate(cfg["tunnel_policies"])
+                                      if i not in bad_rules]
+            self.settings = Settings.from_dict(cfg, lenient=True)
+
         # تنظیم سطح لاگ در صورت تغییر در config
         try:
-            self.logger.setLevel(getattr(logging, cfg.get("log_level", DEFAULT_LOG_LEVEL).upper(), logging.INFO))
+            self.logger.setLevel(getattr(logging, self.settings.log_level, logging.INFO))
         except Exception:
             pass
 
         return cfg
 
     def save_config(self):
+        # اگر فایل از بیرون (وب پنل/ویرایش دستی) تغییر کرده و هنوز اعمال نشده، ابتدا
+        # اعمال شود تا بازنویسی snapshot تانل‌ها آن تغییر را پاک نکند
+        if self._config_stat is not None and self._config_file_stat() != self._config_stat:
+            self.reload_config("save")
         try:
-            with open(CONFIG_FILE, "w", encoding="utf-8") as f:
+            tmp = f"{CONFIG_FILE}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
                 json.dump(self.config, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, CONFIG_FILE)
+            self._config_stat = self._config_file_stat()
         except Exception as e:
             self.logger.error(f"خطا در ذخیره تنظیمات: {e}")
 
+    def request_reload(self, source: str, force: bool = False):
+        """درخواست بارگذاری مجدد (از SIGHUP یا پایش فایل)؛ در thread حلقه اعمال می‌شود."""
+        if not force and self._config_file_stat() == self._config_stat:
+            return  # نوشتن خود مانیتور
+        self._reload_source = source
+        self._reload_requested.set()
+        self._wake.set()
+
+    def reload_config(self, source: str = "") -> bool:
+        """
+        خواندن دوباره config.json، اعتبارسنجی و جایگزینی یکجا. فقط ساختارهای وابسته به
+        کلیدهای تغییرکرده از نو ساخته می‌شوند؛ وضعیت ریستارت/بک‌آف دست نمی‌خورد.
+        باید در thread حلقه (زیر _lock) یا قبل از شروع مانیتورینگ صدا زده شود.
+        """
+        stat = self._config_file_stat()
+        try:
+            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+                file_cfg = json.load(f)
+        except Exception as e:
+            self.logger.error(f"بارگذاری مجدد تنظیمات ناموفق ({source}): {e}")
+            return False
+        new = self.default_config()
+        if isinstance(file_cfg, dict):
+            new.update(file_cfg)
+        new["tunnels"] = self.config.get("tunnels", [])
+        # تا تغییر بعدی فایل دوباره تلاش نشود (چه معتبر باشد چه نه)
+        self._config_stat = stat
+        try:
+            return self._apply_config(new, source)
+        except ConfigError as e:
+            for key, err in e.errors.items():
+                self.logger.error(f"بارگذاری مجدد رد شد ({source}): {key}: {err}")
+            return False
+
+    def update_config(self, updates: Dict, source: str = "cli") -> bool:
+        """تغییر چند کلید با همان اعتبارسنجی و اعمال بارگذاری مجدد و سپس ذخیره (ConfigError اگر نامعتبر)."""
+        with self._lock:
+            new = dict(self.config)
+            new.update(updates)
+            changed = self._apply_config(new, source)
+            self.save_config()
+        return changed
+
+    def _apply_config(self, new: Dict, source: str) -> bool:
+        settings = Settings.from_dict(new)
+        diff = config_diff(self.config, new)
+        if not diff:
+            return False
+
+        def touched(*prefixes) -> bool:
+            return any(key.startswith(prefixes) for key in diff)
+
+        # ساختارهای جدید ابتدا کامل ساخته می‌شوند، سپس همه با هم جایگزین
+        built = {}
+        if touched("global_restart_", "max_concurrent_restarts", "restart_jitter_seconds", "tunnel_priorities"):
+            built["restart_budget"] = RestartBudget.from_config(new)
+        if touched("correlation_"):
+            correlator = CorrelationEngine.from_config(new)
+            correlator._failures, correlator.outages = self.correlator._failures, self.correlator.outages
+            built["correlator"] = correlator
+        if touched("tunnel_groups", "tunnel_dependencies"):
+            built["deps"] = DependencyGraph.from_config(new)
+        if touched("health_checks", "tunnel_health_checks"):
+            built["health"] = HealthPipelines.from_config(new)
+        if touched("cgroup_root"):
+            built["cgroups"] = CgroupReader(settings.cgroup_root)
+            built["connections"] = ConnCollector(settings.cgroup_root)
+        if touched("cgroup_root", "traffic_history"):
+            built["traffic"] = TrafficMeter(settings.cgroup_root, history=settings.traffic_history)
+        # سیاست‌های تانل به تنظیمات پایه وابسته‌اند؛ در دور بعد برای هر تانل دوباره resolve می‌شوند
+        built["policies"] = PolicyResolver.from_config(new, settings, built.get("health", self.health))
+
+        if touched("command_", "max_concurrent_commands"):
+            EXECUTOR.apply_config(new)
+        if touched("notification"):
+            self.notifications.configure(new.get("notification") or {})
+
+        old_cgroups = self.cgroups
+        self.config = new
+        self.settings = settings
+        for attr, obj in built.items():
+            setattr(self, attr, obj)
+        if "cgroups" in built:
+            old_cgroups.close()
+        if touched("log_"):
+            self.setup_logging()
+
+        changes = "; ".join(f"{k}: {self._short(v[0])} → {self._short(v[1])}" for k, v in sorted(diff.items()))
+        self.logger.info(f"تنظیمات دوباره بارگذاری شد ({source}): {changes}")
+        if "web_port" in diff:
+            self.logger.warning("تغییر web_port پس از ریستارت وب سرور اعمال می‌شود")
+        self.events.emit(EVENT_CONFIG_RELOAD, None, source=source, keys=sorted(diff))
+        return True
+
+    @staticmethod
+    def _short(value, limit: int = 60) -> str:
+        text = json.dumps(value, ensure_ascii=False)
+        return text if len(text) <= limit else text[:limit] + "…"
+
     # ----- Discovery -----
     def discover_tunnels(self) -> List[Dict]:
         """کشف سرویس‌هایی که نامشان شامل rathole است (حتی اگر inactive باشند)."""
@@ -973,7 +375,9 @@ class RatholeMonitor:
     def extract_tunnel_info(self, service_name: str) -> Optional[Dict]:
         """دریافت وضعیت سرویس از systemd."""
         try:
-            result = run_cmd(["systemctl", "show", service_name, "--property=ActiveState,SubState,ExecStart,FragmentPath"])
+            result = run_cmd(["systemctl", "show", service_name,
+                              "--property=ActiveState,SubState,ExecStart,FragmentPath,MainPID,"
+                              "StateChangeTimestampMonotonic"])
             info: Dict[str, str] = {}
             for line in result.stdout.splitlines():
                 if "=" in line:
@@ -982,6 +386,8 @@ class RatholeMonitor:
 
             active_state = info.get("ActiveState", "unknown")
             sub_state = info.get("SubState", "unknown")
+            # زمان آخرین تغییر وضعیت systemd (ساعت monotonic) به epoch
+            changed = int(info.get("StateChangeTimestampMonotonic", "0") or 0)
             return {
                 "name": service_name,
                 "type": "iran" if "iran" in service_name.lower() else "kharej",
@@ -989,6 +395,8 @@ class RatholeMonitor:
                 "sub_status": sub_state,
                 "last_restart": None,
                 "restart_count": 0,
+                "pid": int(info.get("MainPID", "0") or 0),
+                "state_since": round(time.time() - time.monotonic() + changed / 1e6, 3) if changed else None,
                 "config_path": self.find_config_path(service_name, info.get("ExecStart", ""), info.get("FragmentPath", "")),
             }
         except Exception as e:
@@ -1027,9 +435,13 @@ class RatholeMonitor:
         res = run_cmd(["systemctl", "is-active", service_name])
         return res.stdout.strip() == "active"
 
+    def policy_for(self, service_name: str) -> TunnelPolicy:
+        """سیاست resolve‌شده تانل (یا تنظیمات سراسری اگر تانل هنوز کشف نشده)."""
+        return self.policies.get(service_name)
+
     def ensure_active_if_needed(self, tunnel: Dict) -> bool:
         """اگر inactive/failed بود، تلاش برای فعال‌سازی مجدد."""
-        if not self.config.get("restart_on_inactive", True):
+        if not self.policy_for(tunnel["name"]).settings.restart_on_inactive:
             return False
 
         service = tunnel["name"]
@@ -1047,6 +459,8 @@ class RatholeMonitor:
                 run_cmd(["systemctl", "restart", service])
 
             ok = self.is_active(service)
+            self.health.forget(service)
+            self.events.emit(EVENT_ACTIVATION, service, from_state=state, ok=ok)
             if ok:
                 tunnel["status"] = "active"
                 tunnel["sub_status"] = "running"
@@ -1057,7 +471,7 @@ class RatholeMonitor:
         return False
 
     def _read_recent_journal(self, service_name: str) -> str:
-        since_sec = int(self.config.get("journal_since_seconds", self.config.get("check_interval", DEFAULT_CHECK_INTERVAL)))
+        since_sec = self.policy_for(service_name).settings.journal_since_seconds
         since_arg = f"{since_sec} seconds ago"
         r = run_cmd(["journalctl", "-u", service_name, "--since", since_arg, "--no-pager", "-q"])
         return r.stdout.lower()
@@ -1066,16 +480,16 @@ class RatholeMonitor:
         """تحلیل لاگ‌های اخیر: الگوهای نادیده + الگوهای بحرانی. (الگوها را خودتان بعداً پر کنید)"""
         try:
             log_text = self._read_recent_journal(service_name)
+            policy = self.policy_for(service_name)
 
             # اگر الگوهای نادیده وجود دارد، حذف‌شان کنیم که اثر نگذارند
-            for ign in IGNORED_ERROR_PATTERNS:
-                if not ign:
-                    continue
-                log_text = log_text.replace(ign.lower(), "")
+            for ign in policy.ignored_patterns:
+                log_text = log_text.replace(ign, "")
 
-            # بررسی الگوهای بحرانی
-            for crit in CRITICAL_ERROR_PATTERNS:
-                if crit and crit.lower() in log_text:
+            # بررسی الگوهای بحرانی (فهرست lowercase یک بار در هر بارگذاری تنظیمات ساخته می‌شود)
+            for crit, crit_lower in policy.critical_patterns:
+                if crit_lower in log_text:
+                    self.events.emit(EVENT_PATTERN_HIT, service_name, pattern=crit)
                     return True
 
             # اگر لیست بحرانی خالی است، هیچ ارزیابی بحرانی انجام نمی‌دهیم (مطابق خواست شما)
@@ -1084,57 +498,101 @@ class RatholeMonitor:
             self.logger.error(f"خطا در بررسی لاگ {service_name}: {e}")
             return False
 
-    def check_tunnel_health(self, tunnel: Dict) -> bool:
-        """سلامت سرویس: active بودن و عدم وجود خطای بحرانی (طبق الگوهای تعریف‌شده توسط شما)."""
-        name = tunnel["name"]
-
-        if not self.is_active(name):
-            self.logger.warning(f"سرویس {name} active نیست")
-            tunnel["status"] = "inactive"
-            return False
-
-        # اگر سرویس active است، وضعیت را بروزرسانی می‌کنیم
-        tunnel["status"] = "active"
-
-        # تحلیل لاگ‌ها (فعلاً الگوها خالی‌اند مگر خودتان اضافه کنید)
-        if self.has_critical_error(name):
-            self.logger.warning(f"الگوی خطای بحرانی در لاگ سرویس {name} یافت شد")
-            return False
-
-        return True
+    def _read_new_journal(self, service_name: str, stats) -> List[str]:
+        """خطوط جدید journal بعد از آخرین cursor (بار اول: journal_since_seconds اخیر)."""
+        cmd = ["journalctl", "-u", service_name, "--no-pager", "-q", "--show-cursor"]
+        if stats.cursor:
+            cmd += ["--after-cursor", stats.cursor]
+        else:
+            cmd += ["--since", f"{self.policy_for(service_name).settings.journal_since_seconds} seconds ago"]
+        lines = run_cmd(cmd).stdout.splitlines()
+        if lines and lines[-1].startswith("-- cursor: "):
+            stats.cursor = lines.pop()[len("-- cursor: "):].strip()
+        return [line.lower() for line in lines]
+
+    def log_error_reason(self, service_name: str, peek: bool = False) -> str:
+        """
+        دلیل ناسالم بودن از روی لاگ ("" یعنی سالم). با peek=True روی کپی آمار ارزیابی می‌شود:
+        cursor و baseline ذخیره‌شده جلو نمی‌روند و رویدادی ثبت نمی‌شود (چک دستی CLI).
+        """
+        policy = self.policy_for(service_name)
+        if not policy.settings.log_anomaly_detection:
+            return "critical pattern" if self.has_critical_error(service_name) else ""
+        if not policy.scored_patterns:
+            return ""
+        try:
+            if peek:
+                stored = self.log_anomaly.peek(service_name)
+                stats = stored.copy() if stored is not None else LogStats()
+            else:
+                stats = self.log_anomaly.get(service_name)
+            now = time.monotonic()
+            if stats.last_read is None:
+                minutes = policy.settings.journal_since_seconds / 60.0
+            else:
+                minutes = (now - stats.last_read) / 60.0
+            lines = self._read_new_journal(service_name, stats)
+            stats.last_read = now
+            total, score, hits = self.log_anomaly.count(lines, policy.ignored_patterns, policy.scored_patterns)
+            anomalous, reason = self.log_anomaly.observe(service_name, total, score, hits, minutes,
+                                                         policy.settings, stats)
+            if peek:
+                return reason
+            # سطح نرخ خطا (حتی زیر آستانه) برای پیش‌بینی خرابی؛ فقط با تغییر سطح ثبت می‌شود
+            level = rate_level(stats.last_score)
+            if level != stats.level:
+                stats.level = level
+                self.events.emit(EVENT_LOG_RATE, service_name, score=round(stats.last_score, 2))
+            if anomalous:
+                for pattern, n in hits:
+                    self.events.emit(EVENT_PATTERN_HIT, service_name, pattern=pattern, count=n)
+            return reason
+        except Exception as e:
+            self.logger.error(f"خطا در بررسی لاگ {service_name}: {e}")
+            return ""
+
+    def check_tunnel_health(self, tunnel: Dict, peek: bool = False) -> bool:
+        """
+        سلامت سرویس طبق پایپ‌لاین چک‌های تعریف‌شده برای این تانل (پیش‌فرض: systemd + الگوهای لاگ).
+        peek=True (چک دستی): آمار لاگ و کش نتایج دور مانیتور تغییر نمی‌کنند.
+        """
+        pipeline = self.policy_for(tunnel["name"]).pipeline or self.health.for_tunnel(tunnel["name"])
+        healthy, results = pipeline.evaluate(self, tunnel, peek)
+        tunnel["checks"] = {r.check: r.to_dict() for r in results}
+        return healthy
 
     # ----- Restart logic -----
     def _can_restart(self, service_name: str) -> bool:
         """بررسی سقف تلاش‌ها در پنجره مشخص و بک‌آف زمانی."""
-        max_attempts = int(self.config.get("max_restart_attempts", DEFAULT_MAX_RESTART_ATTEMPTS))
-        window_sec = int(self.config.get("restart_window_seconds", DEFAULT_RESTART_WINDOW_SECONDS))
+        settings = self.policy_for(service_name).settings
+        max_attempts = settings.max_restart_attempts
+        window_sec = settings.restart_window_seconds
+        now = time.time()
 
         # بک‌آف
-        na = self._next_allowed_restart.get(service_name)
-        if na and datetime.now() < na:
+        na = self.restart_state.next_allowed(service_name)
+        if na and now < na:
             return False
 
-        # پاکسازی تاریخچه قدیمی
-        hist = self._restart_history.setdefault(service_name, [])
-        cutoff = datetime.now() - timedelta(seconds=window_sec)
-        hist[:] = [t for t in hist if t >= cutoff]
-
-        return len(hist) < max_attempts
+        # فقط ریستارت‌های داخل پنجره شمرده می‌شوند (قدیمی‌ها از ابتدای حلقه حذف می‌شوند)
+        return self.restart_state.count_since(service_name, now - window_sec) < max_attempts
 
     def _register_restart(self, service_name: str, success: bool):
         """ثبت ریستارت و افزایش بک‌آف در صورت شکست."""
-        hist = self._restart_history.setdefault(service_name, [])
-        hist.append(datetime.now())
+        now = time.time()
+        self.restart_state.record_restart(service_name, now)
         if not success:
-            # بک‌آف نمایی ساده: 30s, 60s, 120s ...
-            prev = self._next_allowed_restart.get(service_name, datetime.now())
-            delay = 30 if prev < datetime.now() else int((prev - datetime.now()).total_seconds()) * 2 or 30
-            self._next_allowed_restart[service_name] = datetime.now() + timedelta(seconds=min(delay, 600))
+            # بک‌آف نمایی ساده: 30s, 60s, 120s ... (حداکثر ۱۰ دقیقه)
+            prev = self.restart_state.last_backoff_delay(service_name)
+            delay = min(prev * 2, 600) if prev else 30
+            self.restart_state.set_backoff(service_name, now + delay, delay)
+            self.events.emit(EVENT_BACKOFF, service_name, delay=delay, until=round(now + delay, 3))
         else:
             # موفق بود: بک‌آف را پاک کن
-            self._next_allowed_restart.pop(service_name, None)
+            self.restart_state.clear_backoff(service_name)
 
-    def restart_tunnel(self, tunnel: Dict) -> bool:
+    def restart_tunnel(self, tunnel: Dict, reason: str = "") -> bool:
+        """reason: "" (ترمیم خودکار)، "manual" یا "predictive"."""
         name = tunnel["name"]
 
         if not self._can_restart(name):
@@ -1142,7 +600,9 @@ class RatholeMonitor:
             return False
 
         self.logger.info(f"ریستارت تانل {name}...")
-        delay = int(self.config.get("restart_delay", DEFAULT_RESTART_DELAY))
+        extra = {"reason": reason} if reason else {}
+        self.events.emit(EVENT_RESTART_ATTEMPT, name, status=tunnel.get("status"), **extra)
+        delay = self.policy_for(name).settings.restart_delay
         ok = False
         try:
             run_cmd(["systemctl", "stop", name])
@@ -1161,61 +621,468 @@ class RatholeMonitor:
             self.logger.error(f"خطا در ریستارت {name}: {e}")
             ok = False
 
+        # نتیجه ناموفق کش‌شده تا TTL تانل تازه ریستارت‌شده را ناسالم نشان می‌داد
+        self.health.forget(name)
+        self.events.emit(EVENT_RESTART_RESULT, name, ok=ok)
         self._register_restart(name, ok)
         return ok
 
+    def _may_remediate(self, tunnel: Dict) -> bool:
+        """ترمیم اکنون کاری انجام می‌دهد؟ (فعال‌سازی تانل متوقف، یا ریستارت خارج از بک‌آف/سقف تلاش)"""
+        ts = self.policy_for(tunnel["name"]).settings
+        if ts.restart_on_inactive and tunnel.get("status") in ("inactive", "failed", "deactivating"):
+            return True
+        if ts.auto_restart and self._can_restart(tunnel["name"]):
+            return True
+        self.logger.info(f"ترمیم {tunnel['name']} فعلاً مجاز نیست (بک‌آف یا سقف تلاش‌ها)؛ از بودجه کم نشد")
+        return False
+
+    def _remediate(self, tunnel: Dict, auto_restart: bool) -> bool:
+        """ترمیم تانل ناسالم: ابتدا فعال‌سازی (اگر inactive بود)، سپس ریستارت."""
+        self.health_state.remediated(tunnel["name"])
+        if self.ensure_active_if_needed(tunnel):
+            return True
+        if auto_restart:
+            return self.restart_tunnel(tunnel)
+        return False
+
+    def _remediate_in_waves(self, pending: List[Dict]):
+        """
+        ترمیم به ترتیب توپولوژیک وابستگی‌ها: هر موج بعد از تمام شدن موج قبلی اجرا می‌شود و
+        داخل موج به ترتیب اولویت، با سقف همزمانی و jitter. تانلی که والد ناسالم دارد رد می‌شود.
+        """
+        for wave in self.deps.waves(pending):
+            # قبل از هر موج از نو: والدی که موج قبل ترمیم شد دیگر مانع نیست؛ والدی که در پنجره
+            # نگهداری است هم مانع ترمیم فرزندان است (عمداً متوقف شده)
+            down = self._unhealthy | set(self._silenced)
+            runnable: List[Dict] = []
+            for tunnel in wave:
+                blockers = self.deps.blocked_by(tunnel["name"], down)
+                if blockers:
+                    self.logger.warning(
+                        f"ترمیم {tunnel['name']} رد شد؛ والد ناسالم یا در حال نگهداری: {', '.join(blockers)}")
+                    self.events.emit(EVENT_DEPENDENCY_SKIP, tunnel["name"], blocked_by=blockers)
+                else:
+                    runnable.append(tunnel)
+            # هر ترمیم تمام‌شده پیشرفت حلقه است؛ بدون پینگ، چند موج ریستارت از WatchdogSec می‌گذرد
+            results = self.restart_budget.run(
+                runnable, lambda t: self._remediate(t, self.policy_for(t["name"]).settings.auto_restart),
+                on_done=self.notifier.watchdog, eligible=self._may_remediate)
+            for name, ok in results.items():
+                if ok:
+                    self._unhealthy.discard(name)
+
+    # ----- Maintenance windows -----
+    def _silence_for(self, tunnel: Dict, wall: float) -> Optional[Dict]:
+        name = tunnel["name"]
+        return self.maintenance.silenced(name, tunnel.get("type", ""), lambda: self.policies.tags_for(name), wall)
+
+    def _in_maintenance(self, tunnel: Dict, old: Optional[Dict], wall: float) -> bool:
+        """تانل در پنجره نگهداری/سکوت است؟ (در این صورت نه چک می‌شود نه ترمیم)"""
+        name = tunnel["name"]
+        silence = self._silence_for(tunnel, wall)
+        was = self._silenced.get(name)
+        if silence is None:
+            if was is not None:
+                del self._silenced[name]
+                self.logger.info(f"پنجره نگهداری {name} تمام شد؛ مانیتورینگ از سر گرفته شد")
+                self.events.emit(EVENT_SILENCE, name, on=False, id=was)
+                # خطاهای لاگ در مدت نگهداری نباید بعد از آن به حساب تانل گذاشته شوند
+                stats = self.log_anomaly.peek(name)
+                if stats is not None:
+                    self._skip_journal(name, stats)
+            return False
+        if was != silence["id"]:
+            self._silenced[name] = silence["id"]
+            until = datetime.fromtimestamp(silence["until"]).isoformat(sep=" ", timespec="minutes")
+            self.logger.info(f"تانل {name} تا {until} در پنجره نگهداری است ({silence['comment'] or silence['id']})")
+            self.events.emit(EVENT_SILENCE, name, on=True, id=silence["id"], until=silence["until"])
+        tunnel["silenced"] = silence
+        if old:
+            for key in ("checks", "health", "failure_risk"):
+                if old.get(key) is not None:
+                    tunnel[key] = old[key]
+        return True
+
+    def _incident_closed(self, name: str, rec: Dict):
+        restart = f"، ریستارت بعد از {rec['restart_s']} ثانیه" if rec["restart_s"] is not None else ""
+        self.logger.info(f"رخداد {name} بسته شد: قطعی {rec['healthy_s']} ثانیه "
+                         f"(تشخیص بعد از {rec['detect_s']} ثانیه{restart})")
+        self.events.emit(EVENT_INCIDENT, name, **rec)
+
+    def _skip_journal(self, service_name: str, stats):
+        """انتقال cursor لاگ به انتهای فعلی journal (بدون خواندن خطوط قبلی)."""
+        lines = run_cmd(["journalctl", "-u", service_name, "-n", "1", "--no-pager", "-q", "--show-cursor"]).stdout
+        lines = lines.splitlines()
+        if lines and lines[-1].startswith("-- cursor: "):
+            stats.cursor = lines[-1][len("-- cursor: "):].strip()
+        stats.last_read = time.monotonic()
+
+    # ----- Predictive restart -----
+    @staticmethod
+    def _is_quiet(tunnel: Dict, ts: Settings) -> bool:
+        """دوره کم‌ترافیک: ترافیک و اتصال‌های برقرار زیر آستانه (بدون داده → آرام نیست)."""
+        traffic = tunnel.get("traffic")
+        conns = tunnel.get("connections")
+        if traffic is None and conns is None:
+            return False
+        if traffic is not None and traffic.get("rx_bps", 0) + traffic.get("tx_bps", 0) > ts.predict_quiet_bps:
+            return False
+        if conns is not None and conns.get("established", 0) > ts.predict_quiet_connections:
+            return False
+        return True
+
+    def _assess_risk(self, tunnel: Dict, ts: Settings, wall: float, now: float, preemptive: List[Dict]):
+        name = tunnel["name"]
+        risk = self.predictor.score(name, wall)
+        if risk is None:
+            return
+        tunnel["failure_risk"] = round(risk, 3)
+        if not ts.predictive_restart or risk < ts.predict_threshold:
+            return
+        last = self._predictive_at.get(name)
+        if last is not None and now - last < ts.predict_cooldown_seconds:
+            return
+        if not self._is_quiet(tunnel, ts):
+            self.logger.debug(f"احتمال خرابی {name} {risk:.2f} است؛ ریستارت پیشگیرانه در انتظار دوره کم‌ترافیک")
+            return
+        preemptive.append(tunnel)
+
+    def _restart_preemptively(self, tunnels: List[Dict]):
+        """ریستارت کنترل‌شده تانل‌های پرخطر در دوره آرام، زیر همان بودجه سراسری ریستارت."""
+        def run(tunnel: Dict) -> bool:
+            name = tunnel["name"]
+            self._predictive_at[name] = time.monotonic()
+            self.logger.warning(
+                f"احتمال خرابی {name} {tunnel['failure_risk']:.2f} است؛ ریستارت پیشگیرانه در دوره کم‌ترافیک"
+            )
+            self.events.emit(EVENT_PREDICTIVE_RESTART, name, risk=tunnel["failure_risk"])
+            return self.restart_tunnel(tunnel, "predictive")
+
+        self.restart_budget.run(tunnels, run, on_done=self.notifier.watchdog,
+                                eligible=lambda t: self._can_restart(t["name"]))
+
     # ----- Loop -----
     def monitor_once(self):
+        # سکوت‌های تازه قبل از ثبت تغییر وضعیت‌ها دیده شوند (توقف عمدی برچسب silenced می‌گیرد)
+        self.maintenance.refresh()
         # بروزرسانی لیست سرویس‌ها
         tunnels = self.discover_tunnels()
+        # شمارنده ریستارت از دور قبل حفظ شود (discover هر بار آن را صفر می‌کند)
+        prev = {t.get("name"): t for t in self.config.get("tunnels", []) if isinstance(t, dict)}
+        for tunnel in tunnels:
+            old = prev.get(tunnel["name"])
+            if old:
+                tunnel["restart_count"] = old.get("restart_count", 0)
+                tunnel["last_restart"] = old.get("last_restart")
+            # سیاست تانل یک بار هنگام کشف ساخته و کش می‌شود
+            policy = self.policies.resolve(tunnel)
+            if policy.rules:
+                tunnel["policy"] = list(policy.rules)
+            old_status = old.get("status") if old else None
+            if old_status != tunnel.get("status"):
+                # توقف در پنجره نگهداری عمدی است؛ با برچسب silenced ثبت می‌شود تا خرابی حساب نشود
+                silence = self._silence_for(tunnel, time.time())
+                extra = {"silenced": silence["id"]} if silence else {}
+                self.events.emit(EVENT_STATE_CHANGE, tunnel["name"], old=old_status,
+                                 new=tunnel.get("status"), sub=tunnel.get("sub_status"), **extra)
         self.config["tunnels"] = tunnels
-
-        auto_restart = self.config.get("auto_restart", True)
-
+        self.policies.retain(t["name"] for t in tunnels)
+        self.deps.build(t["name"] for t in tunnels)
+        for tunnel in tunnels:
+            parents = self.deps.parents.get(tunnel["name"])
+            if parents:
+                tunnel["depends_on"] = sorted(parents)
+            groups = self.deps.groups_for(tunnel["name"])
+            if groups:
+                tunnel["groups"] = groups
+
+        settings = self.settings
+
+        # نمونه‌برداری منابع هر تانل از cgroup (بدون اجرای دستور)
+        if settings.cgroup_telemetry:
+            for tunnel in tunnels:
+                sample = self.cgroups.sample(tunnel["name"])
+                if sample is not None:
+                    tunnel["resources"] = {k: round(v, 2) for k, v in sample.items()}
+            self.cgroups.retain(t["name"] for t in tunnels)
+
+        # یک dump اتصال‌ها برای همه تانل‌ها
+        if settings.connection_telemetry:
+            try:
+                summaries = self.connections.collect(tunnels)
+                for tunnel in tunnels:
+                    tunnel["connections"] = summaries.get(tunnel["name"])
+            except Exception as e:
+                self.logger.error(f"خطا در جمع‌آوری اتصال‌ها: {e}")
+
+        # نرخ ترافیک هر تانل (یک گذر روی /proc برای همه)
+        if settings.traffic_accounting:
+            rates = self.traffic.sample(tunnels)
+            for tunnel in tunnels:
+                if tunnel["name"] in rates:
+                    tunnel["traffic"] = rates[tunnel["name"]]
+
+        # بررسی سلامت تانل‌هایی که نوبت چکشان رسیده؛ ترمیم بعداً و یکجا زیر بودجه سراسری
+        pending: List[Dict] = []
+        preemptive: List[Dict] = []
+        now = time.monotonic()
+        wall = time.time()
+        self.predictor.reload_model()
         for tunnel in tunnels:
             name = tunnel["name"]
-
-            # اگر inactive/failed → تلاش برای active کردن
-            self.ensure_active_if_needed(tunnel)
-
-            # بررسی سلامت
+            ts = self.policy_for(name).settings
+            if self._in_maintenance(tunnel, prev.get(name), wall):
+                continue
+            self.slo.tick(name, wall, 2 * ts.check_interval)
+            # ۱ ثانیه تلورانس تا تانلی با همان فاصله حلقه به خاطر چند میلی‌ثانیه یک دور جا نماند
+            if now < self._next_check.get(name, 0) - 1:
+                old = prev.get(name)
+                if old and old.get("checks"):
+                    tunnel["checks"] = old["checks"]
+                tunnel["health"] = self.health_state.get(name).snapshot()
+                continue
+            self._next_check[name] = now + ts.check_interval
             healthy = self.check_tunnel_health(tunnel)
+            was_quarantined = self.health_state.get(name).quarantined
+            th = self.health_state.observe(name, healthy, ts, now)
+            tunnel["health"] = th.snapshot()
+            self.slo.observe(name, healthy, th.state, wall,
+                             tunnel.get("state_since") if tunnel.get("status") != "active" else None)
+            log_stats = self.log_anomaly.peek(name)
+            if log_stats is not None:
+                tunnel["log_stats"] = log_stats.snapshot()
+            if th.quarantined and not was_quarantined:
+                self.logger.warning(
+                    f"تانل {name} flapping است ({len(th.drops)} افت در {ts.flap_window_seconds} ثانیه)؛ "
+                    f"قرنطینه: حداکثر یک ترمیم در هر {ts.quarantine_seconds} ثانیه"
+                )
+                self.events.emit(EVENT_QUARANTINE, name, on=True, flaps=len(th.drops))
+            elif was_quarantined and not th.quarantined:
+                self.logger.info(f"تانل {name} از قرنطینه خارج شد")
+                self.events.emit(EVENT_QUARANTINE, name, on=False)
+
+            if th.state == STATE_SUSPECT:
+                # یک نمونه ناموفق هنوز کافی نیست؛ تایید با چک زودتر از check_interval
+                failed = tunnel["health"]["failed_samples"]
+                self.logger.info(
+                    f"نمونه ناموفق {name} ({failed}/{ts.health_fail_threshold})؛ "
+                    f"چک مجدد تا {ts.health_recheck_seconds} ثانیه دیگر"
+                )
+                recheck = now + min(ts.health_recheck_seconds, ts.check_interval)
+                self._next_check[name] = recheck
+                continue
+            # تانلی که در حال بهبود است (نمونه موفق ولی هنوز کمتر از health_recover_samples)
+            # ترمیم نمی‌شود و جلوی ترمیم فرزندانش را هم نمی‌گیرد
+            if th.state != STATE_UNHEALTHY or healthy:
+                self._unhealthy.discard(name)
+                if th.state == STATE_HEALTHY and self.predictor.enabled:
+                    self._assess_risk(tunnel, ts, wall, now, preemptive)
+                continue
+            self._unhealthy.add(name)
+            if not self.health_state.may_remediate(name, ts, now):
+                self.logger.info(f"تانل {name} در قرنطینه است؛ ترمیم به بعد موکول شد")
+                continue
+            if ts.auto_restart or (ts.restart_on_inactive and tunnel.get("status") == "inactive"):
+                pending.append(tunnel)
+        current = {t["name"] for t in tunnels}
+        for name in [n for n in self._next_check if n not in current]:
+            del self._next_check[name]
+        self._unhealthy &= current
+        self.health_state.retain(current)
+        self.log_anomaly.retain(current)
+        self.predictor.retain(current)
+        for name in [n for n in self._predictive_at if n not in current]:
+            del self._predictive_at[name]
+        for name in [n for n in self._silenced if n not in current]:
+            del self._silenced[name]
+        self.slo.retain(current)
+
+        # اگر خرابی‌ها ریشه مشترک دارند (مقصد/لینک قطع است) ریستارت بی‌فایده است
+        pending = self.correlator.filter(tunnels, pending)
+
+        if pending or preemptive:
+            self.notifier.watchdog()
+        self._remediate_in_waves(pending)
+        if preemptive:
+            self._restart_preemptively(preemptive)
 
-            # در صورت ناسالم بودن، اگر مجاز بود ریستارت
-            if not healthy and auto_restart:
-                self.restart_tunnel(tunnel)
+        for tunnel in tunnels:
+            incident = self.slo.incident(tunnel["name"])
+            if incident is not None:
+                tunnel["incident"] = incident
+        for path in self.slo.flush(wall, settings.slo_target):
+            self.logger.info(f"گزارش ماهانه SLO ذخیره شد: {path}")
 
         # ذخیره وضعیت
         self.save_config()
+        self._publish_snapshot()
+
+    def _publish_snapshot(self):
+        snapshot = {
+            "running": self.running,
+            "started": self._read_start_time(),
+            "updated": now_iso(),
+            "interval": self.policies.min_interval,
+            "tunnels": self.config.get("tunnels", []),
+            "outages": self.correlator.snapshot(),
+            "commands": EXECUTOR.snapshot(),
+            "notifications": self.notifications.snapshot(),
+        }
+        self._snapshot = json.dumps(snapshot, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    # ----- Control socket -----
+    def _match_tunnels(self, pattern: str) -> List[Dict]:
+        tunnels = [t for t in self.config.get("tunnels", []) if fnmatch.fnmatchcase(t.get("name", ""), pattern)]
+        if not tunnels:
+            raise ValueError(f"هیچ تانلی با {pattern} منطبق نیست")
+        return tunnels
+
+    def _control_check(self, msg: Dict) -> Iterator[Dict]:
+        tunnels = self._match_tunnels(msg.get("pattern") or "*")
+
+        def run():
+            for tunnel in tunnels:
+                with self._lock:
+                    healthy = self.check_tunnel_health(tunnel, peek=True)
+                yield {"name": tunnel["name"], "healthy": healthy, "status": tunnel.get("status"),
+                       "checks": tunnel.get("checks", {})}
+        return run()
+
+    def _control_restart(self, msg: Dict) -> Iterator[Dict]:
+        """
+        ریستارت دستی تانل‌های منطبق با glob، یکی‌یکی و هر کدام زیر قفل حلقه: همزمان با
+        monitor_once همان تانل دوبار stop/start نمی‌شود و dict تانل‌ها حین ذخیره تغییر نمی‌کند.
+        """
+        names = [t["name"] for t in self._match_tunnels(msg.get("pattern") or msg.get("name") or "")]
+
+        def run():
+            for name in names:
+                with self._lock:
+                    # دور مانیتور ممکن است لیست تانل‌ها را در این فاصله از نو ساخته باشد
+                    tunnel = next((t for t in self.config.get("tunnels", []) if t.get("name") == name), None)
+                    ok = tunnel is not None and bool(self.restart_tunnel(tunnel, "manual"))
+                yield {"name": name, "ok": ok}
+        return run()
+
+    def _control_config_get(self, msg: Dict):
+        values = self.settings.to_dict()
+        key = msg.get("key")
+        if not key:
+            return values
+        if key not in values:
+            raise ValueError(f"کلید ناشناخته: {key}")
+        return {key: values[key]}
+
+    def _control_config_set(self, msg: Dict) -> Dict:
+        updates = msg.get("updates") or {}
+        if not isinstance(updates, dict) or not updates:
+            raise ValueError("هیچ تغییری داده نشده")
+        changed = self.update_config(updates, source="cli")
+        values = self.settings.to_dict()
+        return {"changed": changed, "values": {k: values.get(k) for k in updates}}
+
+    def start_control(self):
+        """سوکت کنترل برای CLI سریع (فقط در حالت سرویس)."""
+        self.control = ControlServer(CONTROL_SOCKET, {
+            "status": lambda msg: self._snapshot,
+            "check": self._control_check,
+            "restart": self._control_restart,
+            "config_get": self._control_config_get,
+            "config_set": self._control_config_set,
+        })
+        if self.control.start():
+            self.logger.info(f"سوکت کنترل روی {CONTROL_SOCKET}")
+        else:
+            self.control = None
+
+    def stop_control(self):
+        if self.control is not None:
+            self.control.stop()
+            self.control = None
 
     def monitor_loop(self):
         self.logger.info("شروع مانیتورینگ تانل‌ها...")
         while self.running:
             try:
+                started = time.monotonic()
                 with self._lock:
                     self.monitor_once()
-                time.sleep(int(self.config.get("check_interval", DEFAULT_CHECK_INTERVAL)))
+                self._cycle_completed(time.monotonic() - started)
+                self._sleep_between_cycles()
             except KeyboardInterrupt:
                 break
             except Exception as e:
                 self.logger.error(f"خطا در حلقه مانیتورینگ: {e}")
-                time.sleep(60)
+                self._wake.wait(60)
+                self._wake.clear()
         self.logger.info("مانیتورینگ متوقف شد")
 
+    def _cycle_completed(self, took: float):
+        """فقط بعد از یک دور کامل: WATCHDOG=1 و آمار دور در STATUS=."""
+        self._cycles += 1
+        tunnels = self.config.get("tunnels", [])
+        self.notifier.watchdog()
+        self.notifier.status(
+            f"دور {self._cycles}: {len(tunnels)} تانل، {len(self._unhealthy)} ناسالم، {took:.1f} ثانیه"
+        )
+
+    def _sleep_between_cycles(self):
+        """صبر تا دور بعد؛ درخواست‌های بارگذاری مجدد در همین فاصله اعمال می‌شوند.
+
+        خواب فقط بعد از یک دور کامل رخ می‌دهد، پس WATCHDOG=1 در طول آن هم ادامه پیدا می‌کند؛
+        دوری که گیر کند (قفل یا دستور بی‌پاسخ) دیگر پینگی نمی‌فرستد و systemd سرویس را ریستارت می‌کند.
+        """
+        started = time.monotonic()
+        while self.running:
+            # با هر بارگذاری مجدد، check_interval جدید بلافاصله اثر می‌کند
+            deadline = started + self.policies.min_interval
+            # نزدیک‌ترین چک تاییدی (نمونه ناموفق تاییدنشده)، حتی اگر در دورهای قبل زمان‌بندی شده باشد؛
+            # زمان‌های گذشته (تانل در پنجره نگهداری) نادیده گرفته می‌شوند تا حلقه خالی نچرخد
+            upcoming = [t for t in self._next_check.values() if t > started]
+            if upcoming:
+                deadline = min(deadline, min(upcoming))
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if self.notifier.watchdog_interval is not None:
+                remaining = min(remaining, self.notifier.watchdog_interval)
+            if self._wake.wait(remaining):
+                self._wake.clear()
+            else:
+                self.notifier.watchdog()
+            if self._reload_requested.is_set():
+                self._reload_requested.clear()
+                with self._lock:
+                    self.reload_config(self._reload_source)
+
     def start_monitoring(self):
         if not self.running:
             self.running = True
+            if self.watcher is None:
+                self.watcher = ConfigWatcher(CONFIG_FILE, self.request_reload)
+                self.watcher.start()
+                self.logger.info(f"پایش تغییرات config.json با {self.watcher.mode}")
+            self.notifications.start()
             t = threading.Thread(target=self.monitor_loop, daemon=True)
             t.start()
 
     def stop_monitoring(self):
         self.running = False
+        self._wake.set()
+        self.notifications.stop()
 
     # ----- UI helpers -----
-    def get_uptime(self) -> str:
+    def _read_start_time(self) -> Optional[str]:
         try:
             with open(f"{MONITOR_DIR}/start_time", "r", encoding="utf-8") as f:
-                st = datetime.fromisoformat(f.read().strip())
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def get_uptime(self) -> str:
+        try:
+            st = datetime.fromisoformat(self._read_start_time())
             return str((datetime.now() - st)).split(".")[0]
         except Exception:
             return "نامشخص"
@@ -1226,6 +1093,10 @@ class RatholeMonitor:
             "tunnels": self.config.get("tunnels", []),
             "config": self.config,
             "uptime": self.get_uptime(),
+            "outages": self.correlator.snapshot(),
+            "health_stats": self.health.stats_snapshot(),
+            "commands": EXECUTOR.snapshot(),
+            "notifications": self.notifications.snapshot(),
         }
 
 
@@ -1257,7 +1128,7 @@ def manual_restart(m: RatholeMonitor):
     try:
         idx = int(choice) - 1
         if 0 <= idx < len(ts):
-            ok = m.restart_tunnel(ts[idx])
+            ok = m.restart_tunnel(ts[idx], "manual")
             print("تانل با موفقیت ریستارت شد" if ok else "خطا در ریستارت تانل")
         else:
             print("شماره نامعتبر")
@@ -1267,22 +1138,62 @@ def manual_restart(m: RatholeMonitor):
 
 def show_logs():
     try:
-        subprocess.run(["tail", "-n", "50", LOG_FILE], check=False)
+        subprocess.run(["tail", "-n", "50", LOG_FILE], check=False, timeout=10)
     except Exception:
         print("خطا در نمایش لاگ‌ها")
 
 
+def format_event(ev: Dict) -> str:
+    ts = datetime.fromtimestamp(ev.get("ts", 0)).isoformat(sep=" ", timespec="seconds")
+    extra = " ".join(f"{k}={v}" for k, v in ev.items() if k not in ("ts", "type", "tunnel"))
+    return f"{ts}  {ev.get('type', '?'):<16} {ev.get('tunnel') or '-':<30} {extra}"
+
+
+def show_events(m: RatholeMonitor):
+    """پرس‌وجو در ژورنال رویدادها (مثلاً همه ریستارت‌های یک تانل در هفته گذشته)."""
+    tunnel = input("نام تانل (خالی = همه): ").strip() or None
+    types = input("نوع رویداد (مثلاً restart_attempt,backoff؛ خالی = همه): ").strip()
+    days = input("چند روز گذشته؟ [7]: ").strip() or "7"
+    try:
+        since = time.time() - float(days) * 86400
+    except ValueError:
+        print("عدد نامعتبر")
+        return
+    t0 = time.perf_counter()
+    events = m.events.query(
+        tunnel=tunnel,
+        types=[x.strip() for x in types.split(",") if x.strip()] or None,
+        since=since,
+        limit=200,
+    )
+    took = (time.perf_counter() - t0) * 1000
+    for ev in events:
+        print(format_event(ev))
+    print(f"\n{len(events)} رویداد ({took:.1f}ms)")
+
+
 def create_service():
+    cfg = default_config()
+    try:
+        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            file_cfg = json.load(f)
+        if isinstance(file_cfg, dict):
+            cfg.update(file_cfg)
+    except (OSError, ValueError):
+        pass
     service_content = f"""[Unit]
 Description=Rathole Tunnel Monitor
 After=network.target
 Wants=network-online.target
 
 [Service]
-Type=simple
+Type=notify
+NotifyAccess=main
+WatchdogSec={watchdog_seconds(cfg)}
 User=root
 WorkingDirectory={MONITOR_DIR}
 ExecStart=/usr/bin/python3 {MONITOR_DIR}/monitor.py --daemon
+ExecReload=/bin/kill -HUP $MAINPID
 Restart=always
 RestartSec=10
 
@@ -1291,58 +1202,61 @@ WantedBy=multi-user.target
 """
     with open("/etc/systemd/system/rathole-monitor.service", "w", encoding="utf-8") as f:
         f.write(service_content)
-    subprocess.run(["systemctl", "daemon-reload"])
-    subprocess.run(["systemctl", "enable", "rathole-monitor"])
+    subprocess.run(["systemctl", "daemon-reload"], timeout=120)
+    subprocess.run(["systemctl", "enable", "rathole-monitor"], timeout=120)
 
 
 def install_requirements():
     print("نصب پیش‌نیازها...")
-    subprocess.run(["apt", "update"])
+    subprocess.run(["apt", "update"], timeout=900)
     for pkg in ["python3", "python3-pip", "systemd"]:
-        subprocess.run(["apt", "install", "-y", pkg])
+        subprocess.run(["apt", "install", "-y", pkg], timeout=900)
     print("پیش‌نیازها نصب شدند")
 
 
 def start_web_panel(m: RatholeMonitor):
-    print(f"وب پنل در حال شروع روی پورت {m.config.get('web_port', DEFAULT_WEB_PORT)}...")
+    print(f"وب پنل در حال شروع روی پورت {m.settings.web_port}...")
     print("برای اجرای وب پنل، از فایل web_server.py استفاده کنید")
 
 
 def config_menu(m: RatholeMonitor):
     while True:
+        st = m.settings
         print("\n⚙️ تنظیمات:")
-        print(f"1. فاصله چک (فعلی: {m.config.get('check_interval', DEFAULT_CHECK_INTERVAL)} ثانیه)")
-        print(f"2. ریستارت خودکار (فعلی: {'فعال' if m.config.get('auto_restart', True) else 'غیرفعال'})")
-        print(f"3. حداکثر تلاش ریستارت (فعلی: {m.config.get('max_restart_attempts', DEFAULT_MAX_RESTART_ATTEMPTS)})")
-        print(f"4. پنجره محدودسازی ریستارت (ثانیه) (فعلی: {m.config.get('restart_window_seconds', DEFAULT_RESTART_WINDOW_SECONDS)})")
-        print(f"5. تاخیر قبل از start بعد از stop (ثانیه) (فعلی: {m.config.get('restart_delay', DEFAULT_RESTART_DELAY)})")
-        print(f"6. بررسی مجدد لاگ از چند ثانیه قبل (فعلی: {m.config.get('journal_since_seconds', m.config.get('check_interval', DEFAULT_CHECK_INTERVAL))})")
-        print(f"7. فعال‌سازی خودکار در صورت inactive (فعلی: {'فعال' if m.config.get('restart_on_inactive', True) else 'غیرفعال'})")
+        print(f"1. فاصله چک (فعلی: {st.check_interval} ثانیه)")
+        print(f"2. ریستارت خودکار (فعلی: {'فعال' if st.auto_restart else 'غیرفعال'})")
+        print(f"3. حداکثر تلاش ریستارت (فعلی: {st.max_restart_attempts})")
+        print(f"4. پنجره محدودسازی ریستارت (ثانیه) (فعلی: {st.restart_window_seconds})")
+        print(f"5. تاخیر قبل از start بعد از stop (ثانیه) (فعلی: {st.restart_delay})")
+        print(f"6. بررسی مجدد لاگ از چند ثانیه قبل (فعلی: {st.journal_since_seconds})")
+        print(f"7. فعال‌سازی خودکار در صورت inactive (فعلی: {'فعال' if st.restart_on_inactive else 'غیرفعال'})")
         print("8. بازگشت")
 
         choice = input("انتخاب: ").strip()
         try:
             if choice == "1":
-                m.config["check_interval"] = int(input("فاصله جدید (ثانیه): ").strip())
+                updates = {"check_interval": int(input("فاصله جدید (ثانیه): ").strip())}
             elif choice == "2":
-                m.config["auto_restart"] = not m.config.get("auto_restart", True)
+                updates = {"auto_restart": not st.auto_restart}
             elif choice == "3":
-                m.config["max_restart_attempts"] = int(input("حداکثر تعداد تلاش: ").strip())
+                updates = {"max_restart_attempts": int(input("حداکثر تعداد تلاش: ").strip())}
             elif choice == "4":
-                m.config["restart_window_seconds"] = int(input("پنجره محدودسازی (ثانیه): ").strip())
+                updates = {"restart_window_seconds": int(input("پنجره محدودسازی (ثانیه): ").strip())}
             elif choice == "5":
-                m.config["restart_delay"] = int(input("تاخیر (ثانیه): ").strip())
+                updates = {"restart_delay": int(input("تاخیر (ثانیه): ").strip())}
             elif choice == "6":
-                m.config["journal_since_seconds"] = int(input("ثانیه: ").strip())
+                updates = {"journal_since_seconds": int(input("ثانیه: ").strip())}
             elif choice == "7":
-                m.config["restart_on_inactive"] = not m.config.get("restart_on_inactive", True)
+                updates = {"restart_on_inactive": not st.restart_on_inactive}
             elif choice == "8":
                 break
             else:
                 print("انتخاب نامعتبر")
                 continue
-            m.save_config()
+            m.update_config(updates, source="menu")
             print("تنظیمات ذخیره شد")
+        except ConfigError as e:
+            print(f"مقدار نامعتبر: {e}")
         except ValueError:
             print("مقدار نامعتبر")
 
@@ -1368,6 +1282,7 @@ def show_menu():
         print("6. مشاهده لاگ‌ها")
         print("7. نصب سرویس")
         print("8. شروع وب پنل")
+        print("9. جستجوی رویدادها (ریستارت/بک‌آف/تغییر وضعیت)")
         print("0. خروج")
         print("-"*50)
 
@@ -1386,6 +1301,8 @@ def show_menu():
             config_menu(monitor)
         elif choice == "6":
             show_logs()
+        elif choice == "9":
+            show_events(monitor)
         elif choice == "7":
             install_service()
         elif choice == "8":
@@ -1408,12 +1325,25 @@ def main():
 
     if len(sys.argv) > 1 and sys.argv[1] == "--daemon":
         monitor = RatholeMonitor()
+        # systemctl reload rathole-monitor → SIGHUP → بارگذاری مجدد تنظیمات
+        signal.signal(signal.SIGHUP, lambda signum, frame: monitor.request_reload("SIGHUP", force=True))
+        monitor.start_control()
         monitor.start_monitoring()
+        monitor.notifier.ready("شروع مانیتورینگ")
+        if monitor.notifier.watchdog_interval is not None:
+            needed = watchdog_seconds(monitor.config)
+            if monitor.notifier.watchdog_interval * 2 < needed:
+                monitor.logger.warning(
+                    f"WatchdogSec سرویس کمتر از بدترین زمان یک ریستارت است؛ حداقل {needed} ثانیه تنظیم کنید "
+                    f"(python3 monitor.py --install)")
         try:
             while True:
                 time.sleep(1)
         except KeyboardInterrupt:
             monitor.stop_monitoring()
+        finally:
+            monitor.notifier.stopping()
+            monitor.stop_control()
     elif len(sys.argv) > 1 and sys.argv[1] == "--install":
         install_requirements()
         create_service()
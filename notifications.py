@@ -0,0 +1,650 @@
+# -*- coding: utf-8 -*-
+"""
+اعلان هشدارها (webhook، ربات تلگرام، SMTP، دستور محلی) با حذف تکرار، تجمیع و محدودیت نرخ
+
+مسیر هر رویداد ژورنال:
+  on_event (در حلقه مانیتور؛ فقط افزودن به صف حافظه، بدون I/O)
+    → worker: تبدیل به هشدار، حذف تکرار (همان هشدار برای همان تانل در dedup_seconds)
+    → pending.jsonl (روی دیسک) و دسته فعلی
+    → بعد از digest_seconds از اولین هشدار دسته: یک پیام خلاصه برای هر مقصد در صف دیسکی
+    → ارسال با token bucket هر مقصد؛ پیام‌هایی که به خاطر محدودیت نرخ منتظر مانده‌اند در یک
+      پیام ادغام می‌شوند؛ خطای موقت با backoff نمایی دوباره تلاش می‌شود
+صف در notify_queue/ است (هر پیام یک فایل JSON با جایگزینی اتمیک)، پس هشدارها بعد از
+ریستارت مانیتور هم ارسال می‌شوند. هشدار تانل‌های ساکت (silence) ارسال نمی‌شود.
+"""
+
+import os
+import json
+import time
+import random
+import smtplib
+import logging
+import threading
+import subprocess
+import http.client
+from collections import deque
+from email.message import EmailMessage
+from socket import gethostname
+from typing import Deque, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from restart_budget import TokenBucket
+
+SINK_TYPES = ("webhook", "telegram", "smtp", "command")
+DEFAULT_NOTIFY_EVENTS = ("state_change", "restart_result", "quarantine", "predictive_restart")
+DEFAULT_DIGEST_SECONDS = 30
+DEFAULT_DEDUP_SECONDS = 600
+DEFAULT_RATE_PER_HOUR = 20           # پیام در ساعت برای هر مقصد
+DEFAULT_RATE_BURST = 5
+DEFAULT_MAX_RETRIES = 10
+DEFAULT_RETRY_BASE_SECONDS = 15
+DEFAULT_QUEUE_MAX = 1000             # حداکثر پیام در صف دیسکی (قدیمی‌ترها حذف می‌شوند)
+DEFAULT_SEND_TIMEOUT = 10
+MAX_RETRY_DELAY = 3600
+# سقف طول متن (محدودیت ۴۰۹۶ کاراکتری تلگرام)
+MAX_MESSAGE_CHARS = 3500
+MAX_DETAIL_LINES = 30
+MAX_ALERTS_PER_MESSAGE = 200
+INBOX_MAX = 10000
+
+# کلیدهای عددی notification → (حداقل، پیش‌فرض)
+NUMERIC_KEYS = {
+    "digest_seconds": (0, DEFAULT_DIGEST_SECONDS),
+    "dedup_seconds": (0, DEFAULT_DEDUP_SECONDS),
+    "rate_per_hour": (0.01, DEFAULT_RATE_PER_HOUR),
+    "rate_burst": (1, DEFAULT_RATE_BURST),
+    "max_retries": (0, DEFAULT_MAX_RETRIES),
+    "retry_base_seconds": (0.1, DEFAULT_RETRY_BASE_SECONDS),
+    "queue_max": (1, DEFAULT_QUEUE_MAX),
+    "timeout": (0.1, DEFAULT_SEND_TIMEOUT),
+}
+
+KIND_LABELS = {
+    "down": "قطع",
+    "recovered": "برگشت",
+    "restart_failed": "ریستارت ناموفق",
+    "quarantined": "قرنطینه",
+    "released": "پایان قرنطینه",
+    "predictive": "ریستارت پیشگیرانه",
+    "backoff": "بک‌آف",
+    "pattern": "الگوی خطا",
+}
+
+
+# ----- Events → alerts -----
+def alert_from_event(ev: Dict) -> Optional[Dict]:
+    """
+    هشدار متناظر یک رویداد یا None. topic مشخص می‌کند کدام هشدارها جای هم را می‌گیرند
+    (مثلاً down و recovered هر دو topic=state دارند).
+    """
+    etype, tunnel = ev.get("type"), ev.get("tunnel") or ""
+    kind, topic, text = "", "", ""
+    if etype == "state_change":
+        old, new = ev.get("old"), ev.get("new")
+        if new == "active" and old not in (None, "active"):
+            kind, text = "recovered", f"{old} → active"
+        elif new != "active" and old in (None, "active"):
+            kind, text = "down", f"{old or '-'} → {new}" + (f" ({ev['sub']})" if ev.get("sub") else "")
+        topic = "state"
+    elif etype == "restart_result":
+        if not ev.get("ok"):
+            kind, topic, text = "restart_failed", "restart", "ریستارت موفق نبود"
+    elif etype == "quarantine":
+        topic = "quarantine"
+        if ev.get("on"):
+            kind, text = "quarantined", f"{ev.get('flaps', '?')} بار قطع و وصل"
+        else:
+            kind, text = "released", "خروج از قرنطینه"
+    elif etype == "predictive_restart":
+        kind, topic, text = "predictive", "predictive", f"احتمال خرابی {ev.get('risk')}"
+    elif etype == "backoff":
+        kind, topic, text = "backoff", "backoff", f"تاخیر {ev.get('delay')} ثانیه"
+    elif etype == "pattern_hit":
+        kind, topic, text = "pattern", f"pattern:{ev.get('pattern')}", str(ev.get("pattern"))
+    elif etype:
+        kind, topic, text = etype, etype, ", ".join(
+            f"{k}={v}" for k, v in ev.items() if k not in ("ts", "type", "tunnel"))
+    if not kind:
+        return None
+    return {"ts": ev.get("ts") or time.time(), "tunnel": tunnel, "kind": kind, "topic": topic, "text": text}
+
+
+def _format_time(ts: float) -> str:
+    return time.strftime("%H:%M:%S", time.localtime(ts))
+
+
+def _truncate(text: str, limit: int = MAX_MESSAGE_CHARS) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def render_digest(alerts: List[Dict], host: str) -> Tuple[str, str]:
+    """(موضوع، متن) یک پیام خلاصه؛ هشدارها بر اساس نوع گروه‌بندی می‌شوند."""
+    if len(alerts) == 1:
+        a = alerts[0]
+        label = KIND_LABELS.get(a["kind"], a["kind"])
+        return f"[{host}] {label}: {a['tunnel'] or '-'}", f"{_format_time(a['ts'])} {a['tunnel']}: {a['text']}"
+    groups: Dict[str, List[str]] = {}
+    for a in alerts:
+        names = groups.setdefault(a["kind"], [])
+        if a["tunnel"] not in names:
+            names.append(a["tunnel"])
+    lines = []
+    for kind, names in groups.items():
+        shown = ", ".join(n or "-" for n in names[:15])
+        more = f" و {len(names) - 15} تانل دیگر" if len(names) > 15 else ""
+        lines.append(f"{KIND_LABELS.get(kind, kind)} ({len(names)}): {shown}{more}")
+    lines.append("")
+    for a in alerts[:MAX_DETAIL_LINES]:
+        lines.append(f"{_format_time(a['ts'])} {KIND_LABELS.get(a['kind'], a['kind'])} {a['tunnel']}: {a['text']}")
+    if len(alerts) > MAX_DETAIL_LINES:
+        lines.append(f"... و {len(alerts) - MAX_DETAIL_LINES} هشدار دیگر")
+    summary = "، ".join(f"{len(n)} {KIND_LABELS.get(k, k)}" for k, n in groups.items())
+    return f"[{host}] {len(alerts)} هشدار: {summary}", _truncate("\n".join(lines))
+
+
+# ----- Config -----
+def validate_notification(cfg) -> Optional[str]:
+    """پیام خطا یا None (برای اعتبارسنجی settings.py)."""
+    if not isinstance(cfg, dict):
+        return "باید یک شیء JSON باشد"
+    for key, (lo, _default) in NUMERIC_KEYS.items():
+        value = cfg.get(key)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value < lo):
+            return f"{key} باید عدد >= {lo} باشد"
+    events = cfg.get("events")
+    if events is not None and not (isinstance(events, list) and all(isinstance(e, str) for e in events)):
+        return "events باید لیست نوع رویدادها باشد"
+    sinks = cfg.get("sinks", [])
+    if not isinstance(sinks, list):
+        return "sinks باید لیست باشد"
+    for i, s in enumerate(sinks):
+        where = f"sinks[{i}]"
+        if not isinstance(s, dict):
+            return f"{where} باید شیء باشد"
+        stype = s.get("type")
+        if stype not in SINK_TYPES:
+            return f"{where}: type باید یکی از {', '.join(SINK_TYPES)} باشد"
+        if stype == "webhook" and urlparse(str(s.get("url", ""))).scheme not in ("http", "https"):
+            return f"{where}: url باید http یا https باشد"
+        if stype == "telegram" and not (s.get("bot_token") and s.get("chat_id")):
+            return f"{where}: bot_token و chat_id لازم است"
+        if stype == "smtp":
+            to = s.get("to")
+            if not s.get("host") or not s.get("from") or not to:
+                return f"{where}: host، from و to لازم است"
+            if not isinstance(to, (str, list)):
+                return f"{where}: to باید رشته یا لیست باشد"
+        if stype == "command":
+            cmd = s.get("command")
+            if not (isinstance(cmd, list) and cmd and all(isinstance(c, str) for c in cmd)):
+                return f"{where}: command باید لیست غیرخالی از رشته‌ها باشد"
+    return None
+
+
+# ----- Sinks -----
+class DeliveryError(Exception):
+    def __init__(self, message: str, permanent: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.permanent = permanent
+        self.retry_after = retry_after
+
+
+def _retry_after(resp: http.client.HTTPResponse, body: bytes) -> Optional[float]:
+    value = resp.getheader("Retry-After", "")
+    if value.isdigit():
+        return float(value)
+    try:
+        # تلگرام: {"parameters": {"retry_after": 30}}
+        return float(json.loads(body)["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def http_post_json(url: str, payload: Dict, timeout: float, headers: Optional[Dict] = None):
+    u = urlparse(url)
+    cls = http.client.HTTPSConnection if u.scheme == "https" else http.client.HTTPConnection
+    conn = cls(u.hostname or "", u.port, timeout=timeout)
+    path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    hdrs = {"Content-Type": "application/json; charset=utf-8"}
+    hdrs.update(headers or {})
+    try:
+        conn.request("POST", path, body, hdrs)
+        resp = conn.getresponse()
+        data = resp.read()
+    except (http.client.HTTPException, OSError) as e:
+        raise DeliveryError(str(e) or e.__class__.__name__)
+    finally:
+        conn.close()
+    if resp.status == 429 or resp.status >= 500:
+        raise DeliveryError(f"HTTP {resp.status}", retry_after=_retry_after(resp, data))
+    if resp.status >= 400:
+        raise DeliveryError(f"HTTP {resp.status}: {data[:200].decode('utf-8', 'replace')}", permanent=True)
+
+
+class Sink:
+    kind = ""
+
+    def __init__(self, name: str, spec: Dict, timeout: float):
+        self.name = name
+        self.spec = spec
+        self.timeout = float(spec.get("timeout", timeout))
+
+    def send(self, subject: str, text: str, alerts: List[Dict]):
+        raise NotImplementedError
+
+
+class WebhookSink(Sink):
+    kind = "webhook"
+
+    def send(self, subject, text, alerts):
+        # فیلد text برای Slack/Mattermost/Discord-compatible کافی است
+        http_post_json(self.spec["url"], {
+            "text": f"{subject}\n{text}",
+            "subject": subject,
+            "host": gethostname(),
+            "alerts": alerts,
+        }, self.timeout, self.spec.get("headers"))
+
+
+class TelegramSink(Sink):
+    kind = "telegram"
+
+    def send(self, subject, text, alerts):
+        api = str(self.spec.get("api_url") or "https://api.telegram.org").rstrip("/")
+        http_post_json(f"{api}/bot{self.spec['bot_token']}/sendMessage", {
+            "chat_id": self.spec["chat_id"],
+            "text": _truncate(f"{subject}\n\n{text}", 4096),
+            "disable_web_page_preview": True,
+        }, self.timeout)
+
+
+class SmtpSink(Sink):
+    kind = "smtp"
+
+    def send(self, subject, text, alerts):
+        s = self.spec
+        to = s["to"] if isinstance(s["to"], list) else [s["to"]]
+        msg = EmailMessage()
+        msg["Subject"] = subject
+        msg["From"] = s["from"]
+        msg["To"] = ", ".join(to)
+        msg.set_content(text)
+        use_ssl = bool(s.get("ssl"))
+        port = int(s.get("port") or (465 if use_ssl else 587 if s.get("starttls") else 25))
+        cls = smtplib.SMTP_SSL if use_ssl else smtplib.SMTP
+        try:
+            with cls(s["host"], port, timeout=self.timeout) as smtp:
+                if s.get("starttls") and not use_ssl:
+                    smtp.starttls()
+                if s.get("username"):
+                    smtp.login(s["username"], s.get("password", ""))
+                smtp.send_message(msg)
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                smtplib.SMTPAuthenticationError) as e:
+            raise DeliveryError(f"SMTP: {e}", permanent=True)
+        except (smtplib.SMTPException, OSError) as e:
+            raise DeliveryError(f"SMTP: {str(e) or e.__class__.__name__}")
+
+
+class CommandSink(Sink):
+    kind = "command"
+
+    def send(self, subject, text, alerts):
+        # متن روی stdin، موضوع و هشدارها (JSON) در متغیرهای محیطی
+        env = dict(os.environ, RATHOLE_ALERT_SUBJECT=subject,
+                   RATHOLE_ALERTS=json.dumps(alerts, ensure_ascii=False))
+        try:
+            r = subprocess.run(self.spec["command"], input=text, capture_output=True, text=True,
+                               timeout=self.timeout, env=env, start_new_session=True)
+        except subprocess.TimeoutExpired:
+            raise DeliveryError(f"timeout after {self.timeout:g}s")
+        except OSError as e:
+            raise DeliveryError(str(e), permanent=True)
+        if r.returncode != 0:
+            raise DeliveryError(f"exit {r.returncode}: {r.stderr.strip()[:200]}")
+
+
+SINK_CLASSES = {cls.kind: cls for cls in (WebhookSink, TelegramSink, SmtpSink, CommandSink)}
+
+
+def build_sinks(cfg: Dict) -> Dict[str, Sink]:
+    """مقصدها از notification.sinks و کلیدهای قدیمی webhook_url/telegram_*."""
+    specs: List[Dict] = []
+    if cfg.get("webhook_url"):
+        specs.append({"type": "webhook", "url": cfg["webhook_url"]})
+    if cfg.get("telegram_bot_token") and cfg.get("telegram_chat_id"):
+        specs.append({"type": "telegram", "bot_token": cfg["telegram_bot_token"],
+                      "chat_id": cfg["telegram_chat_id"]})
+    specs.extend(cfg.get("sinks") or [])
+    timeout = float(cfg.get("timeout", DEFAULT_SEND_TIMEOUT))
+    sinks: Dict[str, Sink] = {}
+    for spec in specs:
+        cls = SINK_CLASSES.get(spec.get("type"))
+        if cls is None:
+            continue
+        base = name = str(spec.get("name") or spec["type"])
+        i = 2
+        while name in sinks:
+            name, i = f"{base}-{i}", i + 1
+        sinks[name] = cls(name, spec, timeout)
+    return sinks
+
+
+# ----- Persistent queue -----
+class NotificationQueue:
+    """
+    notify_queue/pending.jsonl : هشدارهای پذیرفته‌شده‌ای که هنوز در پیام خلاصه نرفته‌اند
+    notify_queue/<id>.json     : هر پیام آماده ارسال برای یک مقصد (attempts، next_try، last_error)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pending_path = os.path.join(path, "pending.jsonl")
+        self._seq = 0
+
+    def _ensure(self):
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+
+    def new_id(self) -> str:
+        self._seq += 1
+        return f"{int(time.time() * 1000):013d}-{os.getpid()}-{self._seq}"
+
+    def load(self) -> List[Dict]:
+        out = []
+        try:
+            names = sorted(n for n in os.listdir(self.path) if n.endswith(".json"))
+        except OSError:
+            return out
+        for n in names:
+            try:
+                with open(os.path.join(self.path, n), "r", encoding="utf-8") as f:
+                    msg = json.load(f)
+                msg["id"] = n[:-5]
+                out.append(msg)
+            except (OSError, ValueError):
+                continue
+        return out
+
+    def put(self, msg: Dict):
+        self._ensure()
+        final = os.path.join(self.path, f"{msg['id']}.json")
+        tmp = f"{final}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(msg, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, final)
+
+    def delete(self, msg: Dict):
+        try:
+            os.unlink(os.path.join(self.path, f"{msg['id']}.json"))
+        except FileNotFoundError:
+            pass
+
+    def append_pending(self, alerts: List[Dict]):
+        self._ensure()
+        with open(self.pending_path, "a", encoding="utf-8") as f:
+            for a in alerts:
+                f.write(json.dumps(a, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def read_pending(self) -> List[Dict]:
+        out = []
+        try:
+            with open(self.pending_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        out.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        return out
+
+    def clear_pending(self):
+        try:
+            os.unlink(self.pending_path)
+        except FileNotFoundError:
+            pass
+
+
+# ----- Pipeline -----
+class NotificationPipeline:
+    def __init__(self, queue_dir: str, cfg: Optional[Dict] = None):
+        self.logger = logging.getLogger("rathole-monitor")
+        self.queue = NotificationQueue(queue_dir)
+        self.host = gethostname()
+        self._inbox: Deque[Dict] = deque(maxlen=INBOX_MAX)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._silenced: Set[str] = set()
+        # دسته هشدارهای در انتظار خلاصه و زمان اولین هشدار آن
+        self._batch: List[Dict] = []
+        self._batch_started: Optional[float] = None
+        # (tunnel, topic) → (kind, ts) آخرین هشدار پذیرفته‌شده
+        self._seen: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._messages: List[Dict] = []
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.stats = {k: 0 for k in ("alerts", "suppressed", "silenced", "digests", "sent", "retries",
+                                     "failed", "dropped", "rate_limited")}
+        self.configure(cfg or {})
+
+    def configure(self, cfg: Dict):
+        num = {k: cfg.get(k, default) for k, (_lo, default) in NUMERIC_KEYS.items()}
+        sinks = build_sinks(cfg)
+        rate = float(num["rate_per_hour"]) / 3600.0
+        buckets = {}
+        for name in sinks:
+            old = self._buckets.get(name)
+            # سطل فعلی حفظ می‌شود تا بارگذاری مجدد تنظیمات محدودیت نرخ را دور نزند
+            if old is not None and old.rate == rate and old.capacity == max(1.0, float(num["rate_burst"])):
+                buckets[name] = old
+            else:
+                buckets[name] = TokenBucket(rate, num["rate_burst"])
+        with self._lock:
+            self.enabled = bool(cfg.get("enabled")) and bool(sinks)
+            self.events = frozenset(cfg.get("events") or DEFAULT_NOTIFY_EVENTS)
+            self.sinks = sinks
+            self._buckets = buckets
+            self.digest_seconds = float(num["digest_seconds"])
+            self.dedup_seconds = float(num["dedup_seconds"])
+            self.max_retries = int(num["max_retries"])
+            self.retry_base = float(num["retry_base_seconds"])
+            self.queue_max = int(num["queue_max"])
+        self._wake.set()
+
+    # ----- producer (health loop) -----
+    def on_event(self, ev: Dict):
+        """listener ژورنال رویدادها؛ فقط صف حافظه، هیچ I/O یا قفل طولانی."""
+        etype = ev.get("type")
+        if etype == "silence":
+            if ev.get("on"):
+                self._silenced.add(ev.get("tunnel"))
+            else:
+                self._silenced.discard(ev.get("tunnel"))
+            return
+        if self.enabled and etype in self.events:
+            self._inbox.append(ev)
+            self._wake.set()
+
+    # ----- worker -----
+    def start(self):
+        if self._thread is not None:
+            return
+        self._messages = self.queue.load()
+        self._batch = self.queue.read_pending()
+        if self._batch:
+            self._batch_started = min(a["ts"] for a in self._batch)
+        if self._messages or self._batch:
+            self.logger.info(f"صف اعلان: {len(self._messages)} پیام و {len(self._batch)} هشدار از اجرای قبلی")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="notify", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                wait = self.step(time.time())
+            except Exception as e:
+                self.logger.error(f"خطا در ارسال اعلان‌ها: {e}")
+                wait = 30.0
+            self._wake.wait(max(0.05, wait))
+            self._wake.clear()
+
+    def step(self, now: float) -> float:
+        """یک دور worker؛ خروجی: ثانیه تا کار بعدی."""
+        self._accept(now)
+        if self._batch and now >= self._batch_started + self.digest_seconds:
+            self._flush_batch(now)
+        return self._deliver(now)
+
+    def _accept(self, now: float):
+        accepted = []
+        while self._inbox:
+            alert = alert_from_event(self._inbox.popleft())
+            if alert is None:
+                continue
+            if alert["tunnel"] in self._silenced:
+                self.stats["silenced"] += 1
+                continue
+            key = (alert["tunnel"], alert["topic"])
+            last = self._seen.get(key)
+            if last is not None and last[0] == alert["kind"] and now - last[1] < self.dedup_seconds:
+                self.stats["suppressed"] += 1
+                continue
+            self._seen[key] = (alert["kind"], now)
+            accepted.append(alert)
+        if len(self._seen) > INBOX_MAX:
+            self._seen = {k: v for k, v in self._seen.items() if now - v[1] < self.dedup_seconds}
+        if not accepted:
+            return
+        self.stats["alerts"] += len(accepted)
+        try:
+            self.queue.append_pending(accepted)
+        except OSError as e:
+            self.logger.error(f"ذخیره هشدار در صف اعلان ممکن نشد: {e}")
+        if not self._batch:
+            self._batch_started = now
+        self._batch.extend(accepted)
+
+    def _flush_batch(self, now: float):
+        batch, self._batch, self._batch_started = self._batch, [], None
+        sinks = list(self.sinks)
+        for i in range(0, len(batch), MAX_ALERTS_PER_MESSAGE):
+            chunk = batch[i:i + MAX_ALERTS_PER_MESSAGE]
+            subject, text = render_digest(chunk, self.host)
+            alerts = [{k: a[k] for k in ("ts", "tunnel", "kind", "text")} for a in chunk]
+            self.stats["digests"] += 1
+            for sink in sinks:
+                msg = {"id": self.queue.new_id(), "sink": sink, "subject": subject, "text": text,
+                       "alerts": alerts, "created": now, "attempts": 0, "next_try": now, "last_error": ""}
+                self._store(msg)
+                self._messages.append(msg)
+        self.queue.clear_pending()
+        overflow = len(self._messages) - self.queue_max
+        if overflow > 0:
+            for msg in self._messages[:overflow]:
+                self.queue.delete(msg)
+            del self._messages[:overflow]
+            self.stats["dropped"] += overflow
+            self.logger.warning(f"صف اعلان پر است؛ {overflow} پیام قدیمی حذف شد")
+
+    def _store(self, msg: Dict):
+        try:
+            self.queue.put(msg)
+        except OSError as e:
+            self.logger.error(f"ذخیره پیام اعلان ممکن نشد: {e}")
+
+    def _deliver(self, now: float) -> float:
+        next_wake = self._batch_started + self.digest_seconds - now if self._batch else 60.0
+        by_sink: Dict[str, List[Dict]] = {}
+        for msg in self._messages:
+            if msg["next_try"] <= now:
+                by_sink.setdefault(msg["sink"], []).append(msg)
+            else:
+                next_wake = min(next_wake, msg["next_try"] - now)
+        for name, due in by_sink.items():
+            sink = self.sinks.get(name)
+            if sink is None:
+                self.logger.warning(f"مقصد اعلان {name} دیگر در تنظیمات نیست؛ {len(due)} پیام حذف شد")
+                self._discard(due, "dropped")
+                continue
+            bucket = self._buckets[name]
+            if not bucket.try_acquire():
+                # پیام‌ها می‌مانند و در اولین توکن بعدی در یک پیام ادغام می‌شوند
+                self.stats["rate_limited"] += 1
+                next_wake = min(next_wake, (1.0 - bucket.available()) / bucket.rate if bucket.rate else 60.0)
+                continue
+            subject, text, alerts = self._combine(due)
+            try:
+                sink.send(subject, text, alerts)
+            except DeliveryError as e:
+                next_wake = min(next_wake, self._failed(name, due, e, now))
+                continue
+            except Exception as e:
+                next_wake = min(next_wake, self._failed(name, due, DeliveryError(str(e)), now))
+                continue
+            self.stats["sent"] += len(due)
+            self._discard(due)
+        return max(0.0, next_wake)
+
+    def _combine(self, due: List[Dict]) -> Tuple[str, str, List[Dict]]:
+        if len(due) == 1:
+            return due[0]["subject"], due[0]["text"], due[0].get("alerts", [])
+        alerts = [a for m in due for a in m.get("alerts", [])]
+        text = _truncate("\n\n".join(f"{m['subject']}\n{m['text']}" for m in due))
+        return f"[{self.host}] {len(alerts)} هشدار در {len(due)} پیام تجمیع‌شده", text, alerts
+
+    def _failed(self, name: str, due: List[Dict], err: DeliveryError, now: float) -> float:
+        attempts = max(m["attempts"] for m in due) + 1
+        if err.permanent or attempts > self.max_retries:
+            self.logger.error(f"ارسال اعلان به {name} کنار گذاشته شد ({attempts} تلاش): {err}")
+            self._discard(due, "failed")
+            return 60.0
+        delay = min(MAX_RETRY_DELAY, self.retry_base * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+        if err.retry_after:
+            delay = max(delay, err.retry_after)
+        self.logger.warning(f"ارسال اعلان به {name} ناموفق بود: {err}؛ تلاش {attempts} بعد از {delay:.0f} ثانیه")
+        self.stats["retries"] += 1
+        for msg in due:
+            msg.update(attempts=attempts, next_try=now + delay, last_error=str(err))
+            self._store(msg)
+        return delay
+
+    def _discard(self, msgs: List[Dict], stat: str = ""):
+        ids = {m["id"] for m in msgs}
+        self._messages = [m for m in self._messages if m["id"] not in ids]
+        for m in msgs:
+            self.queue.delete(m)
+        if stat:
+            self.stats[stat] += len(msgs)
+
+    def send_test(self) -> Dict[str, str]:
+        """ارسال مستقیم (بدون صف) یک پیام آزمایشی به همه مقصدها؛ نام → خطا یا ""."""
+        alert = {"ts": time.time(), "tunnel": "", "kind": "test", "text": "پیام آزمایشی rathole-monitor"}
+        out = {}
+        for name, sink in self.sinks.items():
+            try:
+                sink.send(f"[{self.host}] پیام آزمایشی", alert["text"], [alert])
+                out[name] = ""
+            except Exception as e:
+                out[name] = str(e) or e.__class__.__name__
+        return out
+
+    def snapshot(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "sinks": sorted(self.sinks),
+            "queued": len(self._messages),
+            "batched": len(self._batch),
+            **self.stats,
+        }
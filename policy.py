@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+سیاست‌های اختصاصی هر تانل (override تنظیمات سراسری)
+
+قواعد در config.json به ترتیب اعمال می‌شوند؛ قاعده بعدی مقدار قاعده قبلی را بازنویسی می‌کند:
+
+  "tunnel_tags": {"rathole-iran-*": ["edge"]},
+  "tunnel_policies": [
+    {"name": "iran-strict", "match": {"type": "iran"},
+     "settings": {"check_interval": 60, "max_restart_attempts": 5}},
+    {"match": {"name": "rathole-kharej-*", "tag": "edge"},
+     "settings": {"critical_error_patterns": ["handshake failed"]}}
+  ]
+
+شرط‌های match (name به صورت glob، type، tag) همه باید برقرار باشند. برای هر تانل یک بار
+(هنگام کشف) سیاست نهایی ساخته و کش می‌شود؛ مسیر داغ فقط یک lookup دیکشنری است.
+"""
+
+import fnmatch
+import logging
+from typing import Dict, List, Tuple
+
+from settings import Settings
+
+
+def compile_patterns(settings: Settings) -> Tuple[Tuple[str, ...], Tuple[Tuple[str, str], ...]]:
+    """الگوهای نادیده (lowercase) و بحرانی (اصلی، lowercase)."""
+    ignored = tuple(p.lower() for p in settings.ignored_error_patterns if p)
+    critical = tuple((p, p.lower()) for p in settings.critical_error_patterns if p)
+    return ignored, critical
+
+
+def weighted_patterns(settings: Settings) -> Tuple[Tuple[str, str, float], ...]:
+    """الگوهای امتیازدار (اصلی، lowercase، وزن): الگوهای بحرانی با وزن ۱ + log_pattern_weights؛ وزن ۰ حذف."""
+    weights = dict.fromkeys(settings.critical_error_patterns, 1.0)
+    weights.update(settings.log_pattern_weights)
+    return tuple((p, p.lower(), float(w)) for p, w in weights.items() if p and w > 0)
+
+
+class TunnelPolicy:
+    __slots__ = ("settings", "rules", "ignored_patterns", "critical_patterns", "scored_patterns", "pipeline")
+
+    def __init__(self, settings: Settings, rules: Tuple[str, ...], pipeline=None):
+        self.settings = settings
+        self.rules = rules
+        self.ignored_patterns, self.critical_patterns = compile_patterns(settings)
+        self.scored_patterns = weighted_patterns(settings)
+        # None یعنی پایپ‌لاین پیش‌فرض/tunnel_health_checks
+        self.pipeline = pipeline
+
+
+class PolicyResolver:
+    def __init__(self, base_cfg: Dict, base_settings: Settings, rules: List[Dict],
+                 tags: Dict[str, List[str]], health=None):
+        self.base_cfg = base_cfg
+        self.rules = [
+            (rule.get("name") or f"#{i + 1}", rule.get("match") or {}, rule.get("settings") or {})
+            for i, rule in enumerate(rules or [])
+        ]
+        self.tags = tags or {}
+        self.health = health
+        self.base = TunnelPolicy(base_settings, ())
+        self._resolved: Dict[str, TunnelPolicy] = {}
+        # کوتاه‌ترین فاصله چک بین پایه و همه قواعد = فاصله بیدار شدن حلقه
+        self.min_interval = min(
+            [base_settings.check_interval]
+            + [s["check_interval"] for _, _, s in self.rules if "check_interval" in s]
+        )
+        self.logger = logging.getLogger("rathole-monitor")
+
+    @classmethod
+    def from_config(cls, cfg: Dict, settings: Settings, health=None) -> "PolicyResolver":
+        return cls(cfg, settings, cfg.get("tunnel_policies") or [], cfg.get("tunnel_tags") or {}, health)
+
+    def tags_for(self, name: str) -> List[str]:
+        out: List[str] = []
+        for pattern, tags in self.tags.items():
+            if fnmatch.fnmatchcase(name, pattern):
+                out.extend(t for t in tags if t not in out)
+        return out
+
+    def _matches(self, match: Dict, name: str, ttype: str, tags: List[str]) -> bool:
+        if "name" in match and not fnmatch.fnmatchcase(name, match["name"]):
+            return False
+        if "type" in match and match["type"] != ttype:
+            return False
+        if "tag" in match and match["tag"] not in tags:
+            return False
+        return True
+
+    def resolve(self, tunnel: Dict) -> TunnelPolicy:
+        """سیاست نهایی تانل (یک بار برای هر نام/نوع ساخته می‌شود)."""
+        name = tunnel["name"]
+        policy = self._resolved.get(name)
+        if policy is not None:
+            return policy
+        tags = self.tags_for(name)
+        applied: List[str] = []
+        overrides: Dict = {}
+        for label, match, values in self.rules:
+            if self._matches(match, name, tunnel.get("type", ""), tags):
+                applied.append(label)
+                overrides.update(values)
+        if not applied:
+            policy = self.base
+        else:
+            cfg = dict(self.base_cfg)
+            cfg.update(overrides)
+            try:
+                settings = Settings.from_dict(cfg)
+            except ValueError as e:
+                self.logger.error(f"سیاست تانل {name} نامعتبر است ({e})؛ استفاده از تنظیمات سراسری")
+                settings, applied = self.base.settings, []
+            pipeline = None
+            if "health_checks" in overrides and self.health is not None:
+                pipeline = self.health.for_specs(list(overrides["health_checks"]))
+            policy = TunnelPolicy(settings, tuple(applied), pipeline)
+        self._resolved[name] = policy
+        return policy
+
+    def get(self, name: str) -> TunnelPolicy:
+        return self._resolved.get(name, self.base)
+
+    def retain(self, names):
+        keep = set(names)
+        for name in [n for n in self._resolved if n not in keep]:
+            del self._resolved[name]
@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+"""
+پیش‌بینی خرابی قریب‌الوقوع تانل از روی تاریخچه (ژورنال رویدادها)
+
+ویژگی‌ها (پنجره‌های لغزان روی رویدادهای همان تانل، تا لحظه t):
+  error_rate          log1p(آخرین سطح نرخ خطای وزن‌دار لاگ؛ رویداد log_rate)
+  error_trend         error_rate(t) - error_rate(t - ۳۰ دقیقه)
+  pattern_hits_15m    log1p(تعداد برخورد الگو در ۱۵ دقیقه اخیر)
+  pattern_hits_2h     log1p(همان در ۲ ساعت اخیر)
+  drops_1h            log1p(تعداد خروج از وضعیت active در ۱ ساعت اخیر)
+  restarts_24h        log1p(تعداد ریستارت در ۲۴ ساعت اخیر)
+  hours_since_restart log1p(ساعت از آخرین ریستارت، حداکثر ۱۶۸)
+
+- آموزش (آفلاین، نیازمند numpy): `python3 monitor.py predict train`
+  ژورنال بازخوانی می‌شود، روی شبکه زمانی هر step ثانیه ویژگی‌ها به صورت برداری
+  (searchsorted روی زمان رویدادها) ساخته می‌شوند و برچسب = خرابی (ریستارت خودکار یا
+  ورود به failed/inactive) در horizon ثانیه بعد. مدل: رگرسیون لجستیک با وزن‌دهی متوازن
+  کلاس‌ها، ذخیره در predict_model.json.
+- امتیازدهی (آنلاین، بدون numpy): همان ویژگی‌ها از صف‌های کوچک هر تانل که با هر رویداد
+  به‌روز می‌شوند + یک ضرب داخلی ۷ تایی؛ چند میکروثانیه برای هر تانل در هر دور.
+
+ریستارت‌های پیشگیرانه و دستی برچسب خرابی حساب نمی‌شوند تا مدل از تصمیم‌های خودش یاد نگیرد؛
+توقف تانل در پنجره نگهداری (silence) هم نه افت است نه خرابی.
+"""
+
+import os
+import json
+import math
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from event_journal import (
+    EVENT_STATE_CHANGE,
+    EVENT_RESTART_ATTEMPT,
+    EVENT_PATTERN_HIT,
+    EVENT_LOG_RATE,
+    EVENT_SILENCE,
+)
+
+FEATURES = (
+    "error_rate",
+    "error_trend",
+    "pattern_hits_15m",
+    "pattern_hits_2h",
+    "drops_1h",
+    "restarts_24h",
+    "hours_since_restart",
+)
+FEATURE_EVENTS = (EVENT_STATE_CHANGE, EVENT_RESTART_ATTEMPT, EVENT_PATTERN_HIT, EVENT_LOG_RATE)
+# رویدادهای لازم برای آموزش: silence بازه‌های نگهداری را در ژورنال‌های بدون برچسب silenced مشخص می‌کند
+TRAIN_EVENTS = FEATURE_EVENTS + (EVENT_SILENCE,)
+
+TREND_SECONDS = 1800
+HITS_SHORT_SECONDS = 900
+HITS_LONG_SECONDS = 7200
+DROPS_SECONDS = 3600
+RESTARTS_SECONDS = 86400
+SINCE_RESTART_CAP_HOURS = 168.0
+
+# ریستارت‌هایی که نشانه خرابی نیستند
+NON_FAILURE_REASONS = ("predictive", "manual")
+
+DEFAULT_PREDICT_THRESHOLD = 0.8
+DEFAULT_PREDICT_QUIET_BPS = 10240.0
+DEFAULT_PREDICT_QUIET_CONNECTIONS = 2
+DEFAULT_PREDICT_COOLDOWN_SECONDS = 3600
+
+DEFAULT_TRAIN_DAYS = 30.0
+DEFAULT_TRAIN_HORIZON = 900
+DEFAULT_TRAIN_STEP = 60
+MIN_POSITIVES = 5
+
+
+def rate_level(score: float) -> int:
+    """سطح کوانتیزه نرخ خطا (log2)؛ رویداد log_rate فقط با تغییر سطح ثبت می‌شود."""
+    return int(math.log2(1.0 + max(0.0, score)))
+
+
+def is_drop(ev: Dict) -> bool:
+    # تغییر وضعیت در پنجره نگهداری (برچسب silenced) توقف عمدی است نه افت
+    return ev.get("type") == EVENT_STATE_CHANGE and ev.get("new") != "active" and not ev.get("silenced")
+
+
+def is_failure(ev: Dict) -> bool:
+    etype = ev.get("type")
+    if etype == EVENT_RESTART_ATTEMPT:
+        return ev.get("reason") not in NON_FAILURE_REASONS
+    return etype == EVENT_STATE_CHANGE and ev.get("new") in ("failed", "inactive") and not ev.get("silenced")
+
+
+class TunnelHistory:
+    """صف‌های لغزان رویدادهای یک تانل؛ حافظه محدود به طولانی‌ترین پنجره."""
+
+    __slots__ = ("levels", "hits_short", "hits_long", "sum_short", "sum_long", "drops", "restarts",
+                 "last_restart")
+
+    def __init__(self):
+        self.levels: deque = deque()       # (ts, score)
+        self.hits_short: deque = deque()   # (ts, count)
+        self.hits_long: deque = deque()
+        self.sum_short = 0
+        self.sum_long = 0
+        self.drops: deque = deque()        # ts
+        self.restarts: deque = deque()     # ts
+        self.last_restart: Optional[float] = None
+
+    def add(self, ev: Dict):
+        ts = float(ev.get("ts", 0))
+        etype = ev.get("type")
+        if etype == EVENT_LOG_RATE:
+            self.levels.append((ts, float(ev.get("score", 0.0))))
+        elif etype == EVENT_PATTERN_HIT:
+            n = int(ev.get("count", 1))
+            self.hits_short.append((ts, n))
+            self.hits_long.append((ts, n))
+            self.sum_short += n
+            self.sum_long += n
+        elif etype == EVENT_RESTART_ATTEMPT:
+            self.restarts.append(ts)
+            self.last_restart = ts
+        elif is_drop(ev):
+            self.drops.append(ts)
+
+    def features(self, now: float) -> List[float]:
+        # بازه هر پنجره (now - W, now] است؛ همان تعریف train_dataset
+        while len(self.levels) > 1 and self.levels[1][0] <= now - TREND_SECONDS:
+            self.levels.popleft()
+        while self.hits_short and self.hits_short[0][0] <= now - HITS_SHORT_SECONDS:
+            self.sum_short -= self.hits_short.popleft()[1]
+        while self.hits_long and self.hits_long[0][0] <= now - HITS_LONG_SECONDS:
+            self.sum_long -= self.hits_long.popleft()[1]
+        while self.drops and self.drops[0] <= now - DROPS_SECONDS:
+            self.drops.popleft()
+        while self.restarts and self.restarts[0] <= now - RESTARTS_SECONDS:
+            self.restarts.popleft()
+
+        level = math.log1p(self.levels[-1][1]) if self.levels else 0.0
+        then = 0.0
+        if self.levels and self.levels[0][0] <= now - TREND_SECONDS:
+            then = math.log1p(self.levels[0][1])
+        if self.last_restart is None:
+            since = SINCE_RESTART_CAP_HOURS
+        else:
+            since = min(SINCE_RESTART_CAP_HOURS, max(0.0, now - self.last_restart) / 3600.0)
+        return [
+            level,
+            level - then,
+            math.log1p(self.sum_short),
+            math.log1p(self.sum_long),
+            math.log1p(len(self.drops)),
+            math.log1p(len(self.restarts)),
+            math.log1p(since),
+        ]
+
+
+class FailurePredictor:
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+        self.logger = logging.getLogger("rathole-monitor")
+        self._lock = threading.Lock()
+        self._tunnels: Dict[str, TunnelHistory] = {}
+        self._model_stat = None
+        # وزن‌ها با میانگین/انحراف معیار ادغام شده‌اند: z = bias + Σ w·x
+        self._weights: Optional[List[float]] = None
+        self._bias = 0.0
+        self.model_info: Dict = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self._weights is not None
+
+    # ----- history -----
+    def on_event(self, ev: Dict):
+        """listener ژورنال رویدادها."""
+        name = ev.get("tunnel")
+        if not name or ev.get("type") not in FEATURE_EVENTS:
+            return
+        with self._lock:
+            th = self._tunnels.get(name)
+            if th is None:
+                th = self._tunnels[name] = TunnelHistory()
+            th.add(ev)
+
+    def warm(self, journal, now: float):
+        """ساختن صف‌ها از ژورنال هنگام شروع سرویس (ریستارت‌ها تا سقف hours_since_restart)."""
+        restarts = journal.query(types=[EVENT_RESTART_ATTEMPT], since=now - SINCE_RESTART_CAP_HOURS * 3600,
+                                 limit=1000000)
+        others = journal.query(types=[t for t in FEATURE_EVENTS if t != EVENT_RESTART_ATTEMPT],
+                               since=now - HITS_LONG_SECONDS, limit=1000000)
+        for ev in sorted(restarts + others, key=lambda e: e.get("ts", 0)):
+            self.on_event(ev)
+
+    def retain(self, names: Iterable[str]):
+        keep = set(names)
+        with self._lock:
+            for name in [n for n in self._tunnels if n not in keep]:
+                del self._tunnels[name]
+
+    # ----- model -----
+    def reload_model(self) -> bool:
+        """بارگذاری predict_model.json در صورت تغییر (یک stat در هر دور)."""
+        try:
+            st = os.stat(self.model_path)
+            key = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            key = None
+        if key == self._model_stat:
+            return False
+        self._model_stat = key
+        self._weights, self.model_info = None, {}
+        if key is None:
+            return True
+        try:
+            with open(self.model_path, "r", encoding="utf-8") as f:
+                model = json.load(f)
+            if list(model.get("features", [])) != list(FEATURES):
+                raise ValueError("فهرست ویژگی‌ها با این نسخه سازگار نیست؛ مدل را دوباره آموزش دهید")
+            weights = [float(w) / (float(s) or 1.0) for w, s in zip(model["weights"], model["std"])]
+            bias = float(model["bias"]) - sum(w * float(m) for w, m in zip(weights, model["mean"]))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.error(f"مدل پیش‌بینی خرابی ({self.model_path}) بارگذاری نشد: {e}")
+            return True
+        self._weights, self._bias = weights, bias
+        self.model_info = {k: model.get(k) for k in ("trained", "samples", "positives", "auc", "horizon")}
+        self.logger.info(
+            f"مدل پیش‌بینی خرابی بارگذاری شد (آموزش {model.get('trained')}، AUC={model.get('auc')})"
+        )
+        return True
+
+    def score(self, name: str, now: float) -> Optional[float]:
+        """احتمال خرابی در horizon آینده (None بدون مدل)."""
+        weights = self._weights
+        if weights is None:
+            return None
+        with self._lock:
+            th = self._tunnels.get(name)
+            x = th.features(now) if th is not None else TunnelHistory().features(now)
+        z = self._bias
+        for w, v in zip(weights, x):
+            z += w * v
+        if z < -40:
+            return 0.0
+        return 1.0 / (1.0 + math.exp(-z))
+
+
+# ----- offline training (numpy) -----
+def train_dataset(events: List[Dict], horizon: float, step: float, until: float):
+    """(X, y) روی شبکه زمانی هر تانل؛ ویژگی‌ها به صورت برداری و هم‌ارز TunnelHistory.features."""
+    import numpy as np
+
+    by_tunnel: Dict[str, List[Dict]] = {}
+    silenced: Dict[str, bool] = {}
+    for ev in sorted(events, key=lambda e: e.get("ts", 0)):
+        name, etype = ev.get("tunnel"), ev.get("type")
+        if not name:
+            continue
+        if etype == EVENT_SILENCE:
+            silenced[name] = bool(ev.get("on"))
+        elif etype == EVENT_STATE_CHANGE and silenced.get(name):
+            continue
+        elif etype in FEATURE_EVENTS:
+            by_tunnel.setdefault(name, []).append(ev)
+
+    def times(evs, pred):
+        return np.array([float(e["ts"]) for e in evs if pred(e)], dtype=float)
+
+    def window_sum(ts, cum, t, width):
+        return cum[np.searchsorted(ts, t, "right")] - cum[np.searchsorted(ts, t - width, "right")]
+
+    def window_count(ts, t, width):
+        return np.searchsorted(ts, t, "right") - np.searchsorted(ts, t - width, "right")
+
+    xs, ys = [], []
+    for evs in by_tunnel.values():
+        evs.sort(key=lambda e: e["ts"])
+        t = np.arange(float(evs[0]["ts"]), until - horizon, step)
+        if not len(t):
+            continue
+        lv_ts = times(evs, lambda e: e["type"] == EVENT_LOG_RATE)
+        lv = np.log1p(np.array([float(e.get("score", 0.0)) for e in evs if e["type"] == EVENT_LOG_RATE]))
+        lv = np.concatenate(([0.0], lv))
+        level = lv[np.searchsorted(lv_ts, t, "right")]
+        then = lv[np.searchsorted(lv_ts, t - TREND_SECONDS, "right")]
+
+        hit_evs = [e for e in evs if e["type"] == EVENT_PATTERN_HIT]
+        hit_ts = np.array([float(e["ts"]) for e in hit_evs], dtype=float)
+        hit_cum = np.concatenate(([0.0], np.cumsum([int(e.get("count", 1)) for e in hit_evs])))
+
+        drop_ts = times(evs, is_drop)
+        restart_ts = times(evs, lambda e: e["type"] == EVENT_RESTART_ATTEMPT)
+        fail_ts = times(evs, is_failure)
+
+        last = np.full(len(t), -np.inf)
+        if len(restart_ts):
+            idx = np.searchsorted(restart_ts, t, "right") - 1
+            last = np.where(idx >= 0, restart_ts[np.maximum(idx, 0)], -np.inf)
+        since = np.minimum(SINCE_RESTART_CAP_HOURS, np.maximum(0.0, t - last) / 3600.0)
+
+        xs.append(np.column_stack([
+            level,
+            level - then,
+            np.log1p(window_sum(hit_ts, hit_cum, t, HITS_SHORT_SECONDS)),
+            np.log1p(window_sum(hit_ts, hit_cum, t, HITS_LONG_SECONDS)),
+            np.log1p(window_count(drop_ts, t, DROPS_SECONDS)),
+            np.log1p(window_count(restart_ts, t, RESTARTS_SECONDS)),
+            np.log1p(since),
+        ]))
+        # برچسب: خرابی در (t, t + horizon]
+        ys.append(np.searchsorted(fail_ts, t + horizon, "right") > np.searchsorted(fail_ts, t, "right"))
+    if not xs:
+        return np.zeros((0, len(FEATURES))), np.zeros(0, dtype=bool)
+    return np.vstack(xs), np.concatenate(ys)
+
+
+def fit_logistic(X, y, iterations: int = 500, lr: float = 0.5, l2: float = 1e-3) -> Dict:
+    import numpy as np
+
+    mean = X.mean(axis=0)
+    std = X.std(axis=0)
+    std[std == 0] = 1.0
+    Xs = (X - mean) / std
+    yf = y.astype(float)
+    pos = yf.sum()
+    neg = len(yf) - pos
+    # وزن متوازن: خرابی‌ها نادرند
+    sw = np.where(y, len(yf) / (2 * pos), len(yf) / (2 * neg))
+    total = sw.sum()
+    w = np.zeros(X.shape[1])
+    b = 0.0
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-np.clip(Xs @ w + b, -40, 40)))
+        g = sw * (p - yf)
+        w -= lr * (Xs.T @ g / total + l2 * w)
+        b -= lr * g.sum() / total
+
+    p = Xs @ w + b
+    ranks = np.empty(len(p))
+    ranks[np.argsort(p, kind="mergesort")] = np.arange(1, len(p) + 1)
+    auc = (ranks[y].sum() - pos * (pos + 1) / 2) / (pos * neg)
+    return {
+        "features": list(FEATURES),
+        "mean": mean.round(6).tolist(),
+        "std": std.round(6).tolist(),
+        "weights": w.round(6).tolist(),
+        "bias": round(float(b), 6),
+        "samples": int(len(yf)),
+        "positives": int(pos),
+        "auc": round(float(auc), 4),
+    }
+
+
+def train(events: List[Dict], until: float, horizon: float = DEFAULT_TRAIN_HORIZON,
+          step: float = DEFAULT_TRAIN_STEP) -> Dict:
+    """آموزش مدل از رویدادها؛ ValueError اگر داده کافی نباشد (ImportError بدون numpy)."""
+    X, y = train_dataset(events, horizon, step, until)
+    positives = int(y.sum())
+    if positives < MIN_POSITIVES or positives == len(y):
+        raise ValueError(f"داده کافی نیست: {len(y)} نمونه، {positives} خرابی (حداقل {MIN_POSITIVES})")
+    model = fit_logistic(X, y)
+    model["horizon"] = horizon
+    model["trained"] = datetime.now().isoformat(timespec="seconds")
+    return model
+
+
+def save_model(path: str, model: Dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(model, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
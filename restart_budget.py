@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+بودجه سراسری ریستارت (token bucket) + سقف همزمانی + زمان‌بندی با jitter
+جلوگیری از ریستارت همزمان همه تانل‌ها هنگام قطعی لحظه‌ای شبکه
+"""
+
+import time
+import random
+import fnmatch
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_GLOBAL_RESTART_RATE = 6        # توکن در دقیقه
+DEFAULT_GLOBAL_RESTART_BURST = 3       # حداکثر توکن ذخیره
+DEFAULT_MAX_CONCURRENT_RESTARTS = 2
+DEFAULT_RESTART_JITTER_SECONDS = 5.0
+
+
+class TokenBucket:
+    """سطل توکن ساده و thread-safe؛ rate بر حسب توکن در ثانیه."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = max(0.0, float(rate))
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._last
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._last = now
+
+    def try_acquire(self, n: float = 1.0) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= n:
+                self._tokens -= n
+                return True
+            return False
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class RestartBudget:
+    """
+    زمان‌بند ریستارت‌های خودکار در سطح کل سرور:
+    - ترتیب بر اساس اولویت تانل (tunnel_priorities)
+    - هر ریستارت یک توکن از سطل سراسری مصرف می‌کند؛ بدون توکن → تعویق به دور بعد
+    - حداکثر max_concurrent ریستارت همزمان، هر کدام با تاخیر تصادفی (jitter)
+    """
+
+    def __init__(self, rate_per_minute: float = DEFAULT_GLOBAL_RESTART_RATE,
+                 burst: float = DEFAULT_GLOBAL_RESTART_BURST,
+                 max_concurrent: int = DEFAULT_MAX_CONCURRENT_RESTARTS,
+                 jitter_seconds: float = DEFAULT_RESTART_JITTER_SECONDS,
+                 priorities: Optional[Dict[str, int]] = None):
+        self.bucket = TokenBucket(float(rate_per_minute) / 60.0, burst)
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.jitter_seconds = max(0.0, float(jitter_seconds))
+        self.priorities = dict(priorities or {})
+        self.logger = logging.getLogger("rathole-monitor")
+
+    @classmethod
+    def from_config(cls, cfg: Dict) -> "RestartBudget":
+        return cls(
+            rate_per_minute=cfg.get("global_restart_rate", DEFAULT_GLOBAL_RESTART_RATE),
+            burst=cfg.get("global_restart_burst", DEFAULT_GLOBAL_RESTART_BURST),
+            max_concurrent=cfg.get("max_concurrent_restarts", DEFAULT_MAX_CONCURRENT_RESTARTS),
+            jitter_seconds=cfg.get("restart_jitter_seconds", DEFAULT_RESTART_JITTER_SECONDS),
+            priorities=cfg.get("tunnel_priorities") or {},
+        )
+
+    def priority(self, tunnel: Dict) -> int:
+        """بیشترین اولویت از بین الگوهای glob منطبق با نام تانل (پیش‌فرض ۰)."""
+        name = tunnel.get("name", "")
+        best = None
+        for pattern, prio in self.priorities.items():
+            if fnmatch.fnmatchcase(name, pattern):
+                try:
+                    p = int(prio)
+                except (TypeError, ValueError):
+                    continue
+                if best is None or p > best:
+                    best = p
+        return best if best is not None else 0
+
+    def order(self, tunnels: List[Dict]) -> List[Dict]:
+        # sorted پایدار است؛ تانل‌های هم‌اولویت ترتیب کشف را حفظ می‌کنند
+        return sorted(tunnels, key=lambda t: -self.priority(t))
+
+    def _run_one(self, tunnel: Dict, action: Callable[[Dict], bool]) -> bool:
+        if self.jitter_seconds > 0:
+            time.sleep(random.uniform(0, self.jitter_seconds))
+        try:
+            return bool(action(tunnel))
+        except Exception as e:
+            self.logger.error(f"خطا در ترمیم {tunnel.get('name')}: {e}")
+            return False
+
+    def run(self, tunnels: List[Dict], action: Callable[[Dict], bool],
+            on_done: Optional[Callable[[], None]] = None,
+            eligible: Optional[Callable[[Dict], bool]] = None) -> Dict[str, Optional[bool]]:
+        """
+        اجرای action برای تانل‌ها با رعایت بودجه.
+        خروجی: name → True/False (نتیجه) یا None (به علت اتمام بودجه اجرا نشد).
+        on_done بعد از تمام شدن هر action در thread فراخواننده صدا زده می‌شود (پینگ watchdog).
+        تانلی که eligible آن False است (بک‌آف/سقف تلاش) بدون مصرف توکن False می‌گیرد؛ وگرنه
+        یک تانل پراولویت گیر در بک‌آف هر دور بودجه را می‌سوزاند.
+        """
+        results: Dict[str, Optional[bool]] = {}
+        if not tunnels:
+            return results
+
+        admitted: List[Dict] = []
+        for t in self.order(tunnels):
+            if eligible is not None and not eligible(t):
+                results[t["name"]] = False
+            elif self.bucket.try_acquire():
+                admitted.append(t)
+            else:
+                results[t["name"]] = None
+        deferred = [n for n, r in results.items() if r is None]
+        if deferred:
+            self.logger.warning(f"بودجه سراسری ریستارت تمام شد؛ تعویق به دور بعد: {', '.join(deferred)}")
+
+        if not admitted:
+            return results
+        workers = min(self.max_concurrent, len(admitted))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="restart") as pool:
+            futures = {pool.submit(self._run_one, t, action): t["name"] for t in admitted}
+            for fut in as_completed(futures):
+                results[futures[fut]] = fut.result()
+                if on_done is not None:
+                    on_done()
+        return results
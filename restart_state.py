@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+ذخیره پایدار تاریخچه ریستارت و بک‌آف هر سرویس تا با ریستارت خود مانیتور
+(Restart=always در systemd) بودجه ریستارت تانل‌های crash-loop صفر نشود.
+
+فرمت روی دیسک:
+- <base>.json    : snapshot فشرده {unit: {"h": [epoch,...], "b": [until, delay]}}
+- <base>.journal : رویدادهای افزایشی بعد از snapshot، هر خط یک رکورد:
+      R <unit> <epoch>          ثبت یک ریستارت
+      B <unit> <until> <delay>  تنظیم بک‌آف
+      C <unit>                  پاک کردن بک‌آف
+  وقتی journal بزرگ شد، snapshot بازنویسی و journal خالی می‌شود.
+"""
+
+import os
+import json
+import logging
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+DEFAULT_HISTORY_SIZE = 32
+DEFAULT_COMPACT_EVERY = 500
+
+
+class RestartStateStore:
+    def __init__(self, base_path: str, history_size: int = DEFAULT_HISTORY_SIZE,
+                 compact_every: int = DEFAULT_COMPACT_EVERY):
+        self.snapshot_path = f"{base_path}.json"
+        self.journal_path = f"{base_path}.journal"
+        self.history_size = max(1, int(history_size))
+        self.compact_every = max(1, int(compact_every))
+        # حلقه محدود از زمان‌های ریستارت (epoch، صعودی)
+        self.history: Dict[str, Deque[float]] = {}
+        # unit → (زمان مجاز بعدی، آخرین تاخیر بک‌آف)
+        self.backoff: Dict[str, Tuple[float, float]] = {}
+        self._journal_lines = 0
+        self._journal = None
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger("rathole-monitor")
+
+    # ----- load / persist -----
+    def _ring(self, unit: str) -> Deque[float]:
+        ring = self.history.get(unit)
+        if ring is None:
+            ring = self.history[unit] = deque(maxlen=self.history_size)
+        return ring
+
+    def _apply(self, parts):
+        op = parts[0]
+        if op == "R" and len(parts) == 3:
+            self._ring(parts[1]).append(float(parts[2]))
+        elif op == "B" and len(parts) == 4:
+            self.backoff[parts[1]] = (float(parts[2]), float(parts[3]))
+        elif op == "C" and len(parts) == 2:
+            self.backoff.pop(parts[1], None)
+
+    def load(self):
+        with self._lock:
+            try:
+                with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                    snap = json.load(f)
+                for unit, entry in snap.items():
+                    ring = self._ring(unit)
+                    ring.extend(float(t) for t in entry.get("h", []))
+                    if entry.get("b"):
+                        until, delay = entry["b"]
+                        self.backoff[unit] = (float(until), float(delay))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                self.logger.warning(f"خطا در خواندن snapshot وضعیت ریستارت: {e}")
+
+            try:
+                with open(self.journal_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        parts = line.split()
+                        if not parts:
+                            continue
+                        try:
+                            self._apply(parts)
+                        except ValueError:
+                            continue  # خط ناقص (مثلاً قطع برق وسط نوشتن)
+                        self._journal_lines += 1
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                self.logger.warning(f"خطا در خواندن journal وضعیت ریستارت: {e}")
+
+    def _append(self, line: str):
+        try:
+            if self._journal is None:
+                self._journal = open(self.journal_path, "a", encoding="utf-8")
+            self._journal.write(line + "\n")
+            self._journal.flush()
+            self._journal_lines += 1
+            if self._journal_lines >= self.compact_every:
+                self._compact()
+        except Exception as e:
+            self.logger.error(f"خطا در ذخیره وضعیت ریستارت: {e}")
+
+    def _compact(self):
+        snap = {}
+        for unit in set(self.history) | set(self.backoff):
+            entry = {"h": list(self.history.get(unit, ()))}
+            if unit in self.backoff:
+                entry["b"] = list(self.backoff[unit])
+            snap[unit] = entry
+        tmp = f"{self.snapshot_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snap, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_path, "w", encoding="utf-8")
+        self._journal_lines = 0
+
+    def close(self):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    # ----- queries / updates -----
+    def count_since(self, unit: str, cutoff: float) -> int:
+        """تعداد ریستارت‌های بعد از cutoff؛ موارد قدیمی از ابتدای حلقه حذف می‌شوند (O(1) سرشکن)."""
+        with self._lock:
+            ring = self.history.get(unit)
+            if not ring:
+                return 0
+            while ring and ring[0] < cutoff:
+                ring.popleft()
+            return len(ring)
+
+    def record_restart(self, unit: str, ts: float):
+        with self._lock:
+            self._ring(unit).append(ts)
+            self._append(f"R {unit} {ts:.3f}")
+
+    def next_allowed(self, unit: str) -> Optional[float]:
+        b = self.backoff.get(unit)
+        return b[0] if b else None
+
+    def last_backoff_delay(self, unit: str) -> float:
+        b = self.backoff.get(unit)
+        return b[1] if b else 0.0
+
+    def set_backoff(self, unit: str, until: float, delay: float):
+        with self._lock:
+            self.backoff[unit] = (until, delay)
+            self._append(f"B {unit} {until:.3f} {delay:.0f}")
+
+    def clear_backoff(self, unit: str):
+        with self._lock:
+            if self.backoff.pop(unit, None) is not None:
+                self._append(f"C {unit}")
@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+تنظیمات تایپ‌شده و تغییرناپذیر مانیتور
+
+- هر کلید config.json یک Field دارد: نوع، پیش‌فرض، بازه/مقادیر مجاز و واحد.
+- Settings.from_dict یک بار در هر (باز)بارگذاری ساخته می‌شود؛ مقدار نامعتبر همان‌جا
+  خطا می‌دهد (ConfigError) نه وسط حلقه مانیتور، و حلقه فقط attribute ساده می‌خواند.
+- لیست‌ها به tuple و دیکشنری‌ها به MappingProxyType تبدیل می‌شوند تا شیء واقعاً
+  فقط‌خواندنی باشد و بین threadها (و web_server.py) بدون قفل به اشتراک گذاشته شود.
+- کلیدهای ناشناخته رد نمی‌شوند (ممکن است مربوط به ابزار دیگری مثل aggregator باشند).
+"""
+
+import copy
+from types import MappingProxyType
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from log_setup import (
+    DEFAULT_LOG_MAX_BYTES,
+    DEFAULT_LOG_BACKUP_COUNT,
+    DEFAULT_LOG_DEDUP_SECONDS,
+    DEFAULT_LOG_QUEUE_SIZE,
+)
+from restart_budget import (
+    DEFAULT_GLOBAL_RESTART_RATE,
+    DEFAULT_GLOBAL_RESTART_BURST,
+    DEFAULT_MAX_CONCURRENT_RESTARTS,
+    DEFAULT_RESTART_JITTER_SECONDS,
+)
+from correlation import (
+    DEFAULT_CORRELATION_WINDOW_SECONDS,
+    DEFAULT_CORRELATION_MIN_FAILURES,
+    DEFAULT_CORRELATION_MIN_FRACTION,
+    DEFAULT_CORRELATION_PROBE_TIMEOUT,
+)
+from health_checks import DEFAULT_HEALTH_CHECKS
+from cgroup_stats import DEFAULT_CGROUP_ROOT
+from log_anomaly import (
+    DEFAULT_LOG_ANOMALY_ALPHA,
+    DEFAULT_LOG_ANOMALY_Z,
+    DEFAULT_LOG_ANOMALY_MIN_SCORE,
+    DEFAULT_LOG_ANOMALY_WARMUP,
+)
+from health_state import (
+    DEFAULT_HEALTH_FAIL_THRESHOLD,
+    DEFAULT_HEALTH_SAMPLE_WINDOW,
+    DEFAULT_HEALTH_RECOVER_SAMPLES,
+    DEFAULT_HEALTH_RECHECK_SECONDS,
+    DEFAULT_HEALTH_EWMA_ALPHA,
+    DEFAULT_FLAP_WINDOW_SECONDS,
+    DEFAULT_FLAP_THRESHOLD,
+    DEFAULT_QUARANTINE_SECONDS,
+)
+from traffic import DEFAULT_TRAFFIC_HISTORY
+from executor import COMMAND_CLASSES, DEFAULT_MAX_CONCURRENT_COMMANDS, DEFAULT_COMMAND_RETRIES
+from notifications import validate_notification
+from slo import DEFAULT_SLO_TARGET
+from predictor import (
+    DEFAULT_PREDICT_THRESHOLD,
+    DEFAULT_PREDICT_QUIET_BPS,
+    DEFAULT_PREDICT_QUIET_CONNECTIONS,
+    DEFAULT_PREDICT_COOLDOWN_SECONDS,
+)
+
+# مقادیر پیش‌فرض
+DEFAULT_CHECK_INTERVAL = 300           # ثانیه
+DEFAULT_WEB_PORT = 8080
+DEFAULT_RESTART_DELAY = 10             # ثانیه
+DEFAULT_MAX_RESTART_ATTEMPTS = 3
+DEFAULT_RESTART_WINDOW_SECONDS = 900   # پنجره محدودسازی ریستارت (۱۵ دقیقه)
+DEFAULT_LOG_LEVEL = "INFO"
+DEFAULT_RESTART_ON_INACTIVE = True     # اگر سرویس inactive/failed بود، تلاش برای فعال‌سازی
+
+# کلیدهایی که خود مانیتور در هر دور بازنویسی می‌کند و جزو «تنظیمات» نیستند
+RUNTIME_KEYS = ("tunnels",)
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+LOG_ROTATE_WHEN = ("", "S", "M", "H", "D", "MIDNIGHT", "W0", "W1", "W2", "W3", "W4", "W5", "W6")
+
+NUMBER = (int, float)
+
+
+class Field(NamedTuple):
+    type: Any
+    default: Any
+    lo: Optional[float] = None
+    hi: Optional[float] = None
+    choices: Optional[Tuple] = None
+    unit: str = ""
+
+
+FIELDS: Dict[str, Field] = {
+    "check_interval": Field(int, DEFAULT_CHECK_INTERVAL, 1, 86400, unit="s"),
+    "web_port": Field(int, DEFAULT_WEB_PORT, 1, 65535),
+    "auto_restart": Field(bool, True),
+    "max_restart_attempts": Field(int, DEFAULT_MAX_RESTART_ATTEMPTS, 0, 10000),
+    "restart_delay": Field(int, DEFAULT_RESTART_DELAY, 0, 3600, unit="s"),
+    "restart_window_seconds": Field(int, DEFAULT_RESTART_WINDOW_SECONDS, 1, 7 * 86400, unit="s"),
+    "log_level": Field(str, DEFAULT_LOG_LEVEL, choices=LOG_LEVELS),
+    "restart_on_inactive": Field(bool, DEFAULT_RESTART_ON_INACTIVE),
+    "journal_since_seconds": Field(int, DEFAULT_CHECK_INTERVAL, 1, 86400, unit="s"),
+    # چرخش و فشرده‌سازی monitor.log، خروجی JSON-lines و حذف پیام‌های تکراری
+    "log_max_bytes": Field(int, DEFAULT_LOG_MAX_BYTES, 1024, unit="bytes"),
+    "log_backup_count": Field(int, DEFAULT_LOG_BACKUP_COUNT, 0, 1000),
+    "log_rotate_when": Field(str, "", choices=LOG_ROTATE_WHEN),
+    "log_compress": Field(bool, True),
+    "log_json": Field(bool, False),
+    "log_dedup_seconds": Field(NUMBER, DEFAULT_LOG_DEDUP_SECONDS, 0, unit="s"),
+    "log_queue_size": Field(int, DEFAULT_LOG_QUEUE_SIZE, 1),
+    # بودجه سراسری ریستارت (جلوگیری از ریستارت همزمان همه تانل‌ها)
+    "global_restart_rate": Field(NUMBER, DEFAULT_GLOBAL_RESTART_RATE, 0, unit="/min"),
+    "global_restart_burst": Field(NUMBER, DEFAULT_GLOBAL_RESTART_BURST, 0),
+    "max_concurrent_restarts": Field(int, DEFAULT_MAX_CONCURRENT_RESTARTS, 1, 1000),
+    "restart_jitter_seconds": Field(NUMBER, DEFAULT_RESTART_JITTER_SECONDS, 0, 3600, unit="s"),
+    "tunnel_priorities": Field(dict, {}),
+    # تشخیص خرابی همبسته (قطعی لینک/مقصد مشترک)
+    "correlation_window_seconds": Field(NUMBER, DEFAULT_CORRELATION_WINDOW_SECONDS, 1, unit="s"),
+    "correlation_min_failures": Field(int, DEFAULT_CORRELATION_MIN_FAILURES, 1),
+    "correlation_min_fraction": Field(NUMBER, DEFAULT_CORRELATION_MIN_FRACTION, 0, 1),
+    "correlation_probe_timeout": Field(NUMBER, DEFAULT_CORRELATION_PROBE_TIMEOUT, 0.1, 60, unit="s"),
+    "correlation_default_probe": Field(str, ""),
+    # پایپ‌لاین چک سلامت (ترتیب بر اساس هزینه؛ اولین شکست بقیه را متوقف می‌کند)
+    "health_checks": Field(list, DEFAULT_HEALTH_CHECKS),
+    "tunnel_health_checks": Field(dict, {}),
+    "ignored_error_patterns": Field(list, []),
+    "critical_error_patterns": Field(list, []),
+    # امتیاز ناهنجاری لاگ بر اساس نرخ خطا نسبت به خط پایه هر تانل (log_anomaly.py)
+    "log_anomaly_detection": Field(bool, True),
+    "log_pattern_weights": Field(dict, {}),
+    "log_anomaly_alpha": Field(NUMBER, DEFAULT_LOG_ANOMALY_ALPHA, 0.001, 1),
+    "log_anomaly_z": Field(NUMBER, DEFAULT_LOG_ANOMALY_Z, 0, 100),
+    "log_anomaly_min_score": Field(NUMBER, DEFAULT_LOG_ANOMALY_MIN_SCORE, 0, unit="/min"),
+    "log_anomaly_warmup": Field(int, DEFAULT_LOG_ANOMALY_WARMUP, 0, 10000),
+    # hysteresis (N از M نمونه ناموفق)، امتیاز EWMA و قرنطینه تانل‌های flapping
+    "health_fail_threshold": Field(int, DEFAULT_HEALTH_FAIL_THRESHOLD, 1, 100),
+    "health_sample_window": Field(int, DEFAULT_HEALTH_SAMPLE_WINDOW, 1, 100),
+    "health_recover_samples": Field(int, DEFAULT_HEALTH_RECOVER_SAMPLES, 1, 100),
+    "health_recheck_seconds": Field(int, DEFAULT_HEALTH_RECHECK_SECONDS, 1, 86400, unit="s"),
+    "health_ewma_alpha": Field(NUMBER, DEFAULT_HEALTH_EWMA_ALPHA, 0.01, 1),
+    "flap_window_seconds": Field(int, DEFAULT_FLAP_WINDOW_SECONDS, 60, 7 * 86400, unit="s"),
+    "flap_threshold": Field(int, DEFAULT_FLAP_THRESHOLD, 2, 1000),
+    "quarantine_seconds": Field(int, DEFAULT_QUARANTINE_SECONDS, 1, 7 * 86400, unit="s"),
+    # تله‌متری منابع از cgroup v2 و آستانه‌ها (با چک "cgroup" در health_checks)
+    "cgroup_telemetry": Field(bool, True),
+    "cgroup_root": Field(str, DEFAULT_CGROUP_ROOT),
+    "resource_limits": Field(dict, {}),
+    # تله‌متری اتصال‌های TCP هر تانل (sock_diag یا /proc/net/tcp)
+    "connection_telemetry": Field(bool, True),
+    # شمارش ترافیک هر تانل از /proc/<pid>/io (تعداد نمونه‌های نگه‌داری‌شده)
+    "traffic_accounting": Field(bool, True),
+    "traffic_history": Field(int, DEFAULT_TRAFFIC_HISTORY, 2, 100000),
+    # مقصدهای اعلان، خلاصه‌سازی، حذف تکرار و محدودیت نرخ (notifications.py)
+    "notification": Field(dict, {}),
+    # هدف دسترس‌پذیری برای گزارش‌های SLO (slo.py)
+    "slo_target": Field(NUMBER, DEFAULT_SLO_TARGET, 0, 100, unit="%"),
+    # ریستارت پیشگیرانه بر اساس مدل پیش‌بینی خرابی (predict_model.json)، فقط در دوره کم‌ترافیک
+    "predictive_restart": Field(bool, False),
+    "predict_threshold": Field(NUMBER, DEFAULT_PREDICT_THRESHOLD, 0, 1),
+    "predict_quiet_bps": Field(NUMBER, DEFAULT_PREDICT_QUIET_BPS, 0, unit="B/s"),
+    "predict_quiet_connections": Field(int, DEFAULT_PREDICT_QUIET_CONNECTIONS, 0),
+    "predict_cooldown_seconds": Field(int, DEFAULT_PREDICT_COOLDOWN_SECONDS, 60, 7 * 86400, unit="s"),
+    # اجرای دستورات خارجی: سقف زمانی هر کلاس (query/journal/action/default)، همزمانی و تکرار
+    "command_timeouts": Field(dict, {}),
+    "max_concurrent_commands": Field(int, DEFAULT_MAX_CONCURRENT_COMMANDS, 1, 256),
+    "command_retries": Field(int, DEFAULT_COMMAND_RETRIES, 0, 5),
+    "command_posix_spawn": Field(bool, False),
+    # سیاست‌های اختصاصی تانل‌ها (policy.py) و برچسب تانل‌ها بر اساس glob نام
+    "tunnel_policies": Field(list, []),
+    "tunnel_tags": Field(dict, {}),
+    # گروه‌ها و وابستگی‌های تانل‌ها برای ترتیب ترمیم (tunnel_deps.py)
+    "tunnel_groups": Field(dict, {}),
+    "tunnel_dependencies": Field(dict, {}),
+}
+
+# کلیدهایی که در tunnel_policies می‌توانند برای هر تانل جداگانه تعیین شوند
+POLICY_KEYS = (
+    "check_interval",
+    "auto_restart",
+    "max_restart_attempts",
+    "restart_delay",
+    "restart_window_seconds",
+    "restart_on_inactive",
+    "journal_since_seconds",
+    "health_checks",
+    "ignored_error_patterns",
+    "critical_error_patterns",
+    "resource_limits",
+    "health_fail_threshold",
+    "health_sample_window",
+    "health_recover_samples",
+    "health_recheck_seconds",
+    "flap_threshold",
+    "quarantine_seconds",
+    "log_anomaly_detection",
+    "log_pattern_weights",
+    "log_anomaly_z",
+    "log_anomaly_min_score",
+    "predictive_restart",
+    "predict_threshold",
+    "predict_quiet_bps",
+    "predict_quiet_connections",
+    "predict_cooldown_seconds",
+)
+POLICY_MATCH_KEYS = ("name", "type", "tag")
+
+
+class ConfigError(ValueError):
+    def __init__(self, errors: Dict[str, str]):
+        self.errors = errors
+        super().__init__("; ".join(f"{k}: {v}" for k, v in errors.items()))
+
+
+def default_config() -> Dict:
+    """دیکشنری پیش‌فرض (قابل تغییر) برای ادغام با config.json."""
+    cfg = {"tunnels": []}
+    for name, f in FIELDS.items():
+        cfg[name] = copy.deepcopy(f.default)
+    return cfg
+
+
+def _type_ok(value: Any, expected) -> bool:
+    # bool زیرکلاس int است ولی true/false به جای عدد پذیرفته نمی‌شود
+    if isinstance(value, bool) and expected is not bool:
+        return False
+    return isinstance(value, expected)
+
+
+def validate_config(cfg: Dict) -> Dict[str, str]:
+    """کلید → پیام خطا (خالی یعنی معتبر)."""
+    if not isinstance(cfg, dict):
+        return {"": "config باید یک شیء JSON باشد"}
+    errors: Dict[str, str] = {}
+    if "tunnels" in cfg and not isinstance(cfg["tunnels"], list):
+        errors["tunnels"] = "باید لیست باشد"
+    for key, f in FIELDS.items():
+        if key not in cfg:
+            continue
+        value = cfg[key]
+        unit = f" {f.unit}" if f.unit else ""
+        if not _type_ok(value, f.type):
+            errors[key] = f"نوع نامعتبر ({type(value).__name__})"
+        elif f.lo is not None and value < f.lo:
+            errors[key] = f"باید >= {f.lo}{unit} باشد ({value})"
+        elif f.hi is not None and value > f.hi:
+            errors[key] = f"باید <= {f.hi}{unit} باشد ({value})"
+        elif f.choices is not None and str(value).upper() not in f.choices:
+            errors[key] = f"مقدار نامعتبر {value!r}"
+    for key in ("ignored_error_patterns", "critical_error_patterns"):
+        if isinstance(cfg.get(key), list) and not all(isinstance(p, str) for p in cfg[key]):
+            errors[key] = "همه الگوها باید رشته باشند"
+    weights = cfg.get("log_pattern_weights")
+    if isinstance(weights, dict) and not all(_type_ok(w, NUMBER) and w >= 0 for w in weights.values()):
+        errors["log_pattern_weights"] = "وزن هر الگو باید عدد نامنفی باشد"
+    timeouts = cfg.get("command_timeouts")
+    if isinstance(timeouts, dict):
+        unknown = sorted(set(timeouts) - set(COMMAND_CLASSES))
+        if unknown:
+            errors["command_timeouts"] = f"کلاس ناشناخته: {', '.join(unknown)} (مجاز: {', '.join(COMMAND_CLASSES)})"
+        elif not all(_type_ok(t, NUMBER) and t > 0 for t in timeouts.values()):
+            errors["command_timeouts"] = "سقف زمانی باید عدد مثبت (ثانیه) باشد"
+    if isinstance(cfg.get("notification"), dict):
+        problem = validate_notification(cfg["notification"])
+        if problem:
+            errors["notification"] = problem
+    threshold = cfg.get("health_fail_threshold", DEFAULT_HEALTH_FAIL_THRESHOLD)
+    window = cfg.get("health_sample_window", DEFAULT_HEALTH_SAMPLE_WINDOW)
+    if not errors.get("health_fail_threshold") and not errors.get("health_sample_window") \
+            and _type_ok(threshold, int) and _type_ok(window, int) and threshold > window:
+        errors["health_fail_threshold"] = f"نباید از health_sample_window بیشتر باشد ({threshold} > {window})"
+    _validate_policies(cfg, errors)
+    return errors
+
+
+def _validate_policies(cfg: Dict, errors: Dict[str, str]):
+    for name in ("tunnel_tags", "tunnel_groups", "tunnel_dependencies"):
+        mapping = cfg.get(name)
+        if isinstance(mapping, dict):
+            for pattern, values in mapping.items():
+                if not isinstance(values, list) or not all(isinstance(t, str) for t in values):
+                    errors[name] = f"{pattern}: باید لیست رشته باشد"
+    groups = cfg.get("tunnel_groups") if isinstance(cfg.get("tunnel_groups"), dict) else {}
+    deps = cfg.get("tunnel_dependencies")
+    if isinstance(deps, dict) and "tunnel_dependencies" not in errors:
+        refs = [k for k in deps] + [v for values in deps.values() for v in values]
+        missing = sorted({r for r in refs if r.startswith("@") and r[1:] not in groups})
+        if missing:
+            errors["tunnel_dependencies"] = f"گروه تعریف‌نشده: {', '.join(missing)}"
+    rules = cfg.get("tunnel_policies")
+    if not isinstance(rules, list):
+        return
+    for i, rule in enumerate(rules):
+        key = f"tunnel_policies[{i}]"
+        if not isinstance(rule, dict) or not isinstance(rule.get("match", {}), dict) \
+                or not isinstance(rule.get("settings", {}), dict):
+            errors[key] = 'باید به شکل {"match": {...}, "settings": {...}} باشد'
+            continue
+        unknown = set(rule.get("match", {})) - set(POLICY_MATCH_KEYS)
+        bad = set(rule.get("settings", {})) - set(POLICY_KEYS)
+        if unknown:
+            errors[key] = f"شرط ناشناخته در match: {', '.join(sorted(unknown))}"
+        elif bad:
+            errors[key] = f"این کلیدها برای هر تانل قابل تنظیم نیستند: {', '.join(sorted(bad))}"
+        else:
+            sub = validate_config(rule.get("settings", {}))
+            if sub:
+                errors[key] = "; ".join(f"{k}: {v}" for k, v in sub.items())
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, MappingProxyType):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+class Settings:
+    """نمای تایپ‌شده و فقط‌خواندنی تنظیمات؛ هر کلید FIELDS یک attribute است."""
+
+    __slots__ = tuple(FIELDS) + ("errors",)
+
+    def __init__(self, values: Dict[str, Any], errors: Optional[Dict[str, str]] = None):
+        for name, f in FIELDS.items():
+            object.__setattr__(self, name, _freeze(values.get(name, f.default)))
+        object.__setattr__(self, "errors", MappingProxyType(dict(errors or {})))
+
+    @classmethod
+    def from_dict(cls, cfg: Dict, lenient: bool = False) -> "Settings":
+        """
+        ساخت از دیکشنری config. مقدار نامعتبر → ConfigError؛ با lenient=True به‌جای آن
+        پیش‌فرض همان کلید استفاده و خطا در settings.errors نگه داشته می‌شود.
+        """
+        errors = validate_config(cfg)
+        if errors and not lenient:
+            raise ConfigError(errors)
+        if not isinstance(cfg, dict):
+            cfg = {}
+        values = {k: v for k, v in cfg.items() if k in FIELDS and k not in errors}
+        if isinstance(values.get("log_level"), str):
+            values["log_level"] = values["log_level"].upper()
+        return cls(values, errors)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Settings فقط‌خواندنی است")
+
+    def __delattr__(self, name):
+        raise AttributeError("Settings فقط‌خواندنی است")
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return getattr(self, name, default) if name in FIELDS else default
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: _thaw(getattr(self, name)) for name in FIELDS}
+
+    def __repr__(self) -> str:
+        return f"Settings(check_interval={self.check_interval}, auto_restart={self.auto_restart}, ...)"
+
+
+def config_diff(old: Dict, new: Dict) -> Dict[str, Tuple[Any, Any]]:
+    """کلیدهای تغییرکرده (بدون کلیدهای زمان اجرا) → (قدیم، جدید)."""
+    diff: Dict[str, Tuple[Any, Any]] = {}
+    for key in set(old) | set(new):
+        if key in RUNTIME_KEYS:
+            continue
+        if old.get(key) != new.get(key):
+            diff[key] = (old.get(key), new.get(key))
+    return diff
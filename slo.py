@@ -0,0 +1,461 @@
+# -*- coding: utf-8 -*-
+"""
+SLO زمان بازیابی: رخدادهای هر تانل، دسترس‌پذیری، MTTR و MTBF
+
+هر رخداد (incident) از لحظه خرابی تا برگشت به «سالم» است:
+- start      : شروع خرابی. اگر سرویس active نیست، StateChangeTimestamp خود systemd؛ وگرنه
+               اولین نمونه ناموفق چک سلامت
+- detected   : تایید خرابی (تانل «ناسالم» شد) → تاخیر تشخیص = detected - start
+- remediated : اولین فعال‌سازی/ریستارت بعد از تشخیص → زمان تا ریستارت = remediated - detected
+- recovered  : برگشت به «سالم» → زمان تا سلامت (TTR) = recovered - start
+
+آمار به صورت افزایشی در rollupهای روزانه جمع می‌شود (slo/days/YYYY-MM-DD.json، هر تانل یک
+ردیف ROLLUP_FIELDS) و ماه‌های کامل یک بار در slo/months/YYYY-MM.json تجمیع می‌شوند؛ گزارش
+هر بازه فقط همین فایل‌ها را جمع می‌زند و به حجم رویدادها بستگی ندارد. زمان پنجره‌های
+نگهداری (silence) جزو زمان پایش حساب نمی‌شود. روزها به وقت محلی سرور هستند.
+"""
+
+import os
+import html
+import json
+import time
+import fnmatch
+import logging
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from health_state import STATE_HEALTHY, STATE_UNHEALTHY
+
+DEFAULT_SLO_TARGET = 99.9              # درصد دسترس‌پذیری
+# فاصله بیشتر بین دو دور (مانیتور متوقف بوده) جزو زمان پایش حساب نمی‌شود
+MIN_TICK_GAP = 900
+
+ROLLUP_FIELDS = ("observed", "down", "maintenance", "incidents", "detect_sum", "detect_n",
+                 "restart_sum", "restart_n", "ttr_sum", "ttr_max")
+OBSERVED, DOWN, MAINTENANCE, INCIDENTS, DETECT_SUM, DETECT_N, RESTART_SUM, RESTART_N, TTR_SUM, TTR_MAX = \
+    range(len(ROLLUP_FIELDS))
+
+
+def day_key(ts: float) -> str:
+    return time.strftime("%Y-%m-%d", time.localtime(ts))
+
+
+def split_days(start: float, end: float) -> Iterator[Tuple[str, float]]:
+    """(روز محلی، ثانیه) برای هر روزی که بازه [start, end) را قطع می‌کند."""
+    t = start
+    while t < end:
+        d = datetime.fromtimestamp(t).date()
+        midnight = datetime.combine(d + timedelta(days=1), datetime.min.time()).timestamp()
+        nxt = min(end, midnight)
+        yield d.isoformat(), nxt - t
+        t = nxt
+
+
+def empty_row() -> List[float]:
+    return [0.0] * len(ROLLUP_FIELDS)
+
+
+def combine(acc: List[float], row: List[float]):
+    for i, v in enumerate(row[:len(ROLLUP_FIELDS)]):
+        acc[i] = max(acc[i], v) if i == TTR_MAX else acc[i] + v
+
+
+def _avg(total: float, n: float) -> Optional[float]:
+    return round(total / n, 1) if n else None
+
+
+def metrics(row: List[float], target: float = DEFAULT_SLO_TARGET) -> Dict:
+    observed, down = row[OBSERVED], min(row[DOWN], row[OBSERVED])
+    up = observed - down
+    allowed = observed * (1 - target / 100.0)
+    return {
+        "availability": round(100.0 * up / observed, 4) if observed else None,
+        "observed_s": round(observed),
+        "downtime_s": round(down),
+        "maintenance_s": round(row[MAINTENANCE]),
+        "incidents": int(row[INCIDENTS]),
+        "mttr_s": _avg(row[TTR_SUM], row[INCIDENTS]),
+        "mtbf_s": _avg(up, row[INCIDENTS]),
+        "detect_avg_s": _avg(row[DETECT_SUM], row[DETECT_N]),
+        "restart_avg_s": _avg(row[RESTART_SUM], row[RESTART_N]),
+        "ttr_max_s": round(row[TTR_MAX], 1),
+        # درصد بودجه خطای مصرف‌شده (بیش از ۱۰۰ یعنی هدف SLO نقض شده)
+        "error_budget_used": round(100.0 * down / allowed, 1) if allowed > 0 else None,
+        "meets_target": (100.0 * up / observed >= target) if observed else None,
+    }
+
+
+# ----- Storage -----
+class RollupStore:
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        self.days_dir = os.path.join(base_dir, "days")
+        self.months_dir = os.path.join(base_dir, "months")
+
+    @staticmethod
+    def _read(path: str) -> Dict[str, List[float]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _write(path: str, rows: Dict[str, List[float]]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({k: [round(v, 3) for v in row] for k, row in rows.items()}, f,
+                      ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def load_day(self, day: str) -> Dict[str, List[float]]:
+        return self._read(os.path.join(self.days_dir, f"{day}.json"))
+
+    def save_day(self, day: str, rows: Dict[str, List[float]]):
+        self._write(os.path.join(self.days_dir, f"{day}.json"), rows)
+
+    def invalidate_month(self, month: str):
+        try:
+            os.unlink(os.path.join(self.months_dir, f"{month}.json"))
+        except FileNotFoundError:
+            pass
+
+    def days(self, since: str, until: str) -> List[str]:
+        try:
+            names = os.listdir(self.days_dir)
+        except OSError:
+            return []
+        return sorted(n[:-5] for n in names if n.endswith(".json") and since <= n[:-5] <= until)
+
+    def month(self, month: str, today: str) -> Dict[str, List[float]]:
+        """rollup یک ماه؛ ماه کامل‌شده یک بار از روزها ساخته و ذخیره می‌شود."""
+        path = os.path.join(self.months_dir, f"{month}.json")
+        complete = today[:7] > month
+        if complete and os.path.exists(path):
+            return self._read(path)
+        rows: Dict[str, List[float]] = {}
+        for day in self.days(f"{month}-01", f"{month}-31"):
+            for name, row in self.load_day(day).items():
+                combine(rows.setdefault(name, empty_row()), row)
+        if complete and rows:
+            self._write(path, rows)
+        return rows
+
+    def load_range(self, since: str, until: str, today: Optional[str] = None) -> Dict[str, List[float]]:
+        """جمع rollupهای بازه [since, until] (روزهای ISO)؛ ماه‌های کامل داخل بازه از فایل ماهانه."""
+        today = today or day_key(time.time())
+        totals: Dict[str, List[float]] = {}
+
+        def add(rows):
+            for name, row in rows.items():
+                combine(totals.setdefault(name, empty_row()), row)
+
+        d = date.fromisoformat(since)
+        end = date.fromisoformat(until)
+        while d <= end:
+            first = d.replace(day=1)
+            nxt = (first + timedelta(days=32)).replace(day=1)
+            last = nxt - timedelta(days=1)
+            if d == first and last <= end:
+                add(self.month(first.isoformat()[:7], today))
+                d = nxt
+            else:
+                stop = min(last, end)
+                for day in self.days(d.isoformat(), stop.isoformat()):
+                    add(self.load_day(day))
+                d = stop + timedelta(days=1)
+        return totals
+
+
+# ----- Tracker (in the monitor) -----
+class SloTracker:
+    def __init__(self, base_dir: str, on_incident: Optional[Callable[[str, Dict], None]] = None):
+        self.logger = logging.getLogger("rathole-monitor")
+        self.store = RollupStore(base_dir)
+        self.state_path = os.path.join(base_dir, "state.json")
+        self.reports_dir = os.path.join(base_dir, "reports")
+        self.on_incident = on_incident
+        # رخدادهای باز، اولین نمونه ناموفق، آخرین نمونه سالم، آخرین دور پایش، شروع نگهداری
+        self._open: Dict[str, Dict] = {}
+        self._first_failed: Dict[str, float] = {}
+        self._last_ok: Dict[str, float] = {}
+        self._last_tick: Dict[str, float] = {}
+        self._maint_since: Dict[str, float] = {}
+        self._reported = ""
+        # روز → ردیف‌های تغییرکرده (تا flush)
+        self._days: Dict[str, Dict[str, List[float]]] = {}
+
+    def load(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                st = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._open = st.get("open") or {}
+        self._first_failed = st.get("first_failed") or {}
+        self._last_ok = st.get("last_ok") or {}
+        self._last_tick = st.get("last_tick") or {}
+        self._maint_since = st.get("maintenance") or {}
+        self._reported = st.get("reported", "")
+
+    def _row(self, day: str, name: str) -> List[float]:
+        rows = self._days.get(day)
+        if rows is None:
+            rows = self._days[day] = self.store.load_day(day)
+        row = rows.get(name)
+        if row is None or len(row) != len(ROLLUP_FIELDS):
+            row = rows[name] = (row or []) + [0.0] * (len(ROLLUP_FIELDS) - len(row or []))
+        return row
+
+    def _add_span(self, name: str, start: float, end: float, field: int):
+        for day, secs in split_days(start, end):
+            self._row(day, name)[field] += secs
+
+    # ----- inputs -----
+    def tick(self, name: str, wall: float, max_gap: float = MIN_TICK_GAP):
+        """یک دور پایش تانل (خارج از پنجره نگهداری)؛ فاصله از دور قبل زمان پایش است."""
+        last = self._last_tick.get(name)
+        self._last_tick[name] = wall
+        if last is not None and 0 < wall - last <= max(max_gap, MIN_TICK_GAP):
+            self._add_span(name, last, wall, OBSERVED)
+
+    def observe(self, name: str, healthy: bool, state: str, wall: float,
+                down_since: Optional[float] = None) -> Optional[Dict]:
+        """نتیجه یک چک سلامت؛ اگر رخدادی بسته شد رکورد آن برگردانده می‌شود."""
+        if not healthy:
+            self._first_failed.setdefault(name, wall)
+        inc = self._open.get(name)
+        if state == STATE_UNHEALTHY and inc is None:
+            start = self._first_failed.get(name, wall)
+            # زمان واقعی توقف سرویس از systemd (اگر بعد از آخرین نمونه سالم بوده)
+            if down_since is not None and self._last_ok.get(name, 0) <= down_since < start:
+                start = down_since
+            self._open[name] = {"start": start, "detected": wall, "remediated": None}
+        elif state == STATE_HEALTHY:
+            self._first_failed.pop(name, None)
+            self._last_ok[name] = wall
+            if inc is not None:
+                return self._close(name, wall)
+        return None
+
+    def on_event(self, ev: Dict):
+        """listener ژورنال: اولین ترمیم رخداد و شروع/پایان پنجره نگهداری."""
+        etype, name, ts = ev.get("type"), ev.get("tunnel"), ev.get("ts") or time.time()
+        if etype in ("restart_attempt", "activation"):
+            inc = self._open.get(name)
+            if inc is not None and inc["remediated"] is None:
+                inc["remediated"] = ts
+        elif etype == "silence":
+            if ev.get("on"):
+                self._maint_since.setdefault(name, ts)
+                # رخداد باز در شروع نگهداری بسته می‌شود (ادامه قطعی عمدی است)
+                if name in self._open:
+                    self._close(name, ts, interrupted=True)
+                self._first_failed.pop(name, None)
+            else:
+                since = self._maint_since.pop(name, None)
+                if since is not None:
+                    self._add_span(name, since, ts, MAINTENANCE)
+                # فاصله نگهداری جزو زمان پایش نیست
+                self._last_tick[name] = ts
+
+    def _close(self, name: str, end: float, interrupted: bool = False) -> Dict:
+        inc = self._open.pop(name)
+        start, detected, remediated = inc["start"], inc["detected"], inc["remediated"]
+        rec = {
+            "start": round(start, 3),
+            "detected": round(detected, 3),
+            "remediated": round(remediated, 3) if remediated else None,
+            "end": round(end, 3),
+            "detect_s": round(detected - start, 1),
+            "restart_s": round(remediated - detected, 1) if remediated else None,
+            "healthy_s": round(end - start, 1),
+            "interrupted": interrupted,
+        }
+        self._add_span(name, start, end, DOWN)
+        row = self._row(day_key(end), name)
+        row[INCIDENTS] += 1
+        row[TTR_SUM] += end - start
+        row[TTR_MAX] = max(row[TTR_MAX], end - start)
+        row[DETECT_SUM] += detected - start
+        row[DETECT_N] += 1
+        if remediated:
+            row[RESTART_SUM] += remediated - detected
+            row[RESTART_N] += 1
+        if self.on_incident is not None:
+            self.on_incident(name, rec)
+        return rec
+
+    def incident(self, name: str) -> Optional[Dict]:
+        inc = self._open.get(name)
+        return dict(inc) if inc is not None else None
+
+    def retain(self, names):
+        keep = set(names)
+        for table in (self._open, self._first_failed, self._last_ok, self._last_tick, self._maint_since):
+            for n in [n for n in table if n not in keep]:
+                del table[n]
+
+    # ----- persistence -----
+    def flush(self, wall: float, target: float = DEFAULT_SLO_TARGET) -> List[str]:
+        """ذخیره روزهای تغییرکرده و وضعیت؛ در ماه جدید گزارش ماه قبل ساخته می‌شود."""
+        today = day_key(wall)
+        for day, rows in self._days.items():
+            try:
+                self.store.save_day(day, rows)
+                # رخدادی که از ماه کامل‌شده قبلی ادامه داشته، rollup آن ماه را باطل می‌کند
+                if day[:7] < today[:7]:
+                    self.store.invalidate_month(day[:7])
+            except OSError as e:
+                self.logger.error(f"ذخیره rollup روز {day} ممکن نشد: {e}")
+        # فقط روز جاری در حافظه می‌ماند
+        self._days = {d: r for d, r in self._days.items() if d == today}
+        written: List[str] = []
+        prev_month = (date.fromisoformat(today).replace(day=1) - timedelta(days=1)).isoformat()[:7]
+        if self._reported < prev_month:
+            if self._reported and self.store.days(f"{prev_month}-01", f"{prev_month}-31"):
+                written = self.write_report(prev_month, target, wall)
+            self._reported = prev_month
+        state = {"open": self._open, "first_failed": self._first_failed, "last_ok": self._last_ok,
+                 "last_tick": self._last_tick, "maintenance": self._maint_since, "reported": self._reported}
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            tmp = f"{self.state_path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            self.logger.error(f"ذخیره وضعیت SLO ممکن نشد: {e}")
+        return written
+
+    def write_report(self, month: str, target: float, now: float) -> List[str]:
+        since, until = period(month=month)
+        report = build_report(self.store.base_dir, since, until, target=target, now=now)
+        os.makedirs(self.reports_dir, exist_ok=True)
+        paths = []
+        for ext, text in (("json", json.dumps(report, ensure_ascii=False, indent=1)),
+                          ("html", render_html(report))):
+            path = os.path.join(self.reports_dir, f"{month}.{ext}")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            paths.append(path)
+        return paths
+
+
+# ----- Reports -----
+def period(month: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+           days: Optional[float] = None, now: Optional[float] = None) -> Tuple[str, str]:
+    """بازه گزارش به صورت (روز اول، روز آخر) ISO؛ ValueError برای قالب نامعتبر."""
+    today = datetime.fromtimestamp(now or time.time()).date()
+    if month:
+        first = datetime.strptime(month, "%Y-%m").date()
+        last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return first.isoformat(), last.isoformat()
+    if since or until:
+        start = date.fromisoformat(since) if since else date(1970, 1, 1)
+        end = date.fromisoformat(until) if until else today
+        if start > end:
+            raise ValueError("since بعد از until است")
+        return start.isoformat(), end.isoformat()
+    n = max(1, int(days or 30))
+    return (today - timedelta(days=n - 1)).isoformat(), today.isoformat()
+
+
+def build_report(base_dir: str, since: str, until: str, pattern: str = "*",
+                 target: float = DEFAULT_SLO_TARGET, now: Optional[float] = None) -> Dict:
+    t0 = time.perf_counter()
+    now = now or time.time()
+    store = RollupStore(base_dir)
+    totals = store.load_range(since, until, day_key(now))
+    fleet = empty_row()
+    tunnels = []
+    for name in sorted(totals):
+        if pattern not in ("*", "all") and not fnmatch.fnmatchcase(name, pattern):
+            continue
+        row = totals[name]
+        combine(fleet, row)
+        tunnels.append(dict(name=name, **metrics(row, target)))
+    tunnels.sort(key=lambda t: (t["availability"] is None, t["availability"] or 0))
+    open_incidents = []
+    try:
+        with open(os.path.join(base_dir, "state.json"), "r", encoding="utf-8") as f:
+            for name, inc in (json.load(f).get("open") or {}).items():
+                if pattern in ("*", "all") or fnmatch.fnmatchcase(name, pattern):
+                    open_incidents.append({"name": name, **inc, "down_s": round(now - inc["start"])})
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return {
+        "since": since,
+        "until": until,
+        "generated": datetime.fromtimestamp(now).isoformat(timespec="seconds"),
+        "target": target,
+        "fleet": dict(tunnels=len(tunnels), **metrics(fleet, target)),
+        "tunnels": tunnels,
+        "open_incidents": open_incidents,
+        "took_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+
+def fmt_duration(seconds) -> str:
+    if seconds is None:
+        return "-"
+    s = int(round(seconds))
+    if s < 60:
+        return f"{s}s"
+    if s < 3600:
+        return f"{s // 60}m{s % 60:02d}s"
+    if s < 86400:
+        return f"{s // 3600}h{s % 3600 // 60:02d}m"
+    return f"{s // 86400}d{s % 86400 // 3600:02d}h"
+
+
+def fmt_pct(value) -> str:
+    return "-" if value is None else f"{value:.3f}%"
+
+
+REPORT_COLUMNS = (
+    ("availability", "دسترس‌پذیری", fmt_pct),
+    ("downtime_s", "قطعی", fmt_duration),
+    ("incidents", "رخداد", str),
+    ("mttr_s", "MTTR", fmt_duration),
+    ("mtbf_s", "MTBF", fmt_duration),
+    ("detect_avg_s", "تاخیر تشخیص", fmt_duration),
+    ("restart_avg_s", "زمان تا ریستارت", fmt_duration),
+    ("ttr_max_s", "بیشترین TTR", fmt_duration),
+    ("error_budget_used", "بودجه خطا", lambda v: "-" if v is None else f"{v}%"),
+)
+
+
+def render_html(report: Dict) -> str:
+    def row(name, m, cls=""):
+        bad = " bad" if m.get("meets_target") is False else ""
+        cells = "".join(f"<td>{html.escape(fmt(m.get(key)))}</td>" for key, _label, fmt in REPORT_COLUMNS)
+        return f'<tr class="{cls}{bad}"><td>{html.escape(name)}</td>{cells}</tr>'
+
+    head = "".join(f"<th>{label}</th>" for _key, label, _fmt in REPORT_COLUMNS)
+    body = [row(f"کل ({report['fleet']['tunnels']} تانل)", report["fleet"], "fleet")]
+    body.extend(row(t["name"], t) for t in report["tunnels"])
+    open_rows = "".join(
+        f"<li>{html.escape(i['name'])}: {fmt_duration(i['down_s'])} از "
+        f"{datetime.fromtimestamp(i['start']).isoformat(sep=' ', timespec='minutes')}</li>"
+        for i in report["open_incidents"])
+    return f"""<!DOCTYPE html>
+<html lang="fa" dir="rtl"><head><meta charset="utf-8">
+<title>گزارش SLO {report['since']} تا {report['until']}</title>
+<style>
+body{{font-family:Tahoma,sans-serif;margin:24px;color:#222}}
+table{{border-collapse:collapse;width:100%;font-size:13px}}
+th,td{{border:1px solid #ddd;padding:6px 8px;text-align:center}}
+td:first-child{{text-align:right;font-family:monospace}}
+th{{background:#f3f3f3}} tr.fleet{{font-weight:bold;background:#eef6ff}} tr.bad td{{color:#b00020}}
+</style></head><body>
+<h2>گزارش SLO تانل‌ها</h2>
+<p>بازه: {report['since']} تا {report['until']} — هدف: {report['target']}% — ساخته شده: {report['generated']}</p>
+<table><thead><tr><th>تانل</th>{head}</tr></thead><tbody>
+{chr(10).join(body)}
+</tbody></table>
+{f"<h3>رخدادهای باز</h3><ul>{open_rows}</ul>" if open_rows else ""}
+</body></html>
+"""
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+اعلان وضعیت به systemd (پروتکل sd_notify) بدون وابستگی خارجی
+
+با Type=notify، سرویس پس از آماده شدن READY=1 می‌فرستد و با STATUS= آمار آخرین دور
+در `systemctl status` دیده می‌شود. با WatchdogSec، systemd متغیر WATCHDOG_USEC را می‌دهد و
+اگر در این مدت WATCHDOG=1 نرسد سرویس را ریستارت می‌کند. اگر NOTIFY_SOCKET تنظیم نشده باشد
+(اجرای دستی یا Type=simple) همه متدها بی‌اثرند.
+"""
+
+import os
+import socket
+import logging
+from typing import Optional
+
+
+class SystemdNotifier:
+    def __init__(self):
+        self.logger = logging.getLogger("rathole-monitor")
+        self._addr: Optional[str] = None
+        self._sock: Optional[socket.socket] = None
+        addr = os.environ.get("NOTIFY_SOCKET", "")
+        if addr:
+            # "@" یعنی سوکت abstract
+            self._addr = "\0" + addr[1:] if addr.startswith("@") else addr
+            try:
+                self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            except OSError as e:
+                self.logger.warning(f"ایجاد سوکت sd_notify ممکن نشد: {e}")
+        # فاصله ارسال WATCHDOG=1 (نصف WatchdogSec، طبق توصیه systemd)
+        self.watchdog_interval: Optional[float] = None
+        usec = os.environ.get("WATCHDOG_USEC", "")
+        pid = os.environ.get("WATCHDOG_PID", "")
+        if usec.isdigit() and int(usec) > 0 and (not pid or pid == str(os.getpid())):
+            self.watchdog_interval = int(usec) / 1e6 / 2
+
+    @property
+    def enabled(self) -> bool:
+        return self._sock is not None
+
+    def notify(self, *fields: str) -> bool:
+        if self._sock is None:
+            return False
+        try:
+            self._sock.sendto("\n".join(fields).encode("utf-8"), self._addr)
+            return True
+        except OSError as e:
+            self.logger.warning(f"ارسال sd_notify ناموفق بود: {e}")
+            return False
+
+    def ready(self, status: str = "") -> bool:
+        return self.notify("READY=1", f"STATUS={status}") if status else self.notify("READY=1")
+
+    def status(self, text: str) -> bool:
+        return self.notify(f"STATUS={text}")
+
+    def watchdog(self) -> bool:
+        if self.watchdog_interval is None:
+            return False
+        return self.notify("WATCHDOG=1")
+
+    def stopping(self) -> bool:
+        return self.notify("STOPPING=1")
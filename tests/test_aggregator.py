@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""تست Node در aggregator با یک نود جعلی http.server روی localhost."""
+
+import os
+import sys
+import json
+import time
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregator import Node
+
+
+class StubNode(ThreadingHTTPServer):
+    """شبیه /api/tunnels نود: epoch، نسخه هر ردیف، removed و full."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.epoch = "e1"
+        self.version = 0
+        self.rows = {}
+        self.row_version = {}
+        self.removed = {}
+        self.full = False
+        self.hang = 0.0
+        self.connections = 0
+        self.paths = []
+
+    def put(self, name, status):
+        self.version += 1
+        self.rows[name] = {"name": name, "type": "server", "status": status}
+        self.row_version[name] = self.version
+        self.removed.pop(name, None)
+
+    def drop(self, name):
+        self.version += 1
+        self.rows.pop(name, None)
+        self.row_version.pop(name, None)
+        self.removed[name] = self.version
+
+    def tunnels(self, query):
+        since = query.get("since_version", [None])[0]
+        payload = {"epoch": self.epoch, "version": self.version, "full": since is None or self.full}
+        if payload["full"]:
+            payload["tunnels"] = list(self.rows.values())
+            payload["removed"] = []
+        else:
+            since = int(since)
+            payload["tunnels"] = [r for n, r in self.rows.items() if self.row_version[n] > since]
+            payload["removed"] = [n for n, v in self.removed.items() if v > since]
+        return payload
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        u = urlparse(self.path)
+        self.server.paths.append(self.path)
+        if self.server.hang:
+            time.sleep(self.server.hang)
+        if u.path == "/api/tunnels":
+            payload = self.server.tunnels(parse_qs(u.query))
+        else:
+            payload = {"monitoring_active": True}
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class NodeTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubNode()
+        threading.Thread(target=self.stub.serve_forever, args=(0.05,), daemon=True).start()
+        self.node = Node("n1", f"http://127.0.0.1:{self.stub.server_address[1]}", 0.5)
+        self.stub.put("rathole-a", "active")
+        self.stub.put("rathole-b", "active")
+
+    def tearDown(self):
+        self.node._close()
+        self.stub.shutdown()
+        self.stub.server_close()
+
+    def tunnel_paths(self):
+        return [p for p in self.stub.paths if p.startswith("/api/tunnels")]
+
+    def statuses(self):
+        return {t["name"]: t["status"] for t in self.node.tunnels}
+
+    def test_keep_alive_connection_is_reused(self):
+        for _ in range(3):
+            self.node.fetch()
+            self.assertTrue(self.node.ok, self.node.error)
+        self.assertEqual(self.stub.connections, 1)
+        self.assertEqual(len(self.stub.paths), 6)
+
+    def test_incremental_fetch_uses_since_version(self):
+        self.node.fetch()
+        self.assertNotIn("since_version", self.tunnel_paths()[0])
+        self.stub.put("rathole-a", "failed")
+        self.stub.drop("rathole-b")
+        self.stub.put("rathole-c", "active")
+        self.node.fetch()
+        self.assertIn("since_version=2", self.tunnel_paths()[1])
+        self.assertEqual(self.statuses(), {"rathole-a": "failed", "rathole-c": "active"})
+        self.assertEqual(self.node.version, 5)
+
+    def test_full_flag_forces_resync(self):
+        self.node.fetch()
+        # نسخه حذف از پنجره نود خارج شده: پاسخ full و کل لیست
+        self.stub.rows.pop("rathole-b")
+        self.stub.full = True
+        self.node.fetch()
+        self.assertEqual(self.statuses(), {"rathole-a": "active"})
+
+    def test_epoch_change_refetches_everything(self):
+        self.node.fetch()
+        # ریستارت وب‌سرور نود: epoch جدید و شمارش نسخه از اول
+        self.stub.epoch, self.stub.version = "e2", 0
+        self.stub.rows, self.stub.row_version = {}, {}
+        self.stub.put("rathole-z", "active")
+        self.node.fetch()
+        paths = self.tunnel_paths()
+        self.assertIn("since_version", paths[1])
+        self.assertNotIn("since_version", paths[2])
+        self.assertEqual(self.statuses(), {"rathole-z": "active"})
+        self.assertEqual((self.node.epoch, self.node.version), ("e2", 1))
+
+    def test_hanging_node_is_bounded_by_deadline(self):
+        self.stub.hang = 3.0
+        t0 = time.monotonic()
+        self.node.fetch()
+        self.assertLess(time.monotonic() - t0, 1.5)
+        self.assertFalse(self.node.ok)
+        self.assertTrue(self.node.error)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""تست CgroupReader و CgroupCheck روی یک درخت cgroup v2 جعلی در tmpdir."""
+
+import os
+import sys
+import shutil
+import logging
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cgroup_stats
+from cgroup_stats import CgroupCheck, CgroupReader, exceeded_limits
+
+
+def write_unit(root, unit, memory=0, pids=0, usage_usec=0, io=()):
+    base = os.path.join(root, f"{unit}.service")
+    os.makedirs(base, exist_ok=True)
+    files = {
+        "memory.current": f"{memory}\n",
+        "pids.current": f"{pids}\n",
+        "cpu.stat": f"usage_usec {usage_usec}\nuser_usec 0\nsystem_usec 0\n",
+        "io.stat": "".join(f"{dev} rbytes={r} wbytes={w} rios=1 wios=1\n" for dev, r, w in io),
+    }
+    for name, text in files.items():
+        # بازنویسی در جا (همان inode) مثل فایل‌های cgroupfs
+        with open(os.path.join(base, name), "w", encoding="ascii") as f:
+            f.write(text)
+
+
+class CgroupReaderTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.reader = CgroupReader(self.root)
+        self.clock = mock.patch.object(cgroup_stats.time, "monotonic", side_effect=[100.0, 102.0, 104.0, 106.0])
+        self.clock.start()
+
+    def tearDown(self):
+        self.clock.stop()
+        self.reader.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_first_sample_has_values_without_rates(self):
+        write_unit(self.root, "rathole-a", memory=1000, pids=3, usage_usec=5,
+                   io=[("8:0", 10, 20), ("8:16", 1, 2)])
+        s = self.reader.sample("rathole-a")
+        self.assertEqual(s, {"memory_bytes": 1000, "pids": 3, "cpu_usec": 5, "io_rbytes": 11, "io_wbytes": 22})
+        self.assertEqual(self.reader.latest["rathole-a"], s)
+
+    def test_rates_between_samples_use_cached_fds(self):
+        write_unit(self.root, "rathole-a", memory=1000, usage_usec=0, io=[("8:0", 0, 0)])
+        self.reader.sample("rathole-a")
+        fds = dict(self.reader._fds["rathole-a"])
+        write_unit(self.root, "rathole-a", memory=3000, usage_usec=1000000, io=[("8:0", 4000, 800)])
+        s = self.reader.sample("rathole-a")
+        self.assertEqual(self.reader._fds["rathole-a"], fds)
+        self.assertAlmostEqual(s["cpu_percent"], 50.0)
+        self.assertAlmostEqual(s["io_read_bps"], 2000.0)
+        self.assertAlmostEqual(s["io_write_bps"], 400.0)
+        self.assertAlmostEqual(s["memory_growth_bps"], 1000.0)
+
+    def test_counter_reset_gives_no_negative_rate(self):
+        write_unit(self.root, "rathole-a", usage_usec=5000000, io=[("8:0", 900, 900)])
+        self.reader.sample("rathole-a")
+        write_unit(self.root, "rathole-a", usage_usec=100, io=[("8:0", 0, 0)])
+        s = self.reader.sample("rathole-a")
+        self.assertEqual(s["cpu_percent"], 0.0)
+        self.assertEqual(s["io_read_bps"], 0.0)
+
+    def test_missing_cgroup_returns_none(self):
+        self.assertIsNone(self.reader.sample("rathole-missing"))
+        self.assertNotIn("rathole-missing", self.reader._fds)
+        self.assertNotIn("rathole-missing", self.reader.latest)
+
+    def test_stale_fd_is_reopened(self):
+        write_unit(self.root, "rathole-a", memory=1000)
+        self.reader.sample("rathole-a")
+        # fd باطل (مثل cgroup از نو ساخته‌شده بعد از ریستارت) → بستن و باز کردن دوباره
+        os.close(self.reader._fds["rathole-a"]["memory.current"])
+        write_unit(self.root, "rathole-a", memory=2000)
+        s = self.reader.sample("rathole-a")
+        self.assertEqual(s["memory_bytes"], 2000)
+
+    def test_removed_cgroup_clears_state(self):
+        write_unit(self.root, "rathole-a", memory=1000)
+        self.reader.sample("rathole-a")
+        for fd in self.reader._fds["rathole-a"].values():
+            os.close(fd)
+        shutil.rmtree(os.path.join(self.root, "rathole-a.service"))
+        self.assertIsNone(self.reader.sample("rathole-a"))
+        self.assertNotIn("rathole-a", self.reader.latest)
+        self.assertNotIn("rathole-a", self.reader._prev)
+
+    def test_retain_closes_fds_of_gone_units(self):
+        write_unit(self.root, "rathole-a")
+        write_unit(self.root, "rathole-b")
+        self.reader.sample("rathole-a")
+        self.reader.sample("rathole-b")
+        self.reader.retain(["rathole-a"])
+        self.assertEqual(set(self.reader._fds), {"rathole-a"})
+
+
+class CgroupCheckTest(unittest.TestCase):
+    def monitor(self, latest, resource_limits=None):
+        settings = SimpleNamespace(resource_limits=resource_limits or {})
+        return SimpleNamespace(
+            cgroups=SimpleNamespace(latest=latest),
+            logger=logging.getLogger("rathole-monitor-test"),
+            policy_for=lambda name: SimpleNamespace(settings=settings),
+        )
+
+    def test_exceeded_limits(self):
+        sample = {"memory_bytes": 2048, "cpu_percent": 10.0}
+        self.assertIsNone(exceeded_limits(sample, {"memory_bytes": 4096, "pids": 1}))
+        self.assertEqual(exceeded_limits(sample, {"memory_bytes": 1024}), "memory_bytes 2048 > 1024")
+
+    def test_check_params_override_resource_limits(self):
+        m = self.monitor({"rathole-a": {"memory_bytes": 2048}}, {"memory_bytes": 100})
+        self.assertEqual(CgroupCheck({"memory_bytes": 4096}).run(m, {"name": "rathole-a"}), (True, ""))
+        ok, reason = CgroupCheck().run(m, {"name": "rathole-a"})
+        self.assertFalse(ok)
+        self.assertIn("memory_bytes", reason)
+
+    def test_check_without_sample_is_healthy(self):
+        m = self.monitor({})
+        self.assertEqual(CgroupCheck().run(m, {"name": "rathole-a"}), (True, "no cgroup"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""تست ارسال اعلان‌ها با سرورهای HTTP/SMTP محلی و صف دیسکی در tmpdir."""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import socketserver
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notifications import NotificationPipeline, build_sinks
+
+
+class StubHTTP(ThreadingHTTPServer):
+    """مقصد webhook/API تلگرام: بدنه‌های POST را نگه می‌دارد و با status پاسخ می‌دهد."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHTTPHandler)
+        self.status = 200
+        self.received = []
+        self.got = threading.Event()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubHTTPHandler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        status = self.server.status
+        if status == 200:
+            self.server.received.append((self.path, json.loads(body)))
+            self.server.got.set()
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+
+class StubSMTP(socketserver.ThreadingTCPServer):
+    """SMTP حداقلی: EHLO/MAIL/RCPT/DATA/QUIT؛ reject_rcpt برای خطای دائمی."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubSMTPHandler)
+        self.mails = []
+        self.reject_rcpt = False
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode("ascii"))
+
+    def handle(self):
+        self.reply("220 stub")
+        data = None
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8").rstrip("\r\n")
+            if data is not None:
+                if line == ".":
+                    self.server.mails.append("\n".join(data))
+                    data = None
+                    self.reply("250 queued")
+                else:
+                    data.append(line)
+                continue
+            cmd = line.split(" ")[0].upper()
+            if cmd in ("EHLO", "HELO"):
+                self.reply("250 stub")
+            elif cmd == "RCPT" and self.server.reject_rcpt:
+                self.reply("550 no such user")
+            elif cmd == "DATA":
+                data = []
+                self.reply("354 go on")
+            elif cmd == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+def serve(server):
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    return server
+
+
+def state_change(tunnel, old="active", new="failed"):
+    return {"ts": time.time(), "type": "state_change", "tunnel": tunnel, "old": old, "new": new}
+
+
+class NotificationsTest(unittest.TestCase):
+    def setUp(self):
+        self.queue_dir = tempfile.mkdtemp()
+        self.http = serve(StubHTTP())
+        self.smtp = serve(StubSMTP())
+        self.pipelines = []
+
+    def tearDown(self):
+        for p in self.pipelines:
+            p.stop()
+        for server in (self.http, self.smtp):
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(self.queue_dir, ignore_errors=True)
+
+    def pipeline(self, **cfg):
+        cfg = {"enabled": True, "digest_seconds": 0, "retry_base_seconds": 0.1, "timeout": 2, **cfg}
+        p = NotificationPipeline(self.queue_dir, cfg)
+        self.pipelines.append(p)
+        return p
+
+    def queued_files(self):
+        return sorted(n for n in os.listdir(self.queue_dir) if n.endswith(".json"))
+
+    def test_webhook_delivery(self):
+        p = self.pipeline(sinks=[{"type": "webhook", "url": self.http.url + "/hook?x=1"}])
+        p.on_event(state_change("rathole-a"))
+        p.step(time.time())
+        path, body = self.http.received[0]
+        self.assertEqual(path, "/hook?x=1")
+        self.assertEqual([a["tunnel"] for a in body["alerts"]], ["rathole-a"])
+        self.assertIn("rathole-a", body["text"])
+        self.assertEqual((p.stats["sent"], self.queued_files()), (1, []))
+
+    def test_telegram_delivery(self):
+        p = self.pipeline(sinks=[{"type": "telegram", "bot_token": "123:abc", "chat_id": "42",
+                                  "api_url": self.http.url}])
+        p.on_event(state_change("rathole-a"))
+        p.step(time.time())
+        path, body = self.http.received[0]
+        self.assertEqual(path, "/bot123:abc/sendMessage")
+        self.assertEqual(body["chat_id"], "42")
+        self.assertIn("rathole-a", body["text"])
+
+    def test_smtp_delivery(self):
+        p = self.pipeline(sinks=[{"type": "smtp", "host": "127.0.0.1", "port": self.smtp.server_address[1],
+                                  "from": "monitor@example.com", "to": ["ops@example.com"]}])
+        p.on_event(state_change("rathole-a"))
+        p.step(time.time())
+        self.assertEqual(len(self.smtp.mails), 1)
+        self.assertIn("To: ops@example.com", self.smtp.mails[0])
+        self.assertEqual(p.stats["sent"], 1)
+
+    def test_smtp_rejected_recipient_is_permanent(self):
+        self.smtp.reject_rcpt = True
+        p = self.pipeline(sinks=[{"type": "smtp", "host": "127.0.0.1", "port": self.smtp.server_address[1],
+                                  "from": "monitor@example.com", "to": "nobody@example.com"}])
+        p.on_event(state_change("rathole-a"))
+        p.step(time.time())
+        self.assertEqual((p.stats["failed"], p.stats["retries"]), (1, 0))
+        self.assertEqual(self.queued_files(), [])
+
+    def test_failed_message_is_replayed_from_disk_queue(self):
+        self.http.status = 503
+        sinks = [{"type": "webhook", "url": self.http.url + "/hook"}]
+        p = self.pipeline(sinks=sinks)
+        p.on_event(state_change("rathole-a"))
+        p.step(time.time())
+        self.assertEqual(p.stats["retries"], 1)
+        files = self.queued_files()
+        self.assertEqual(len(files), 1)
+        with open(os.path.join(self.queue_dir, files[0]), encoding="utf-8") as f:
+            msg = json.load(f)
+        self.assertEqual(msg["attempts"], 1)
+        self.assertIn("503", msg["last_error"])
+
+        # مانیتور جدید (بعد از ریستارت) همان پیام را از دیسک ارسال می‌کند
+        self.http.status = 200
+        p2 = self.pipeline(sinks=sinks)
+        p2.start()
+        self.assertTrue(self.http.got.wait(5))
+        p2.stop()
+        self.assertEqual(self.http.received[0][1]["alerts"][0]["tunnel"], "rathole-a")
+        self.assertEqual(self.queued_files(), [])
+
+    def test_pending_alerts_survive_restart(self):
+        sinks = [{"type": "webhook", "url": self.http.url + "/hook"}]
+        p = self.pipeline(sinks=sinks, digest_seconds=3600)
+        p.on_event(state_change("rathole-a"))
+        p.on_event(state_change("rathole-b"))
+        p.step(time.time())
+        self.assertEqual(self.http.received, [])
+        self.assertEqual(len(p.queue.read_pending()), 2)
+
+        p2 = self.pipeline(sinks=sinks)
+        p2.start()
+        self.assertTrue(self.http.got.wait(5))
+        p2.stop()
+        tunnels = [a["tunnel"] for a in self.http.received[0][1]["alerts"]]
+        self.assertEqual(tunnels, ["rathole-a", "rathole-b"])
+        self.assertEqual(p2.queue.read_pending(), [])
+
+    def test_legacy_keys_are_migrated_to_sinks(self):
+        sinks = build_sinks({
+            "webhook_url": self.http.url + "/legacy",
+            "telegram_bot_token": "123:abc",
+            "telegram_chat_id": "42",
+            "sinks": [{"type": "webhook", "url": self.http.url + "/new"}],
+        })
+        self.assertEqual(list(sinks), ["webhook", "telegram", "webhook-2"])
+        self.assertEqual(sinks["telegram"].spec, {"type": "telegram", "bot_token": "123:abc", "chat_id": "42"})
+        # کلید قدیمی بدون chat_id مقصد تلگرام نمی‌سازد
+        self.assertNotIn("telegram", build_sinks({"telegram_bot_token": "123:abc"}))
+
+    def test_legacy_webhook_url_delivers(self):
+        p = self.pipeline(webhook_url=self.http.url + "/legacy")
+        self.assertTrue(p.enabled)
+        p.on_event(state_change("rathole-a"))
+        p.step(time.time())
+        self.assertEqual(self.http.received[0][0], "/legacy")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+شمارش ترافیک هر تانل با سربار کم
+
+در هر دور یک بار /proc/<pid>/io همه پروسه‌های هر تانل خوانده می‌شود
+(rchar/wchar = بایت ورودی/خروجی، syscr/syscw = تعداد عملیات خواندن/نوشتن که برای
+پروسه شبکه‌ای مثل rathole تقریبی از تعداد بسته‌هاست). نرخ‌ها در یک حلقه با اندازه
+ثابت (array از float32) نگه داشته می‌شوند تا حافظه برای هر تانل ثابت بماند.
+"""
+
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from conn_stats import unit_pids
+from health_checks import HealthCheck, register_check
+
+DEFAULT_TRAFFIC_HISTORY = 60
+
+
+class RateRing:
+    """حلقه با اندازه ثابت از نرخ‌ها (float32)."""
+
+    __slots__ = ("buf", "idx", "count")
+
+    def __init__(self, size: int):
+        self.buf = array("f", bytes(4 * size))
+        self.idx = 0
+        self.count = 0
+
+    def push(self, value: float):
+        self.buf[self.idx] = value
+        self.idx = (self.idx + 1) % len(self.buf)
+        if self.count < len(self.buf):
+            self.count += 1
+
+    def values(self) -> List[float]:
+        """از قدیمی‌ترین به جدیدترین."""
+        n = len(self.buf)
+        start = (self.idx - self.count) % n
+        return [self.buf[(start + i) % n] for i in range(self.count)]
+
+    def last(self, k: int) -> List[float]:
+        return self.values()[-k:]
+
+
+def read_proc_io(pid: int, proc_root: str = "/proc") -> Optional[Tuple[int, int, int, int]]:
+    try:
+        with open(f"{proc_root}/{pid}/io", "r") as f:
+            kv = {}
+            for line in f:
+                k, _, v = line.partition(":")
+                kv[k] = int(v)
+        return kv["rchar"], kv["wchar"], kv["syscr"], kv["syscw"]
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class TrafficMeter:
+    def __init__(self, cgroup_root: str, history: int = DEFAULT_TRAFFIC_HISTORY, proc_root: str = "/proc"):
+        self.cgroup_root = cgroup_root
+        self.history = max(2, int(history))
+        self.proc_root = proc_root
+        # pid → آخرین شمارنده‌ها؛ فقط اختلاف pidهای دیده‌شده شمرده می‌شود (بعد از ریستارت از صفر)
+        self._prev: Dict[int, Tuple[int, int, int, int]] = {}
+        self._last_ts: Dict[str, float] = {}
+        self.rx: Dict[str, RateRing] = {}
+        self.tx: Dict[str, RateRing] = {}
+        self.ops: Dict[str, RateRing] = {}
+
+    def _rings(self, name: str):
+        if name not in self.rx:
+            self.rx[name] = RateRing(self.history)
+            self.tx[name] = RateRing(self.history)
+            self.ops[name] = RateRing(self.history)
+        return self.rx[name], self.tx[name], self.ops[name]
+
+    def sample(self, tunnels: List[Dict]) -> Dict[str, Dict]:
+        now = time.monotonic()
+        seen_pids: Dict[int, Tuple[int, int, int, int]] = {}
+        out: Dict[str, Dict] = {}
+        for t in tunnels:
+            name = t["name"]
+            d_rx = d_tx = d_ops = 0
+            for pid in unit_pids(self.cgroup_root, name, int(t.get("pid") or 0)):
+                cur = read_proc_io(pid, self.proc_root)
+                if cur is None:
+                    continue
+                seen_pids[pid] = cur
+                prev = self._prev.get(pid)
+                if prev is None:
+                    continue
+                d_rx += max(0, cur[0] - prev[0])
+                d_tx += max(0, cur[1] - prev[1])
+                d_ops += max(0, cur[2] - prev[2]) + max(0, cur[3] - prev[3])
+
+            last = self._last_ts.get(name)
+            self._last_ts[name] = now
+            if last is None or now <= last:
+                continue
+            dt = now - last
+            rx, tx, ops = self._rings(name)
+            rx.push(d_rx / dt)
+            tx.push(d_tx / dt)
+            ops.push(d_ops / dt)
+            out[name] = self.summary(name)
+
+        self._prev = seen_pids
+        current = {t["name"] for t in tunnels}
+        for name in [n for n in self._last_ts if n not in current]:
+            self._last_ts.pop(name, None)
+            self.rx.pop(name, None)
+            self.tx.pop(name, None)
+            self.ops.pop(name, None)
+        return out
+
+    def summary(self, name: str, points: int = 30) -> Dict:
+        rx, tx, ops = self._rings(name)
+        rx_hist, tx_hist = rx.last(points), tx.last(points)
+        return {
+            "rx_bps": round(rx_hist[-1], 1) if rx_hist else 0.0,
+            "tx_bps": round(tx_hist[-1], 1) if tx_hist else 0.0,
+            "ops_ps": round(ops.last(1)[0], 2) if ops.count else 0.0,
+            "rx_hist": [round(v, 1) for v in rx_hist],
+            "tx_hist": [round(v, 1) for v in tx_hist],
+        }
+
+    def idle_samples(self, name: str, min_bps: float = 0.0) -> int:
+        """تعداد نمونه‌های متوالی اخیر که ترافیک کل آن‌ها <= min_bps بوده."""
+        if name not in self.rx:
+            return 0
+        n = 0
+        for r, w in zip(reversed(self.rx[name].values()), reversed(self.tx[name].values())):
+            if r + w > min_bps:
+                break
+            n += 1
+        return n
+
+
+@register_check
+class IdleTrafficCheck(HealthCheck):
+    """تانل active ولی بدون ترافیک در idle_samples نمونه متوالی → ناسالم."""
+
+    name = "traffic"
+    cost = 5
+
+    def run(self, monitor, tunnel):
+        meter = getattr(monitor, "traffic", None)
+        if meter is None:
+            return True, "no data"
+        need = int(self.params.get("idle_samples", 3))
+        idle = meter.idle_samples(tunnel["name"], float(self.params.get("min_bps", 0)))
+        if idle >= need:
+            monitor.logger.warning(f"تانل {tunnel['name']} active است ولی {idle} نمونه متوالی بدون ترافیک بوده")
+            return False, f"idle {idle} samples"
+        return True, ""
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+خواندن فایل TOML کانفیگ تانل‌های Rathole (remote_addr، bind_addr، local_addr ...)
+با کش بر اساس mtime تا در هر دور مانیتورینگ دوباره parse نشود.
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import tomllib  # Python 3.11+
+except ImportError:  # pragma: no cover - نسخه‌های قدیمی‌تر پایتون
+    tomllib = None
+
+_cache: Dict[str, Tuple[float, Dict]] = {}
+_cache_lock = threading.Lock()
+
+
+def _parse_value(raw: str):
+    raw = raw.strip()
+    if raw[:1] in ('"', "'"):
+        q = raw[0]
+        end = raw.find(q, 1)
+        return raw[1:end] if end > 0 else raw[1:]
+    # حذف کامنت انتهای خط
+    raw = raw.split("#", 1)[0].strip()
+    if raw in ("true", "false"):
+        return raw == "true"
+    try:
+        return int(raw)
+    except ValueError:
+        pass
+    try:
+        return float(raw)
+    except ValueError:
+        return raw
+
+
+def _parse_minimal(text: str) -> Dict:
+    """parser حداقلی برای زیرمجموعه‌ای از TOML که rathole استفاده می‌کند (وقتی tomllib نیست)."""
+    root: Dict = {}
+    cur = root
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("[") and line.endswith("]"):
+            cur = root
+            for part in line.strip("[]").split("."):
+                cur = cur.setdefault(part.strip().strip('"'), {})
+            continue
+        if "=" in line:
+            k, v = line.split("=", 1)
+            cur[k.strip().strip('"')] = _parse_value(v)
+    return root
+
+
+def load_tunnel_toml(path: Optional[str]) -> Dict:
+    """کانفیگ TOML تانل را برمی‌گرداند (در صورت خطا دیکشنری خالی)."""
+    if not path:
+        return {}
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return {}
+    with _cache_lock:
+        hit = _cache.get(path)
+        if hit and hit[0] == mtime:
+            return hit[1]
+    try:
+        if tomllib is not None:
+            with open(path, "rb") as f:
+                data = tomllib.load(f)
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                data = _parse_minimal(f.read())
+    except Exception:
+        data = {}
+    with _cache_lock:
+        _cache[path] = (mtime, data)
+    return data
+
+
+def split_addr(addr: str) -> Optional[Tuple[str, int]]:
+    """'host:port' یا '[v6]:port' → (host, port)."""
+    if not addr or ":" not in addr:
+        return None
+    host, _, port = addr.rpartition(":")
+    host = host.strip("[]")
+    try:
+        return host, int(port)
+    except ValueError:
+        return None
+
+
+def remote_endpoint(cfg: Dict) -> Optional[Tuple[str, int]]:
+    """آدرس سرور مقصد سمت client (remote_addr)؛ برای سمت server مقدار None."""
+    client = cfg.get("client") or {}
+    return split_addr(str(client.get("remote_addr", "")))
+
+
+def tunnel_ports(cfg: Dict) -> List[int]:
+    """همه پورت‌های تعریف‌شده در کانفیگ (bind_addr سرور و سرویس‌ها، local_addr سرویس‌های client)."""
+    ports = set()
+    for side in ("server", "client"):
+        sec = cfg.get(side) or {}
+        ep = split_addr(str(sec.get("bind_addr", "")))
+        if ep:
+            ports.add(ep[1])
+        for svc in (sec.get("services") or {}).values():
+            if not isinstance(svc, dict):
+                continue
+            for key in ("bind_addr", "local_addr"):
+                ep = split_addr(str(svc.get(key, "")))
+                if ep:
+                    ports.add(ep[1])
+    return sorted(ports)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+گروه‌ها و وابستگی‌های تانل‌ها (گراف جهت‌دار بدون دور)
+
+  "tunnel_groups": {"iran": ["rathole-iran-*"], "mux": ["rathole-mux-*"]},
+  "tunnel_dependencies": {
+    "rathole-kharej-*": ["@iran"],
+    "@mux": ["rathole-kharej-main"]
+  }
+
+کلید = تانل(های) وابسته، مقدار = تانل(های) والد؛ هر دو glob نام یا "@گروه" هستند.
+ترمیم در «موج»‌های ترتیب توپولوژیک انجام می‌شود: اول تانل‌های بدون والد ناسالم، بعد
+فرزندانشان و ... ؛ داخل هر موج ریستارت‌ها موازی هستند. اگر والدی ناسالم بماند،
+فرزندانش در همان دور ریستارت نمی‌شوند (ریستارت فرزند بدون والد سالم بی‌فایده است).
+"""
+
+import fnmatch
+import logging
+from typing import Dict, Iterable, List, Set
+
+
+class DependencyGraph:
+    def __init__(self, groups: Dict[str, List[str]], dependencies: Dict[str, List[str]]):
+        self.groups = {g: list(p) for g, p in (groups or {}).items()}
+        self.dependencies = {k: list(v) for k, v in (dependencies or {}).items()}
+        self.parents: Dict[str, Set[str]] = {}
+        self.level: Dict[str, int] = {}
+        self._names: tuple = ()
+        self.logger = logging.getLogger("rathole-monitor")
+
+    @classmethod
+    def from_config(cls, cfg: Dict) -> "DependencyGraph":
+        return cls(cfg.get("tunnel_groups") or {}, cfg.get("tunnel_dependencies") or {})
+
+    def _select(self, ref: str, names: Iterable[str]) -> List[str]:
+        if ref.startswith("@"):
+            patterns = self.groups.get(ref[1:], [])
+        else:
+            patterns = [ref]
+        return [n for n in names if any(fnmatch.fnmatchcase(n, p) for p in patterns)]
+
+    def groups_for(self, name: str) -> List[str]:
+        return [g for g, patterns in self.groups.items() if any(fnmatch.fnmatchcase(name, p) for p in patterns)]
+
+    def build(self, names: Iterable[str]):
+        """ساخت گراف برای تانل‌های کشف‌شده (فقط وقتی لیست نام‌ها تغییر کند)."""
+        names = tuple(sorted(names))
+        if names == self._names:
+            return
+        self._names = names
+        parents: Dict[str, Set[str]] = {n: set() for n in names}
+        if self.dependencies:
+            for child_ref, parent_refs in self.dependencies.items():
+                children = self._select(child_ref, names)
+                if not children:
+                    continue
+                for parent_ref in parent_refs:
+                    for parent in self._select(parent_ref, names):
+                        for child in children:
+                            if child != parent:
+                                parents[child].add(parent)
+        self.parents = parents
+        self.level = self._levels()
+
+    def _levels(self) -> Dict[str, int]:
+        """عمق هر تانل در ترتیب توپولوژیک (الگوریتم Kahn)؛ اعضای دور وابستگی ندارند."""
+        remaining = {n: len(p) for n, p in self.parents.items()}
+        children: Dict[str, List[str]] = {n: [] for n in self.parents}
+        for child, ps in self.parents.items():
+            for p in ps:
+                children[p].append(child)
+        level: Dict[str, int] = {}
+        wave = sorted(n for n, c in remaining.items() if c == 0)
+        depth = 0
+        while wave:
+            nxt = []
+            for n in wave:
+                level[n] = depth
+                for c in children[n]:
+                    remaining[c] -= 1
+                    if remaining[c] == 0:
+                        nxt.append(c)
+            wave = sorted(nxt)
+            depth += 1
+        cyclic = sorted(n for n in self.parents if n not in level)
+        if cyclic:
+            self.logger.error(f"دور در وابستگی تانل‌ها؛ وابستگی این تانل‌ها نادیده گرفته شد: {', '.join(cyclic)}")
+            acyclic = set(level)
+            for n in cyclic:
+                # یال‌های داخل دور حذف می‌شوند؛ والدهای بیرون از دور باقی می‌مانند
+                self.parents[n] = {p for p in self.parents[n] if p in acyclic}
+                level[n] = 1 + max((level[p] for p in self.parents[n]), default=-1)
+        return level
+
+    def waves(self, tunnels: List[Dict]) -> List[List[Dict]]:
+        """تقسیم تانل‌های نیازمند ترمیم به موج‌های مرتب بر اساس عمق."""
+        by_level: Dict[int, List[Dict]] = {}
+        for t in tunnels:
+            by_level.setdefault(self.level.get(t["name"], 0), []).append(t)
+        return [by_level[k] for k in sorted(by_level)]
+
+    def ancestors(self, name: str) -> Set[str]:
+        out: Set[str] = set()
+        stack = list(self.parents.get(name, ()))
+        while stack:
+            p = stack.pop()
+            if p not in out:
+                out.add(p)
+                stack.extend(self.parents.get(p, ()))
+        return out
+
+    def blocked_by(self, name: str, down: Set[str]) -> List[str]:
+        """والدهای (مستقیم یا غیرمستقیم) ناسالم تانل."""
+        if not down or not self.parents.get(name):
+            return []
+        return sorted(self.ancestors(name) & down)
@@ -5,16 +5,26 @@
 import os
 import json
 import time
-import subprocess
+import base64
+import bisect
+import threading
 from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 
+from event_journal import EventJournal
+from executor import CommandExecutor
+from maintenance import MaintenanceSchedule, SilenceStore, build_silence
+import slo
+from settings import Settings, validate_config
+
 MONITOR_DIR = "/root/rathole-monitor"
 CONFIG_FILE = os.path.join(MONITOR_DIR, "config.json")
 START_TIME_FILE = os.path.join(MONITOR_DIR, "start_time")
 
+EXECUTOR = CommandExecutor()
+
 def run_cmd(cmd):
-    return subprocess.run(cmd, capture_output=True, text=True)
+    return EXECUTOR.run(cmd)
 
 def is_active(service_name: str) -> bool:
     r = run_cmd(["systemctl", "is-active", service_name])
@@ -39,10 +49,30 @@ def load_config():
     except Exception:
         return {}
 
+_settings_cache = (None, None)
+_settings_lock = threading.Lock()
+
+def current_settings() -> Settings:
+    """همان شیء Settings مانیتور؛ فقط وقتی config.json تغییر کرده دوباره ساخته می‌شود."""
+    global _settings_cache
+    try:
+        mtime = os.stat(CONFIG_FILE).st_mtime_ns
+    except OSError:
+        mtime = None
+    with _settings_lock:
+        cached_mtime, settings = _settings_cache
+        if settings is None or cached_mtime != mtime:
+            settings = Settings.from_dict(load_config(), lenient=True)
+            _settings_cache = (mtime, settings)
+        return settings
+
 def save_config(cfg):
+    # جایگزینی اتمیک: مانیتور (با inotify) هرگز فایل نیمه‌نوشته نمی‌خواند
     try:
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
+        tmp = CONFIG_FILE + ".tmp.web"
+        with open(tmp, "w", encoding="utf-8") as f:
             json.dump(cfg, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, CONFIG_FILE)
         return True
     except Exception:
         return False
@@ -68,8 +98,188 @@ def filter_service_name(name: str) -> bool:
     import re
     return ("rathole" in name.lower()) and bool(re.fullmatch(r"[A-Za-z0-9_.@:-]+", name))
 
+# ----- ایندکس تانل‌ها برای /api/tunnels -----
+INDEX_SORT_FIELDS = ("name", "type", "status", "last_restart", "restart_count")
+INDEX_FILTER_FIELDS = ("type", "status")
+MAX_PAGE_SIZE = 1000
+# فیلدهای پایدار هر تانل (وضعیت و مشخصات برآمده از config)؛ تغییر تلمتری هر دور (ترافیک، زمان و
+# تاخیر چک‌ها، منابع، سلامت) نسخه این نما را عوض نمی‌کند تا since_version واقعاً افزایشی باشد
+STABLE_FIELDS = ("name", "type", "status", "sub_status", "restart_count", "last_restart",
+                 "depends_on", "groups", "policy", "silenced", "config_path")
+# حذف‌ها فقط برای این تعداد نسخه آخر نگه داشته می‌شوند؛ کلاینت قدیمی‌تر لیست کامل (full) می‌گیرد
+REMOVED_VERSION_WINDOW = 1000
+
+
+def _sort_key(row, field):
+    if field == "restart_count":
+        try:
+            return int(row.get(field) or 0)
+        except (TypeError, ValueError):
+            return 0
+    return str(row.get(field) or "")
+
+
+def encode_cursor(key, name):
+    raw = json.dumps([key, name], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    key, name = json.loads(raw.decode("utf-8"))
+    return key, name
+
+
+class TunnelIndex:
+    """
+    ایندکس درون‌حافظه تانل‌ها از snapshot مانیتور (config.json).
+    با تغییر mtime فایل بازسازی می‌شود؛ هر ردیف تغییر‌کرده نسخه جدید می‌گیرد تا کلاینت
+    با since_version فقط تغییرات را بگیرد. epoch با هر اجرای وب‌سرور عوض می‌شود.
+    هر ردیف دو نسخه دارد: row_version برای فیلدهای STABLE_FIELDS و live_version برای هر تغییری؛
+    درخواستی که fields آن زیرمجموعه STABLE_FIELDS است با row_version فیلتر می‌شود.
+    وضعیت‌ها مال آخرین دور مانیتور هستند (تا check_interval قدیمی)؛ snapshot_age قدمت آن است.
+    """
+
+    def __init__(self):
+        self.epoch = int(time.time())
+        self.version = 0
+        self.rows = {}
+        self.row_version = {}
+        self.live_version = {}
+        self._stable = {}
+        self.removed = {}
+        # since_version کمتر از این → حذف‌های قدیمی‌تر دور ریخته شده‌اند و پاسخ کامل است
+        self.removed_floor = 0
+        self.by_field = {f: {} for f in INDEX_FILTER_FIELDS}
+        self._sorted = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        try:
+            mtime = os.stat(CONFIG_FILE).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        tunnels = load_config().get("tunnels") or []
+        new = {t["name"]: t for t in tunnels if isinstance(t, dict) and t.get("name")}
+        stable = {n: tuple(json.dumps(t.get(f), sort_keys=True) for f in STABLE_FIELDS) for n, t in new.items()}
+        with self._lock:
+            self._mtime = mtime
+            changed = [n for n, t in new.items() if self.rows.get(n) != t]
+            gone = [n for n in self.rows if n not in new]
+            if not changed and not gone:
+                return
+            self.version += 1
+            for n in changed:
+                self.live_version[n] = self.version
+                if self._stable.get(n) != stable[n]:
+                    self.row_version[n] = self.version
+                self.removed.pop(n, None)
+            for n in gone:
+                self.row_version.pop(n, None)
+                self.live_version.pop(n, None)
+                self.removed[n] = self.version
+            self._stable = stable
+            floor = self.version - REMOVED_VERSION_WINDOW
+            if floor > self.removed_floor:
+                self.removed_floor = floor
+                self.removed = {n: v for n, v in self.removed.items() if v > floor}
+            by_field = {f: {} for f in INDEX_FILTER_FIELDS}
+            for n, t in new.items():
+                for f in INDEX_FILTER_FIELDS:
+                    by_field[f].setdefault(str(t.get(f) or ""), set()).add(n)
+            self.rows = new
+            self.by_field = by_field
+            self._sorted = {}
+
+    def _sorted_keys(self, field):
+        cached = self._sorted.get(field)
+        if cached is None:
+            cached = sorted((_sort_key(t, field), n) for n, t in self.rows.items())
+            self._sorted[field] = cached
+        return cached
+
+    def snapshot_age(self):
+        with self._lock:
+            mtime = self._mtime
+        return round(max(0.0, time.time() - mtime / 1e9), 1) if mtime is not None else None
+
+    def counts(self):
+        with self._lock:
+            return {
+                "total": len(self.rows),
+                "active": len(self.by_field["status"].get("active", ())),
+            }
+
+    def query(self, sort="name", desc=False, filters=None, q="", cursor="", limit=100,
+              fields=None, since_version=None):
+        self.refresh()
+        with self._lock:
+            rows, version = self.rows, self.version
+            stable_only = bool(fields) and set(fields) <= set(STABLE_FIELDS)
+            row_version = self.row_version if stable_only else self.live_version
+            full = since_version is not None and since_version < self.removed_floor
+            if full:
+                since_version = None
+            keys = self._sorted_keys(sort)
+            removed = [n for n, v in self.removed.items() if since_version is not None and v > since_version]
+            allowed = None
+            for f, value in (filters or {}).items():
+                names = self.by_field[f].get(value, set())
+                allowed = names if allowed is None else allowed & names
+
+        if cursor:
+            ck = tuple(decode_cursor(cursor))
+            if desc:
+                order = range(bisect.bisect_left(keys, ck) - 1, -1, -1)
+            else:
+                order = range(bisect.bisect_right(keys, ck), len(keys))
+        else:
+            order = range(len(keys) - 1, -1, -1) if desc else range(len(keys))
+
+        q = (q or "").lower()
+        page, total, last = [], 0, None
+        for i in order:
+            name = keys[i][1]
+            if allowed is not None and name not in allowed:
+                continue
+            if q and q not in name.lower():
+                continue
+            if since_version is not None and row_version.get(name, 0) <= since_version:
+                continue
+            total += 1
+            if len(page) < limit:
+                row = rows[name]
+                if fields:
+                    row = {k: row.get(k) for k in fields}
+                    row["name"] = name
+                page.append(row)
+                last = keys[i]
+        next_cursor = encode_cursor(*last) if last is not None and total > len(page) else None
+        return {
+            "version": version,
+            "epoch": self.epoch,
+            "total": total,
+            "tunnels": page,
+            "next_cursor": next_cursor,
+            "removed": removed,
+            "full": full,
+        }
+
+
+TUNNEL_INDEX = TunnelIndex()
+EVENTS = EventJournal(MONITOR_DIR)
+SILENCES = SilenceStore(os.path.join(MONITOR_DIR, "silences.json"))
+SCHEDULE = MaintenanceSchedule(SILENCES)
+MAX_EVENTS_PAGE = 1000
+
+
 class Handler(BaseHTTPRequestHandler):
     server_version = "RatholeMonitorWeb/1.2"
+    # keep-alive برای aggregator و پنل (همه پاسخ‌ها Content-Length دارند)
+    protocol_version = "HTTP/1.1"
 
     def _json(self, code=200, payload=None):
         data = json.dumps(payload or {}, ensure_ascii=False).encode("utf-8")
@@ -105,11 +315,44 @@ class Handler(BaseHTTPRequestHandler):
                 self._text(500, f"خطا در سرو HTML: {e}")
             return
 
+        if path == "/api/tunnels":
+            qs = parse_qs(parsed.query)
+
+            def arg(name, default=""):
+                return (qs.get(name) or [default])[0]
+
+            sort = arg("sort", "name")
+            desc = arg("desc") in ("1", "true")
+            if sort.startswith("-"):
+                sort, desc = sort[1:], True
+            if sort not in INDEX_SORT_FIELDS:
+                self._json(400, {"ok": False, "error": "sort نامعتبر"})
+                return
+            try:
+                limit = max(1, min(int(arg("limit", "100")), MAX_PAGE_SIZE))
+                since = arg("since_version")
+                since_version = int(since) if since != "" else None
+                fields = [f for f in arg("fields").split(",") if f] or None
+                filters = {f: arg(f) for f in INDEX_FILTER_FIELDS if arg(f)}
+                result = TUNNEL_INDEX.query(sort=sort, desc=desc, filters=filters, q=arg("q"),
+                                            cursor=arg("cursor"), limit=limit, fields=fields,
+                                            since_version=since_version)
+            except (ValueError, TypeError):
+                self._json(400, {"ok": False, "error": "پارامتر نامعتبر"})
+                return
+            result["ok"] = True
+            result["counts"] = TUNNEL_INDEX.counts()
+            result["snapshot_age"] = TUNNEL_INDEX.snapshot_age()
+            self._json(200, result)
+            return
+
         if path == "/api/status":
-            cfg = load_config()
-            tunnels = cfg.get("tunnels", [])
+            st = current_settings()
+            # ?tunnels=0 → فقط وضعیت مانیتور (پنل لیست را از /api/tunnels می‌گیرد)
+            with_tunnels = (parse_qs(parsed.query).get("tunnels") or ["1"])[0] != "0"
+            tunnels = load_config().get("tunnels", []) if with_tunnels else []
             # اگر مانیتور هنوز tunnels را نریخته بود، از systemd کشف کن
-            if not tunnels:
+            if not tunnels and with_tunnels:
                 for name in list_rathole_units():
                     tunnels.append({
                         "name": name,
@@ -127,28 +370,78 @@ class Handler(BaseHTTPRequestHandler):
             # وضعیت سرویس مانیتور
             monitoring_active = is_active("rathole-monitor")
 
-            # خواندن پورت وب از config
-            web_port = cfg.get("web_port", 8080)
-
             self._json(200, {
                 "ok": True,
                 "monitoring_active": monitoring_active,
                 "uptime": uptime_str(),
-                "web_port": web_port,
+                "web_port": st.web_port,
                 "tunnels": tunnels,
                 "config": {
-                    "check_interval": cfg.get("check_interval"),
-                    "auto_restart": cfg.get("auto_restart"),
-                    "max_restart_attempts": cfg.get("max_restart_attempts"),
-                    "restart_delay": cfg.get("restart_delay"),
-                    "restart_window_seconds": cfg.get("restart_window_seconds"),
-                    "restart_on_inactive": cfg.get("restart_on_inactive"),
-                    "journal_since_seconds": cfg.get("journal_since_seconds"),
-                    "log_level": cfg.get("log_level"),
+                    "check_interval": st.check_interval,
+                    "auto_restart": st.auto_restart,
+                    "max_restart_attempts": st.max_restart_attempts,
+                    "restart_delay": st.restart_delay,
+                    "restart_window_seconds": st.restart_window_seconds,
+                    "restart_on_inactive": st.restart_on_inactive,
+                    "journal_since_seconds": st.journal_since_seconds,
+                    "log_level": st.log_level,
                 }
             })
             return
 
+        if path == "/api/events":
+            qs = parse_qs(parsed.query)
+
+            def arg(name, default=""):
+                return (qs.get(name) or [default])[0]
+
+            try:
+                since, until = arg("since"), arg("until")
+                t0 = time.perf_counter()
+                events = EVENTS.query(
+                    tunnel=arg("tunnel") or None,
+                    types=[t for t in arg("type").split(",") if t] or None,
+                    since=float(since) if since else None,
+                    until=float(until) if until else None,
+                    limit=max(1, min(int(arg("limit", "200")), MAX_EVENTS_PAGE)),
+                )
+            except ValueError:
+                self._json(400, {"ok": False, "error": "پارامتر نامعتبر"})
+                return
+            self._json(200, {"ok": True, "events": events,
+                             "took_ms": round((time.perf_counter() - t0) * 1000, 2)})
+            return
+
+        if path in ("/api/slo", "/slo"):
+            qs = parse_qs(parsed.query)
+
+            def arg(name):
+                return (qs.get(name) or [None])[0]
+
+            try:
+                since, until = slo.period(arg("month"), arg("since"), arg("until"), float(arg("days") or 30))
+                target = float(arg("target") or current_settings().slo_target)
+            except ValueError:
+                self._json(400, {"ok": False, "error": "پارامتر نامعتبر"})
+                return
+            report = slo.build_report(os.path.join(MONITOR_DIR, "slo"), since, until, arg("tunnel") or "*", target)
+            if path == "/slo":
+                data = slo.render_html(report).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            else:
+                report["ok"] = True
+                self._json(200, report)
+            return
+
+        if path == "/api/silences":
+            SCHEDULE.refresh()
+            self._json(200, {"ok": True, "silences": SCHEDULE.upcoming()})
+            return
+
         if path == "/api/logs":
             qs = parse_qs(parsed.query)
             name = (qs.get("name") or [""])[0]
@@ -191,6 +484,24 @@ class Handler(BaseHTTPRequestHandler):
                 self._json(500, {"ok": False, "error": str(e)})
             return
 
+        if path == "/api/silences":
+            # {"name": "rathole-iran-*", "duration": "2h", "comment": "..."} یا {"cron": "0 3 * * 0", "duration": 3600}
+            try:
+                entry = SILENCES.add(build_silence(
+                    body.get("name", ""), body.get("type", ""), body.get("tag", ""), body.get("start"),
+                    body.get("end"), body.get("duration"), body.get("cron", ""), body.get("comment", ""),
+                ), created_by="web")
+            except (ValueError, TypeError) as e:
+                self._json(400, {"ok": False, "error": str(e)})
+                return
+            self._json(200, {"ok": True, "silence": entry})
+            return
+
+        if path == "/api/silences/delete":
+            ok = SILENCES.remove(str(body.get("id", "")))
+            self._json(200 if ok else 404, {"ok": ok})
+            return
+
         if path == "/api/monitor/start":
             run_cmd(["systemctl", "start", "rathole-monitor"])
             time.sleep(1)
@@ -206,7 +517,7 @@ class Handler(BaseHTTPRequestHandler):
         if path == "/api/config/update":
             # فقط اجازه تغییر web_port (بقیه را ترجیحاً از خود مانیتور UI/فایل)
             new_port = body.get("web_port")
-            if isinstance(new_port, int) and 1 <= new_port <= 65535:
+            if new_port is not None and not validate_config({"web_port": new_port}):
                 cfg = load_config()
                 cfg["web_port"] = new_port
                 ok = save_config(cfg)
@@ -220,8 +531,8 @@ class Handler(BaseHTTPRequestHandler):
 
 def main():
     os.chdir(MONITOR_DIR)
-    cfg = load_config()
-    port = int(cfg.get("web_port", 8080))
+    EXECUTOR.apply_config(load_config())
+    port = current_settings().web_port
     server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
     print(f"🌐 Web server running on http://0.0.0.0:{port}")
     try: